@@ -0,0 +1,140 @@
+"""
+Size-bounded, content-addressed disk cache for derived text.
+
+Entries are zlib-compressed blobs stored under ``.cache/`` (one file per
+key, sharded by the first two hex digits) and are never committed.  A hit
+refreshes the entry's mtime, and once the total size exceeds the limit the
+least recently used entries are evicted.  The cache only ever holds values
+that can be recomputed, so a missing or corrupt entry is treated as a miss.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from pathlib import Path
+
+from storage import atomic_open
+
+log = logging.getLogger("railcar.cache")
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache"
+
+# Evict down to this share of max_bytes so eviction does not run on every put
+_EVICT_TARGET = 0.9
+
+
+def content_key(*parts: str | bytes) -> str:
+    """Return a hex sha256 over the given parts (length-prefixed, so unambiguous)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class DiskCache:
+    """A directory of compressed blobs with LRU eviction and hit/miss counters.
+
+    Safe to share between threads (the freshness sweep's checks).
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: int | None = None
+        # Guards the counters and the size accounting
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value stored under key, or None."""
+        path = self._path(key)
+        try:
+            data = zlib.decompress(path.read_bytes())
+        except (FileNotFoundError, zlib.error):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store value under key, evicting old entries if over the size limit."""
+        blob = zlib.compress(value, 6)
+        path = self._path(key)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            try:
+                self._size -= path.stat().st_size
+            except FileNotFoundError:
+                pass
+            # Cache entries are recomputable, so they are not fsynced
+            with atomic_open(path, sync=False, binary=True) as f:
+                f.write(blob)
+            self._size += len(blob)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def get_text(self, key: str) -> str | None:
+        data = self.get(key)
+        return None if data is None else data.decode("utf-8")
+
+    def put_text(self, key: str, text: str) -> None:
+        self.put(key, text.encode("utf-8"))
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        return f"{self.hits} hit(s), {self.misses} miss(es) ({rate:.0f}% hit rate)"
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        if self.directory.is_dir():
+            for path in self.directory.glob("??/*"):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * _EVICT_TARGET
+        evicted = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            evicted += 1
+        self._size = size
+        log.debug("Evicted %d entries from the %s cache", evicted, self.directory.name)
+
+
+def open_cache(name: str, max_mb: float) -> DiskCache | None:
+    """Return the cache under .cache/name, or None when max_mb is 0."""
+    if not max_mb:
+        return None
+    return DiskCache(CACHE_DIR / name, int(max_mb * 1024 * 1024))
@@ -0,0 +1,180 @@
+"""
+Append-only change feed of new, regenerated and refreshed documents.
+
+Every document written by the fetch loop, regeneration or the freshness
+sweep appends one event to ``state/feed/``: a JSON line with a monotonic
+sequence number, the time, the kind of change (``new``, ``regenerated`` or
+``refreshed``), the symbol, the path under documents/, the sha256 of the
+written file and its extract version.  Events go to segment files named
+after their first sequence number (``000000000001.ndjson``); a new segment
+starts every ``segment_events`` events, so a consumer holding a cursor
+opens only the segments after it.
+
+Consumers call ``read_changes(FEED_DIR, cursor)`` and store the ``seq`` of
+the last event they handled as their next cursor.  Writers in several
+processes serialize their appends with a lock file next to the feed
+directory.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from bisect import bisect_right
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+
+from storage import file_lock
+
+log = logging.getLogger("railcar.changefeed")
+
+FEED_DIR = Path(__file__).resolve().parent.parent / "state" / "feed"
+
+NEW = "new"
+REGENERATED = "regenerated"
+REFRESHED = "refreshed"
+
+_SEGMENT_SUFFIX = ".ndjson"
+
+
+def _segments(directory: Path) -> list[tuple[int, Path]]:
+    """(first sequence number, path) of each segment, in order."""
+    segments = []
+    if directory.is_dir():
+        for path in directory.glob(f"*{_SEGMENT_SUFFIX}"):
+            if path.stem.isdigit():
+                segments.append((int(path.stem), path))
+    return sorted(segments)
+
+
+def _read_segment(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # torn final line from a crash mid-append
+            yield json.loads(line)
+
+
+class ChangeFeed:
+    """Writer of the change feed.
+
+    Several processes may write to one feed directory (backfill workers
+    sharing a checkout): each append holds an exclusive lock on the
+    feed's lock file and first catches up with the events others
+    appended, so sequence numbers stay unique and in order.
+    """
+
+    def __init__(self, directory: Path = FEED_DIR, segment_events: int = 10000):
+        self.directory = directory
+        self.segment_events = max(1, segment_events)
+        self._lock = threading.Lock()
+        self._lock_path = directory.with_name(directory.name + ".lock")
+        self._fh = None
+        # The last segment as far as read: its path, bytes read and event count
+        self._path: Path | None = None
+        self._offset = 0
+        self._segment_count = 0
+        self.last_seq = 0
+
+        with self._lock, file_lock(self._lock_path):
+            segments = _segments(directory)
+            if segments:
+                self._truncate_torn_line(segments[-1][1])
+            self._catch_up()
+
+    @staticmethod
+    def _truncate_torn_line(path: Path) -> None:
+        data = path.read_bytes()
+        if data and not data.endswith(b"\n"):
+            with open(path, "r+b") as f:
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _catch_up(self) -> None:
+        """Read the events appended to the last segment since we last looked."""
+        segments = _segments(self.directory)
+        if not segments:
+            return
+        first, path = segments[-1]
+        if path != self._path:
+            self._path, self._offset, self._segment_count = path, 0, 0
+            self.last_seq = first - 1
+        elif path.stat().st_size == self._offset:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self.last_seq = json.loads(line)["seq"]
+                self._segment_count += 1
+                self._offset += len(line)
+
+    def append(self, kind: str, symbol: str, path: str, content: bytes,
+               extract_version: str) -> int:
+        """Record a written document and return its sequence number."""
+        with self._lock, file_lock(self._lock_path):
+            self._catch_up()
+            if self._path is None or self._segment_count >= self.segment_events:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._path = self.directory / f"{self.last_seq + 1:012d}{_SEGMENT_SUFFIX}"
+                self._offset = self._segment_count = 0
+            if self._fh is None or self._fh.name != str(self._path):
+                if self._fh is not None:
+                    self._fh.close()
+                self._fh = open(self._path, "ab")
+            self.last_seq += 1
+            event = {
+                "seq": self.last_seq,
+                "time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "kind": kind,
+                "symbol": symbol,
+                "path": path,
+                "sha256": hashlib.sha256(content).hexdigest(),
+                "extract_version": extract_version,
+            }
+            line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+            self._fh.write(line)
+            self._fh.flush()
+            self._offset += len(line)
+            self._segment_count += 1
+            return self.last_seq
+
+    def sync(self) -> None:
+        """Make appended events durable."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self.sync()
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def last_sequence(directory: Path = FEED_DIR) -> int:
+    """Return the sequence number of the last event in the feed, 0 if empty."""
+    segments = _segments(directory)
+    if not segments:
+        return 0
+    first, path = segments[-1]
+    last = first - 1
+    for event in _read_segment(path):
+        last = event["seq"]
+    return last
+
+
+def read_changes(directory: Path = FEED_DIR, cursor: int = 0) -> Iterator[dict]:
+    """Yield the events with a sequence number greater than cursor, in order."""
+    segments = _segments(directory)
+    firsts = [first for first, _ in segments]
+    # The segment holding cursor + 1 is the last one starting at or before it
+    start = max(0, bisect_right(firsts, cursor + 1) - 1)
+    for _, path in segments[start:]:
+        for event in _read_segment(path):
+            if event["seq"] > cursor:
+                yield event
@@ -0,0 +1,247 @@
+"""
+A/B comparison of the cleaning pipeline across the corpus.
+
+Runs ``clean_text`` from two versions of extract.py over every document
+body, as ``regenerate_all`` would after an EXTRACT_VERSION bump, and
+reports what would change without writing anything: the number of changed
+files, lines added and removed, which stages of the pipeline differ, the
+throughput of each version and a sample of diffs.
+
+The baseline is extract.py at a git ref (HEAD by default) or a file; the
+candidate is the working tree's extract.py or a file.  Documents are
+compared in a process pool.  The other modules extract.py imports are
+taken from the working tree for both versions.
+
+Usage:
+    python compare.py [--baseline REF|FILE] [--candidate FILE] [--pattern ID]
+                      [--workers N] [--samples N]
+"""
+
+import argparse
+import difflib
+import importlib.util
+import inspect
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from frontmatter import read_body, read_header
+from headers import HeaderTemplates
+from regenerate import DOCS_DIR
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+HEADERS_PATH = SCRIPTS_DIR.parent / "state" / "headers.json"
+
+SIDES = ("baseline", "candidate")
+
+# Per worker process: the two pipelines and the header templates
+_WORKER: dict = {}
+
+
+def load_pipeline(name: str, path: Path):
+    """Import an extract.py from path as a module called name.
+
+    Its ``_run_stage`` hook is replaced so the output of every stage of the
+    last ``clean_text`` call is kept in ``traced_stages``.
+    """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Versions before learned header templates take the text only
+    module.takes_headers = len(inspect.signature(module.clean_text).parameters) > 1
+    module.traced_stages = {}
+    if hasattr(module, "_run_stage"):
+        def run_stage(cache, stage, func, *args):
+            result = func(*args)
+            module.traced_stages[stage] = result
+            return result
+
+        module._run_stage = run_stage
+    return module
+
+
+def _init_worker(baseline: Path, candidate: Path, docs_dir: Path, headers_path: Path,
+                 sample_lines: int) -> None:
+    _WORKER["docs_dir"] = docs_dir
+    _WORKER["baseline"] = load_pipeline("extract_baseline", baseline)
+    _WORKER["candidate"] = load_pipeline("extract_candidate", candidate)
+    _WORKER["templates"] = HeaderTemplates(headers_path)
+    _WORKER["sample_lines"] = sample_lines
+
+
+def _stage_text(result) -> str | None:
+    if result is None or isinstance(result, str):
+        return result
+    return "\n".join(result)
+
+
+def line_delta(old: str, new: str) -> tuple[int, int]:
+    """Return (lines added, lines removed) going from old to new."""
+    added = removed = 0
+    matcher = difflib.SequenceMatcher(None, old.splitlines(), new.splitlines())
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            removed += i2 - i1
+            added += j2 - j1
+    return added, removed
+
+
+def compare_document(path: Path) -> dict:
+    """Clean one document with both pipelines and describe the difference."""
+    rel = path.relative_to(_WORKER["docs_dir"]).as_posix()
+    metadata, body_offset = read_header(path)
+    if "symbol" not in metadata:
+        return {"path": rel, "skipped": True}
+    body = read_body(path, body_offset)
+    header_lines = _WORKER["templates"].header_lines(rel.split("/")[0], metadata["symbol"],
+                                                     metadata.get("language", "EN"))
+
+    outputs, seconds, stages = {}, {}, {}
+    for side in SIDES:
+        module = _WORKER[side]
+        module.traced_stages = {}
+        start = time.perf_counter()
+        if module.takes_headers:
+            outputs[side] = module.clean_text(body, header_lines)
+        else:
+            outputs[side] = module.clean_text(body)
+        seconds[side] = time.perf_counter() - start
+        stages[side] = module.traced_stages
+
+    result = {"path": rel, "skipped": False, "chars": len(body), "seconds": seconds,
+              "changed": outputs["baseline"] != outputs["candidate"]}
+    if not result["changed"]:
+        return result
+
+    result["lines"] = line_delta(outputs["baseline"], outputs["candidate"])
+    result["stages"] = {}
+    for name in dict.fromkeys([*stages["baseline"], *stages["candidate"]]):
+        old = _stage_text(stages["baseline"].get(name))
+        new = _stage_text(stages["candidate"].get(name))
+        if old != new:
+            result["stages"][name] = line_delta(old or "", new or "")
+    result["diff"] = list(islice(
+        difflib.unified_diff(outputs["baseline"].splitlines(), outputs["candidate"].splitlines(),
+                             f"baseline/{rel}", f"candidate/{rel}", lineterm=""),
+        _WORKER["sample_lines"]))
+    return result
+
+
+def compare(paths: Iterable[Path], baseline: Path, candidate: Path, workers: int | None = None,
+            samples: int = 5, sample_lines: int = 40, docs_dir: Path = DOCS_DIR,
+            headers_path: Path = HEADERS_PATH) -> dict:
+    """Compare the two pipelines over paths and return aggregate statistics."""
+    summary = {
+        "documents": 0, "skipped": 0, "changed": 0, "chars": 0,
+        "lines_added": 0, "lines_removed": 0,
+        "seconds": dict.fromkeys(SIDES, 0.0),
+        "stages": {},
+        "samples": [],
+    }
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(baseline, candidate, docs_dir, headers_path,
+                                       sample_lines)) as pool:
+        for result in pool.map(compare_document, paths, chunksize=8):
+            if result["skipped"]:
+                summary["skipped"] += 1
+                continue
+            summary["documents"] += 1
+            summary["chars"] += result["chars"]
+            for side in SIDES:
+                summary["seconds"][side] += result["seconds"][side]
+            if not result["changed"]:
+                continue
+            summary["changed"] += 1
+            summary["lines_added"] += result["lines"][0]
+            summary["lines_removed"] += result["lines"][1]
+            for i, (name, (added, removed)) in enumerate(result["stages"].items()):
+                stats = summary["stages"].setdefault(
+                    name, {"files": 0, "first": 0, "added": 0, "removed": 0})
+                stats["files"] += 1
+                stats["first"] += i == 0
+                stats["added"] += added
+                stats["removed"] += removed
+            if len(summary["samples"]) < samples:
+                summary["samples"].append(result["diff"])
+    summary["wall_seconds"] = time.perf_counter() - start
+    return summary
+
+
+def format_report(summary: dict, baseline: str, candidate: str) -> str:
+    """Render a comparison summary as a human-readable report."""
+    n = summary["documents"]
+    lines = [
+        f"Baseline:  {baseline}",
+        f"Candidate: {candidate}",
+        "",
+        f"{n} document(s) compared, {summary['skipped']} skipped "
+        f"in {summary['wall_seconds']:.1f}s",
+        f"{summary['changed']} changed: +{summary['lines_added']} "
+        f"-{summary['lines_removed']} lines",
+    ]
+    if summary["stages"]:
+        lines.append("")
+        lines.append("Stages whose output differs (first = earliest differing stage):")
+        for name, stats in summary["stages"].items():
+            lines.append(f"  {name:20s}{stats['files']:6d} files {stats['first']:6d} first "
+                         f"+{stats['added']} -{stats['removed']} lines")
+    lines.append("")
+    lines.append("Throughput (CPU time of clean_text):")
+    mb = summary["chars"] / 1e6
+    for side in SIDES:
+        secs = summary["seconds"][side]
+        rate = f"{n / secs:.0f} docs/s, {mb / secs:.1f} M chars/s" if secs else "n/a"
+        lines.append(f"  {side:10s}{secs:8.2f}s  {rate}")
+    for diff in summary["samples"]:
+        lines.append("")
+        lines.extend(diff)
+    return "\n".join(lines)
+
+
+def baseline_source(spec: str, directory: Path) -> Path:
+    """Return the baseline extract.py: spec itself if it is a file, else spec as a git ref."""
+    if Path(spec).is_file():
+        return Path(spec)
+    source = subprocess.run(
+        ["git", "show", f"{spec}:scripts/extract.py"],
+        cwd=SCRIPTS_DIR, capture_output=True, check=True,
+    ).stdout
+    path = directory / "extract_baseline.py"
+    path.write_bytes(source)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare two versions of the cleaning pipeline across the corpus.")
+    parser.add_argument("--baseline", default="HEAD",
+                        help="git ref or file of the baseline extract.py (default HEAD)")
+    parser.add_argument("--candidate", default=str(SCRIPTS_DIR / "extract.py"),
+                        help="candidate extract.py (default: the working tree's)")
+    parser.add_argument("--pattern", help="only compare documents of this pattern ID")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--samples", type=int, default=5,
+                        help="number of changed documents to show diffs of")
+    args = parser.parse_args()
+
+    root = DOCS_DIR / args.pattern if args.pattern else DOCS_DIR
+    paths = sorted(root.rglob("*.md"))
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            baseline = baseline_source(args.baseline, Path(tmp))
+        except subprocess.CalledProcessError as e:
+            sys.exit(f"Cannot read extract.py at {args.baseline}: {e.stderr.decode().strip()}")
+        summary = compare(paths, baseline, Path(args.candidate), args.workers, args.samples)
+    print(format_report(summary, args.baseline, args.candidate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Offset index of a document's paragraphs, operative clauses, annexes and footnotes.
+
+Extraction writes a small JSON sidecar next to each document
+(``A_RES_80_5.md`` -> ``A_RES_80_5.idx.json``) holding the byte offsets of
+every paragraph of the body, the paragraph each numbered clause (``12.``)
+starts, where each annex starts and where each ``[^n]`` footnote
+definition is.  A consumer after "paragraph 12 of A/RES/80/39" loads the
+sidecar and reads just those bytes of the document, without parsing the
+rest of it.
+
+Paragraphs are runs of non-blank lines.  Clause numbers restart in each
+annex, so clauses are looked up per section: 0 for the resolution itself,
+1 for the first annex and so on.  A sidecar records the size, modification
+time and sha256 of the file it was built from.  It is current if the size
+matches and either the modification time or, failing that (e.g. after a
+git checkout), the hash does; ``load_index`` rebuilds one that is not.
+Runs only index documents without a sidecar (see regenerate_all): every
+write of a document rewrites its sidecar.
+
+Run directly (``python docindex.py``) to build missing or stale sidecars
+for the whole corpus.
+"""
+
+import hashlib
+import json
+import logging
+import re
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+
+from frontmatter import read_header
+from storage import atomic_write_text
+
+log = logging.getLogger("railcar.docindex")
+
+# Bump when the sidecar layout or the parsing rules change
+INDEX_VERSION = 2
+
+SIDECAR_SUFFIX = ".idx.json"
+
+_RE_CLAUSE = re.compile(rb"(\d{1,3})\.\s")
+_RE_ANNEX = re.compile(rb"Annex(?:es)?\b(?:\s+([IVXLC]+)\b)?")
+_RE_FOOTNOTE = re.compile(rb"\[\^([^\]\s]+)\]:\s")
+_FOOTNOTE_SEPARATOR = b"---"
+
+
+def sidecar_path(path: Path) -> Path:
+    """Return the index sidecar of a document file."""
+    return path.with_name(path.stem + SIDECAR_SUFFIX)
+
+
+class DocumentIndex:
+    """Byte offsets into one document file, with random access by number."""
+
+    __slots__ = ("path", "size", "mtime_ns", "sha256", "paragraphs", "annexes", "clauses",
+                 "footnotes")
+
+    def __init__(self, path: Path, size: int, mtime_ns: int, sha256: str, paragraphs: array,
+                 annexes: list[int], clauses: list[dict[int, int]],
+                 footnotes: dict[str, tuple[int, int]]):
+        self.path = path
+        # The file the index was built from
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = sha256
+        # Flat [start0, end0, start1, end1, ...] byte offsets
+        self.paragraphs = paragraphs
+        # Index of the first paragraph of each annex
+        self.annexes = annexes
+        # Per section: clause number -> paragraph index
+        self.clauses = clauses
+        # Footnote label -> (start, end) byte offsets of its definition
+        self.footnotes = footnotes
+
+    def __len__(self) -> int:
+        return len(self.paragraphs) // 2
+
+    def _read(self, start: int, end: int) -> str:
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode("utf-8")
+
+    def paragraph(self, i: int) -> str:
+        """Return the text of the i-th paragraph of the body (0-based)."""
+        if not 0 <= i < len(self):
+            raise IndexError(f"paragraph {i} out of range")
+        return self._read(self.paragraphs[2 * i], self.paragraphs[2 * i + 1])
+
+    def section(self, i: int) -> int:
+        """Return the section of the i-th paragraph: 0 before the first annex, else its annex."""
+        return bisect_right(self.annexes, i)
+
+    def clause(self, number: int, annex: int = 0) -> str | None:
+        """Return the paragraph starting clause *number* of a section, or None."""
+        if annex >= len(self.clauses):
+            return None
+        i = self.clauses[annex].get(number)
+        return None if i is None else self.paragraph(i)
+
+    def footnote(self, label: str | int) -> str | None:
+        """Return the definition of footnote ``[^label]``, or None."""
+        span = self.footnotes.get(str(label))
+        return None if span is None else self._read(*span)
+
+    def to_json(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "sha256": self.sha256,
+            "paragraphs": self.paragraphs.tolist(),
+            "annexes": self.annexes,
+            "clauses": [sorted(section.items()) for section in self.clauses],
+            "footnotes": self.footnotes,
+        }
+
+    @classmethod
+    def from_json(cls, path: Path, data: dict) -> "DocumentIndex":
+        return cls(
+            path, data["size"], data["mtime_ns"], data["sha256"],
+            array("q", data["paragraphs"]), data["annexes"],
+            [{number: i for number, i in section} for section in data["clauses"]],
+            {label: tuple(span) for label, span in data["footnotes"].items()},
+        )
+
+
+def _blocks(data: bytes, offset: int):
+    """Yield (start, end) of each run of non-blank lines from offset on."""
+    start = None
+    pos = offset
+    while pos < len(data):
+        nl = data.find(b"\n", pos)
+        end = len(data) if nl < 0 else nl
+        if data[pos:end].strip():
+            if start is None:
+                start = pos
+            last = end
+        elif start is not None:
+            yield start, last
+            start = None
+        pos = end + 1
+    if start is not None:
+        yield start, last
+
+
+def build_index(path: Path) -> DocumentIndex:
+    """Parse a document file into its offset index."""
+    _, body_offset = read_header(path)
+    mtime_ns = path.stat().st_mtime_ns
+    data = path.read_bytes()
+
+    paragraphs = array("q")
+    annexes: list[int] = []
+    clauses: list[dict[int, int]] = [{}]
+    footnotes: dict[str, tuple[int, int]] = {}
+    in_footnotes = False
+    for start, end in _blocks(data, body_offset):
+        block = data[start:end]
+        if block.strip() == _FOOTNOTE_SEPARATOR:
+            in_footnotes = True
+            continue
+        if in_footnotes:
+            # A block may hold several definitions, one per line
+            label = None
+            pos = start
+            for line in block.split(b"\n"):
+                m = _RE_FOOTNOTE.match(line)
+                if m:
+                    label = m.group(1).decode("utf-8")
+                    footnotes[label] = (pos, pos + len(line))
+                elif label is not None:
+                    footnotes[label] = (footnotes[label][0], pos + len(line))
+                pos += len(line) + 1
+            continue
+
+        i = len(paragraphs) // 2
+        paragraphs.extend((start, end))
+        if _RE_ANNEX.match(block):
+            annexes.append(i)
+            clauses.append({})
+        m = _RE_CLAUSE.match(block)
+        if m:
+            clauses[-1].setdefault(int(m.group(1)), i)
+
+    return DocumentIndex(path, len(data), mtime_ns, hashlib.sha256(data).hexdigest(),
+                         paragraphs, annexes, clauses, footnotes)
+
+
+def write_index(path: Path) -> DocumentIndex:
+    """Build a document's index and write its sidecar."""
+    index = build_index(path)
+    atomic_write_text(sidecar_path(path), json.dumps(index.to_json(), separators=(",", ":")))
+    return index
+
+
+def _current_sidecar(path: Path) -> dict | None:
+    """Return the sidecar data of a document if it matches the file, else None."""
+    try:
+        data = json.loads(sidecar_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    st = path.stat()
+    if data.get("version") != INDEX_VERSION or data.get("size") != st.st_size:
+        return None
+    if data.get("mtime_ns") == st.st_mtime_ns:
+        return data
+    # Touched since (a checkout, or a same-size edit): compare the content
+    if data.get("sha256") != hashlib.sha256(path.read_bytes()).hexdigest():
+        return None
+    return data
+
+
+def load_index(path: Path) -> DocumentIndex:
+    """Return a document's index from its sidecar, rebuilding a missing or stale one."""
+    data = _current_sidecar(path)
+    if data is None:
+        return write_index(path)
+    return DocumentIndex.from_json(path, data)
+
+
+def ensure_index(path: Path) -> bool:
+    """Write a document's sidecar if it is missing or stale; return True if written."""
+    if _current_sidecar(path) is not None:
+        return False
+    write_index(path)
+    return True
+
+
+def index_all(docs_dir: Path) -> int:
+    """Build the sidecar of every document whose sidecar is missing or stale.
+
+    Returns the number of sidecars written.
+    """
+    written = sum(ensure_index(path) for path in sorted(docs_dir.rglob("*.md")))
+    log.info("Indexed %d document(s)", written)
+    return written
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    index_all(Path(__file__).resolve().parent.parent / "documents")
@@ -0,0 +1,158 @@
+"""
+Resumable HTTP downloads.
+
+The body is streamed to a partial file named after the URL's hash.  When an
+attempt dies part-way (timeout, connection reset, short read) the next one
+sends ``Range: bytes=<size>-`` if the server advertised ``Accept-Ranges:
+bytes``, with ``If-Range`` set to the ETag (or Last-Modified) seen at the
+start so a changed file is sent whole instead of being spliced.  The final
+size is checked against the length the server announced.  Partial files are
+kept when a download gives up, so the next run resumes it too.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from pathlib import Path
+
+from storage import atomic_write_text
+
+log = logging.getLogger("railcar.downloads")
+
+CHUNK_BYTES = 256 * 1024
+
+_RE_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-\d+/(\d+|\*)")
+
+
+def partial_paths(directory: Path, url: str) -> tuple[Path, Path]:
+    """Return the partial data file and its metadata file for a URL."""
+    name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+    return directory / f"{name}.part", directory / f"{name}.json"
+
+
+def validators_from_headers(headers) -> dict:
+    """Return the ETag and Last-Modified of a response in front matter form.
+
+    ETags are stored without their quotes (``W/`` kept for weak tags)
+    because front matter values are quote-stripped when parsed.
+    """
+    etag = headers.get("ETag", "")
+    if etag.startswith("W/"):
+        etag = "W/" + etag[2:].strip('"')
+    else:
+        etag = etag.strip('"')
+    return {"source_etag": etag, "source_last_modified": headers.get("Last-Modified", "")}
+
+
+def conditional_headers(metadata: dict) -> dict:
+    """Return If-None-Match / If-Modified-Since headers from front matter validators."""
+    headers = {}
+    etag = metadata.get("source_etag", "")
+    if etag:
+        headers["If-None-Match"] = (f'W/"{etag[2:]}"' if etag.startswith("W/")
+                                    else f'"{etag}"')
+    if metadata.get("source_last_modified"):
+        headers["If-Modified-Since"] = metadata["source_last_modified"]
+    return headers
+
+
+def _discard(*paths: Path) -> None:
+    for path in paths:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _read_meta(meta_path: Path) -> dict:
+    """Return a partial file's metadata, or {} if it is missing or unreadable."""
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def resumable_download(get, url: str, directory: Path, max_retries: int = 3,
+                       sleep=time.sleep, validators: dict | None = None) -> bytes | None:
+    """Download url with get (a ``requests``-style GET), resuming after failures.
+
+    Returns the body, or None on 404 or after max_retries attempts that made
+    no progress.  Attempts that added data do not count as failures.  The
+    file's ETag and Last-Modified are stored into *validators* if given.
+    """
+    import requests
+
+    part, meta_path = partial_paths(directory, url)
+    directory.mkdir(parents=True, exist_ok=True)
+    failures = 0
+    while True:
+        meta = _read_meta(meta_path) if part.exists() else {}
+        offset = part.stat().st_size if meta.get("ranges") and part.exists() else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+            log.info("Resuming %s at byte %d", url, offset)
+
+        before = offset
+        try:
+            resp = get(url, timeout=120, stream=True, headers=headers)
+            if resp.status_code == 404:
+                _discard(part, meta_path)
+                return None
+            if resp.status_code == 416 and offset:
+                # Our partial data does not fit the current file; start over now
+                log.info("Range rejected for %s, restarting from zero", url)
+                _discard(part, meta_path)
+                continue
+            resp.raise_for_status()
+
+            m = _RE_CONTENT_RANGE.match(resp.headers.get("Content-Range", ""))
+            if resp.status_code == 206 and offset and m and int(m.group(1)) == offset:
+                mode = "ab"
+                total = int(m.group(2)) if m.group(2) != "*" else meta.get("length")
+            else:
+                # A full response, also when If-Range found the file changed
+                mode = "wb"
+                before = 0
+                encoded = bool(resp.headers.get("Content-Encoding"))
+                length = resp.headers.get("Content-Length")
+                total = int(length) if length and not encoded else None
+                meta = {
+                    "validators": validators_from_headers(resp.headers),
+                    "etag": resp.headers.get("ETag", ""),
+                    "last_modified": resp.headers.get("Last-Modified", ""),
+                    "ranges": resp.headers.get("Accept-Ranges", "") == "bytes" and not encoded,
+                    "length": total,
+                }
+                atomic_write_text(meta_path, json.dumps(meta), sync=False)
+
+            with open(part, mode) as f:
+                for chunk in resp.iter_content(CHUNK_BYTES):
+                    f.write(chunk)
+
+            size = part.stat().st_size
+            if total is not None and size != total:
+                if size > total:
+                    _discard(part, meta_path)
+                raise requests.ConnectionError(f"got {size} of {total} bytes")
+            data = part.read_bytes()
+            _discard(part, meta_path)
+            if validators is not None:
+                validators.update(meta["validators"])
+            return data
+        except requests.RequestException as e:
+            progressed = bool(meta.get("ranges")) and part.exists() and part.stat().st_size > before
+            if not progressed:
+                failures += 1
+            if failures >= max_retries:
+                log.error("Download failed after %d attempts for %s: %s", failures, url, e)
+                return None
+            wait = 2 ** failures
+            log.warning("Download of %s interrupted: %s. %s in %ds...", url, e,
+                        "Resuming" if progressed else "Retrying", wait)
+            sleep(wait)
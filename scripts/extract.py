@@ -3,16 +3,61 @@ Versioned text extraction for UN PDF documents.
 
 The EXTRACT_VERSION is embedded in every output file's YAML front matter.
 Bump this version whenever the extraction or cleanup logic changes, so
-we can identify which files need re-processing.
+we can identify which files need re-processing.  The stages of
+``clean_text`` are also versioned individually in STAGE_VERSIONS and their
+results can be memoized in a stage cache, keyed by each stage's input and
+version.
+
+The cache does not make regeneration recompute only the stages after a
+change.  Regeneration starts from the stored body, which is the previous
+version's output, so after any bump the first stage sees an input it has
+never seen and always misses.  A later stage hits only when its input
+happens to come out as before.  Keying the chain on a stable input would
+take the raw extracted text, which is not kept.  The cache pays off when the
+same input is cleaned again, e.g. a regeneration that was interrupted or
+a document fetched twice.
+
+PyMuPDF is only imported when a PDF is actually extracted, so the cleaning
+functions used by regeneration load quickly.
 """
 
+import json
 import re
+import tempfile
+from collections.abc import Iterable, Iterator
 from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from typing import TextIO
 
-import fitz  # PyMuPDF
+from cache import content_key
+from frontmatter import parse_front_matter
 
 EXTRACT_VERSION = "1.3.0"
 
+# Per-stage versions of the clean_text pipeline.  When a stage changes, bump
+# its version here as well as EXTRACT_VERSION; cached results keyed on an
+# older version are not used.
+STAGE_VERSIONS = {
+    "relocate_footnotes": "1",
+    "learned_headers": "1",
+    "clean": "1",
+    "footnote_refs": "1",
+    "footnote_defs": "1",
+}
+
+# Optional front matter fields describing the source PDF
+SOURCE_KEYS = ("source_sha256", "source_etag", "source_last_modified")
+
+# Pages sampled for running-header detection in streaming extraction
+HEADER_SAMPLE_PAGES = 8
+
+# Known (learned) header lines are only stripped this close to a page edge
+HEADER_EDGE_LINES = 3
+
+# Read size when copying spilled text in streaming extraction
+_STREAM_CHUNK_CHARS = 64 * 1024
+
 # Matches UN distribution codes like "25-15106 (E)", "25-15106", or "*2515106*"
 _RE_DIST_CODE = re.compile(r"^\d{2}-\d{5}(\s*\([A-Z]\))?\s*$")
 _RE_DIST_STAR = re.compile(r"^\*\d+\*\s*$")
@@ -38,6 +83,28 @@ _RE_FOOTNOTE_DEF_PARTS = re.compile(r"^(\d+)\s+(.*)")
 # Matches a UN document symbol in a page header line
 _RE_PAGE_HEADER = re.compile(r"[A-Z]/RES/\d+/\d+")
 
+# Inline footnote reference: a letter (Latin, Arabic or CJK) immediately
+# followed by digits and then whitespace, punctuation or end of text.  The
+# digits are filled in per document with the known footnote numbers.
+_FOOTNOTE_REF_LETTER = r"[a-zA-Z\u0600-\u06ff\u3400-\u9fff]"
+_FOOTNOTE_REF_END = r"(?=[\s,;.!?\)\]\u060c\u061b\u3001\u3002\uff09\uff0c\uff1b]|$)"
+
+# Runs of three or more newlines
+_RE_BLANK_RUN = re.compile(r"\n{3,}")
+
+# A line starting like a document symbol, e.g. "A/RES/80/1"
+_RE_SYMBOL_START = re.compile(r"^[A-Z]/")
+
+# Characters that end a line without the paragraph continuing: Latin
+# punctuation plus the Arabic (، ؛ ؟ ۔) and CJK full-width equivalents
+_TERMINAL_PUNCT = ".;:,!?\"'\u060c\u061b\u061f\u06d4\u3001\u3002\uff01\uff0c\uff1a\uff1b\uff1f\u300d\u300f"
+
+# Characters that open a parenthetical line such as "(a)"
+_OPEN_PARENS = "(\uff08"
+
+# CJK ideographs, kana and full-width forms, written without word spaces
+_RE_CJK = re.compile(r"[\u3000-\u30ff\u3400-\u9fff\uff00-\uffef]")
+
 
 def get_version() -> str:
     return EXTRACT_VERSION
@@ -81,6 +148,34 @@ def _collect_footnote_nums(text: str) -> set[str]:
     return nums
 
 
+@lru_cache(maxsize=64)
+def _footnote_ref_pattern(footnote_nums: frozenset[str]) -> re.Pattern:
+    """Compile a pattern matching references to exactly these footnote numbers.
+
+    The numbers are compiled as a digit trie so matching costs at most one
+    branch per digit however many footnotes there are.  The lookahead
+    requires a non-digit after the number, so only complete digit runs
+    match, as with a generic ``\\d+`` followed by a set lookup.
+    """
+    trie: dict = {}
+    for num in footnote_nums:
+        node = trie
+        for digit in num:
+            node = node.setdefault(digit, {})
+        node[""] = {}
+    return re.compile(f"({_FOOTNOTE_REF_LETTER})({_trie_regex(trie)}){_FOOTNOTE_REF_END}")
+
+
+def _trie_regex(node: dict) -> str:
+    """Render a digit trie as a regular expression."""
+    branches = [digit + _trie_regex(child) for digit, child in sorted(node.items()) if digit]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    # A number may end here or continue with more digits
+    return f"(?:{body})?" if "" in node else body
+
+
 def _convert_footnote_refs(body: str, footnote_nums: set[str]) -> str:
     """Convert inline footnote references to GitHub markdown format.
 
@@ -89,48 +184,107 @@ def _convert_footnote_refs(body: str, footnote_nums: set[str]) -> str:
     """
     if not footnote_nums:
         return body
+    return _footnote_ref_pattern(frozenset(footnote_nums)).sub(r"\1[^\2]", body)
+
 
-    def _replace_ref(m: re.Match) -> str:
-        num = m.group(2)
-        if num in footnote_nums:
-            return f"{m.group(1)}[^{num}]"
-        return m.group(0)
+def _convert_footnote_refs_stream(chunks: Iterable[str], footnote_nums: set[str]) -> Iterator[str]:
+    """Streaming form of ``_convert_footnote_refs`` for a body read in chunks.
 
-    return re.sub(r"([a-zA-Z])(\d+)(?=[\s,;.!?\)\]]|$)", _replace_ref, body)
+    Text after the last whitespace of each chunk is held back and prepended
+    to the next one, so a reference split across chunks is still linked.
+    The concatenated output equals converting the joined input at once.
+    """
+    if not footnote_nums:
+        yield from chunks
+        return
+    pattern = _footnote_ref_pattern(frozenset(footnote_nums))
+    carry = ""
+    for chunk in chunks:
+        text = carry + chunk
+        cut = max(text.rfind(" "), text.rfind("\n")) + 1
+        if cut == 0:
+            carry = text
+            continue
+        carry = text[cut:]
+        yield pattern.sub(r"\1[^\2]", text[:cut])
+    if carry:
+        yield pattern.sub(r"\1[^\2]", carry)
 
 
-def clean_text(text: str) -> str:
+def clean_text(text: str, header_lines: set[str] | None = None, cache=None) -> str:
     """Re-apply the cleaning pipeline to already-extracted text.
 
     Use this when the extraction logic has changed and existing documents
     need to be reprocessed without re-downloading their PDFs.  Header
-    detection is skipped because page boundaries are no longer available.
+    detection is skipped because page boundaries are no longer available;
+    pass the series' learned *header_lines* to strip known running headers
+    where they stand alone between blank lines.
     Inline footnote blocks are relocated to the end of the document.
+
+    With a ``DiskCache`` as *cache*, each stage's result is memoized under
+    the hash of its inputs and its entry in STAGE_VERSIONS.
     """
-    body, footnotes = _relocate_inline_footnotes(text)
-    cleaned = _clean_text(body, header_lines=set())
+    body, footnotes = _run_stage(cache, "relocate_footnotes", _relocate_inline_footnotes, text)
+    body = _run_stage(cache, "learned_headers", _strip_standalone_lines, body,
+                      header_lines or set())
+    cleaned = _run_stage(cache, "clean", _clean_text, body, set())
     if footnotes:
         footnote_nums = _collect_footnote_nums(footnotes)
-        cleaned = _convert_footnote_refs(cleaned, footnote_nums)
-        footnotes = _format_footnote_defs(footnotes)
+        cleaned = _run_stage(cache, "footnote_refs", _convert_footnote_refs, cleaned, footnote_nums)
+        footnotes = _run_stage(cache, "footnote_defs", _format_footnote_defs, footnotes)
         return cleaned + "\n\n---\n\n" + footnotes
     return cleaned
 
 
-def extract_text(pdf_bytes: bytes) -> str:
+def _run_stage(cache, name: str, func, *args):
+    """Run one clean_text stage, through the stage cache if one is given.
+
+    Arguments are strings or sets of strings; the cache key covers their
+    content and the stage's version.
+    """
+    if cache is None:
+        return func(*args)
+    parts = (a if isinstance(a, str) else "\n".join(sorted(a)) for a in args)
+    key = content_key(name, STAGE_VERSIONS[name], *parts)
+    hit = cache.get_text(key)
+    if hit is not None:
+        return json.loads(hit)
+    result = func(*args)
+    cache.put_text(key, json.dumps(result, ensure_ascii=False))
+    return result
+
+
+def iter_pdf_pages(pdf_bytes: bytes) -> Iterator[str]:
+    """Yield the stripped text of each non-empty PDF page, one page at a time."""
+    import fitz  # PyMuPDF, imported here so cleaning-only runs never load it
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        for page in doc:
+            text = page.get_text("text")
+            if text.strip():
+                yield text.strip()
+    finally:
+        doc.close()
+
+
+def extract_text(pdf_bytes: bytes, header_lines: set[str] | None = None) -> str:
     """Extract text from PDF bytes using PyMuPDF.
 
     Returns cleaned plaintext with headers/footers removed, paragraphs joined,
     and common PDF artifacts cleaned up.  Footnotes from each page are
-    collected and placed at the end of the document.
+    collected and placed at the end of the document.  *header_lines* are
+    known running headers (e.g. learned for the series), stripped from the
+    first and last lines of each page in addition to those detected in the
+    document itself.
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    pages = []
-    for page in doc:
-        text = page.get_text("text")
-        if text.strip():
-            pages.append(text.strip())
-    doc.close()
+    return extract_text_with_headers(pdf_bytes, header_lines)[0]
+
+
+def extract_text_with_headers(pdf_bytes: bytes,
+                              header_lines: set[str] | None = None) -> tuple[str, set[str]]:
+    """Like ``extract_text``, also returning the header lines detected in the PDF."""
+    pages = list(iter_pdf_pages(pdf_bytes))
 
     # Separate footnotes from body text on each page
     body_parts = []
@@ -141,8 +295,9 @@ def extract_text(pdf_bytes: bytes) -> str:
         if footnotes:
             all_footnotes.append(footnotes)
 
-    raw = "\n\n".join(body_parts)
-    text = _clean_text(raw, _detect_header_lines(body_parts))
+    detected = _detect_header_lines(body_parts)
+    raw = "\n\n".join(_strip_page_edges(body, header_lines) for body in body_parts)
+    text = _clean_text(raw, detected)
 
     # Append collected footnotes at the end
     if all_footnotes:
@@ -152,7 +307,152 @@ def extract_text(pdf_bytes: bytes) -> str:
         footnote_text = _format_footnote_defs(footnote_text)
         text = text + "\n\n---\n\n" + footnote_text
 
-    return text.strip()
+    return text.strip(), {line for line in detected if _is_likely_header(line)}
+
+
+def detect_pdf_headers(pdf_bytes: bytes) -> set[str]:
+    """Return the running header lines of a PDF without cleaning its text."""
+    bodies = [_split_page_footnotes(page_text)[0] for page_text in iter_pdf_pages(pdf_bytes)]
+    return {line for line in _detect_header_lines(bodies) if _is_likely_header(line)}
+
+
+def extract_to_file(pdf_bytes: bytes, out: TextIO,
+                    header_sample_pages: int = HEADER_SAMPLE_PAGES,
+                    header_lines: set[str] | None = None) -> tuple[int, set[str]]:
+    """Streaming form of ``extract_text`` that writes the text to out.
+
+    Pages are read one at a time and their body lines pushed through an
+    incremental cleaner, so memory stays proportional to a page rather than
+    the document.  Running headers are detected from the first
+    *header_sample_pages* pages; for documents no longer than that the
+    output is identical to ``extract_text``.  Cleaned body text is spilled
+    to a temporary file until all footnote numbers are known, then linked
+    and copied to out.
+
+    Returns the number of characters written and the header lines detected
+    in the sample, as ``extract_text_with_headers`` does.
+    """
+    sample = [
+        _split_page_footnotes(page_text)[0]
+        for page_text in islice(iter_pdf_pages(pdf_bytes), header_sample_pages)
+    ]
+    detected = _detect_header_lines(sample)
+    cleaner = _StreamCleaner(detected)
+    del sample
+
+    footnote_nums: set[str] = set()
+    has_footnotes = False
+    written = 0
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as body_spill, \
+            tempfile.TemporaryFile("w+", encoding="utf-8") as footnote_spill:
+        for i, page_text in enumerate(iter_pdf_pages(pdf_bytes)):
+            body, footnotes = _split_page_footnotes(page_text)
+            body = _strip_page_edges(body, header_lines)
+            # Pages are separated by a blank line, as in extract_text
+            if i:
+                body_spill.writelines(cleaner.push(""))
+            for line in body.splitlines():
+                body_spill.writelines(cleaner.push(line))
+            if footnotes:
+                footnote_nums |= _collect_footnote_nums(footnotes)
+                if has_footnotes:
+                    footnote_spill.write("\n\n")
+                footnote_spill.write(_format_footnote_defs(footnotes))
+                has_footnotes = True
+        body_spill.writelines(cleaner.finish())
+
+        body_spill.seek(0)
+        chunks = iter(lambda: body_spill.read(_STREAM_CHUNK_CHARS), "")
+        for piece in _convert_footnote_refs_stream(chunks, footnote_nums):
+            out.write(piece)
+            written += len(piece)
+
+        if has_footnotes:
+            separator = "\n\n---\n\n" if written else "---\n\n"
+            out.write(separator)
+            written += len(separator)
+            footnote_spill.seek(0)
+            for chunk in iter(lambda: footnote_spill.read(_STREAM_CHUNK_CHARS), ""):
+                out.write(chunk)
+                written += len(chunk)
+
+    return written, {line for line in detected if _is_likely_header(line)}
+
+
+class _StreamCleaner:
+    """Incremental form of ``_clean_text``.
+
+    Lines are pushed one at a time; ``push`` and ``finish`` yield output
+    pieces as soon as no later line can change them.  Concatenated, the
+    pieces equal ``_clean_text`` over the same lines.
+    """
+
+    def __init__(self, header_lines: set[str]):
+        self.header_lines = header_lines
+        self._label: str | None = None  # standalone "1." / "(a)" awaiting its text
+        self._para: list[str] | None = None  # fragments of the last paragraph
+        self._started = False
+        self._blank = False
+
+    def push(self, line: str) -> Iterator[str]:
+        stripped = line.strip()
+        # Same per-line filters as _clean_text
+        if _RE_DIST_CODE.match(stripped) or _RE_DIST_STAR.match(stripped):
+            return
+        if _RE_PAGE_NUM.match(stripped):
+            return
+        if stripped in self.header_lines and _is_likely_header(stripped):
+            return
+        if _RE_FOOTNOTE_SEP.match(stripped):
+            stripped = "---"
+
+        # _join_paragraph_numbers: hold a label until the next line arrives
+        if self._label is not None:
+            label, self._label = self._label, None
+            if stripped:
+                yield from self._push_paragraph(f"{label} {stripped}")
+                return
+            yield from self._push_paragraph(label)
+        if _RE_PARA_NUM.match(stripped) or _RE_SUBPARA.match(stripped):
+            self._label = stripped
+            return
+        yield from self._push_paragraph(stripped)
+
+    def finish(self) -> Iterator[str]:
+        if self._label is not None:
+            yield from self._push_paragraph(self._label)
+            self._label = None
+        if self._para is not None:
+            yield from self._emit("".join(self._para))
+            self._para = None
+
+    def _push_paragraph(self, line: str) -> Iterator[str]:
+        """_join_paragraphs for one line."""
+        last = self._para[-1] if self._para else ""
+        if (
+            last
+            and line
+            and not last.endswith((":", "\uff1a"))
+            and _continues_previous(last, line)
+        ):
+            sep = "" if _RE_CJK.match(last[-1]) and _RE_CJK.match(line[0]) else " "
+            self._para.append(sep + line)
+            return
+        if self._para is not None:
+            yield from self._emit("".join(self._para))
+        self._para = [line]
+
+    def _emit(self, line: str) -> Iterator[str]:
+        """Collapse blank runs to one blank line and drop leading/trailing blanks."""
+        if not line:
+            self._blank = self._started
+            return
+        if self._started:
+            yield "\n\n" + line if self._blank else "\n" + line
+        else:
+            yield line
+        self._started = True
+        self._blank = False
 
 
 def _detect_header_lines(pages: list[str]) -> set[str]:
@@ -176,6 +476,35 @@ def _detect_header_lines(pages: list[str]) -> set[str]:
     return {line for line, count in line_page_count.items() if count > 1}
 
 
+def _strip_page_edges(page_text: str, header_lines: set[str] | None) -> str:
+    """Drop known header lines among the first and last HEADER_EDGE_LINES lines of a page."""
+    if not header_lines:
+        return page_text
+    lines = page_text.split("\n")
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    edges = set(filled[:HEADER_EDGE_LINES] + filled[-HEADER_EDGE_LINES:])
+    return "\n".join(line for i, line in enumerate(lines)
+                     if i not in edges or line.strip() not in header_lines)
+
+
+def _strip_standalone_lines(text: str, header_lines: set[str]) -> str:
+    """Drop known header lines that stand alone between blank lines.
+
+    Without page boundaries this is where a running header left at the top
+    or bottom of a page ends up; a line inside a paragraph is kept.
+    """
+    if not header_lines:
+        return text
+    lines = text.split("\n")
+    last = len(lines) - 1
+    return "\n".join(
+        line for i, line in enumerate(lines)
+        if not (line.strip() in header_lines
+                and (i == 0 or not lines[i - 1].strip())
+                and (i == last or not lines[i + 1].strip()))
+    )
+
+
 def _split_page_footnotes(page_text: str) -> tuple[str, str]:
     """Split a single page's text into (body, footnotes) at the footnote separator.
 
@@ -201,7 +530,8 @@ def _relocate_inline_footnotes(text: str) -> tuple[str, str]:
     """
     lines = text.split("\n")
     body_lines: list[str] = []
-    footnote_defs: list[str] = []
+    # Each definition is a list of lines, joined once at the end
+    footnote_defs: list[list[str]] = []
     i = 0
 
     while i < len(lines):
@@ -239,10 +569,10 @@ def _relocate_inline_footnotes(text: str) -> tuple[str, str]:
                 # Parse block into individual footnote definitions
                 for fn_line in fn_block:
                     if _RE_FOOTNOTE_DEF.match(fn_line):
-                        footnote_defs.append(fn_line)
+                        footnote_defs.append([fn_line])
                     elif footnote_defs:
                         # Continuation of previous multi-line footnote
-                        footnote_defs[-1] += " " + fn_line
+                        footnote_defs[-1].append(fn_line)
 
                 # Skip page header line if present
                 if j < len(lines) and _RE_PAGE_HEADER.search(
@@ -263,7 +593,7 @@ def _relocate_inline_footnotes(text: str) -> tuple[str, str]:
         i += 1
 
     body = "\n".join(body_lines)
-    footnotes = "\n\n".join(footnote_defs)
+    footnotes = "\n\n".join(" ".join(fn_lines) for fn_lines in footnote_defs)
     return body, footnotes
 
 
@@ -303,7 +633,7 @@ def _clean_text(text: str, header_lines: set[str]) -> str:
     text = _join_paragraphs(text)
 
     # Collapse runs of 3+ blank lines down to 2
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _RE_BLANK_RUN.sub("\n\n", text)
 
     return text.strip()
 
@@ -312,7 +642,7 @@ def _is_likely_header(line: str) -> bool:
     """Heuristic: a repeated line is a header/footer if it looks like a
     document symbol, short title, or distribution code."""
     # Document symbols like A/RES/80/1
-    if re.match(r"^[A-Z]/", line):
+    if _RE_SYMBOL_START.match(line):
         return True
     # Short lines (< 80 chars) that appear on multiple pages are likely headers
     if len(line) < 80:
@@ -348,24 +678,31 @@ def _join_paragraphs(text: str) -> str:
     - The previous line is non-empty and does not end with a paragraph break
       signal (colon, semicolon, period followed by a blank line)
     - The current line is non-empty and starts with a lowercase letter
+
+    Lines of CJK text are joined without a space.
     """
     lines = text.split("\n")
-    result: list[str] = []
+    # Each paragraph is kept as a list of fragments and joined once at the
+    # end, so a paragraph spanning many lines costs linear time.  The last
+    # fragment stands in for the paragraph in the continuation checks: it
+    # ends the same way, and "---" is never joined to anything.
+    result: list[list[str]] = []
 
     for line in lines:
         stripped = line.strip()
+        last = result[-1][-1] if result else ""
         if (
-            result
-            and stripped
-            and result[-1]
-            and not result[-1].endswith(":")
-            and _continues_previous(result[-1], stripped)
+            stripped
+            and last
+            and not last.endswith((":", "\uff1a"))
+            and _continues_previous(last, stripped)
         ):
-            result[-1] = result[-1] + " " + stripped
+            sep = "" if _RE_CJK.match(last[-1]) and _RE_CJK.match(stripped[0]) else " "
+            result[-1].append(sep + stripped)
         else:
-            result.append(stripped if stripped else "")
+            result.append([stripped])
 
-    return "\n".join(result)
+    return "\n".join("".join(fragments) for fragments in result)
 
 
 def _continues_previous(prev: str, curr: str) -> bool:
@@ -377,14 +714,15 @@ def _continues_previous(prev: str, curr: str) -> bool:
     if curr[0].islower():
         return True
     # Previous line ends mid-sentence (no terminal punctuation) and current
-    # starts with uppercase could be a proper noun continuation
-    if prev and prev[-1] not in ".;:,!?\"'" and not curr.startswith("("):
+    # starts with uppercase could be a proper noun continuation.  Arabic and
+    # CJK have no letter case, so for them this is the only signal.
+    if prev and prev[-1] not in _TERMINAL_PUNCT and not curr.startswith(tuple(_OPEN_PARENS)):
         return True
     return False
 
 
-def format_output(text: str, metadata: dict) -> str:
-    """Wrap extracted text with YAML front matter containing metadata and version info."""
+def format_front_matter(metadata: dict) -> str:
+    """Return the YAML front matter block (and blank line) that precedes the text."""
     now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     lines = [
         "---",
@@ -394,15 +732,26 @@ def format_output(text: str, metadata: dict) -> str:
         f"date: \"{metadata.get('date', '')}\"",
         f"language: {metadata.get('language', 'EN')}",
         f"source_pdf: {metadata.get('source_pdf', '')}",
+    ]
+    # Source validators, used by the freshness sweep, when known
+    for key in SOURCE_KEYS:
+        if metadata.get(key):
+            lines.append(f"{key}: \"{_escape_yaml(metadata[key])}\"")
+    lines += [
         f"extract_version: \"{EXTRACT_VERSION}\"",
         f"extracted_at: \"{now}\"",
         "---",
         "",
-        text,
+        "",
     ]
     return "\n".join(lines)
 
 
+def format_output(text: str, metadata: dict) -> str:
+    """Wrap extracted text with YAML front matter containing metadata and version info."""
+    return format_front_matter(metadata) + text
+
+
 def parse_document(content: str) -> tuple[dict, str]:
     """Parse a markdown file with YAML front matter into (metadata_dict, body_text).
 
@@ -417,17 +766,7 @@ def parse_document(content: str) -> tuple[dict, str]:
     front_matter = content[3:end].strip()
     body = content[end + 3:].lstrip("\n")
 
-    metadata = {}
-    for line in front_matter.splitlines():
-        if ":" not in line:
-            continue
-        key, _, value = line.partition(":")
-        value = value.strip().strip('"')
-        # Unescape YAML double-quoted values
-        value = value.replace('\\"', '"').replace("\\\\", "\\")
-        metadata[key.strip()] = value
-
-    return metadata, body
+    return parse_front_matter(front_matter.splitlines()), body
 
 
 def _escape_yaml(s: str) -> str:
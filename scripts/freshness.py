@@ -0,0 +1,133 @@
+"""
+Freshness sweep: find documents whose source PDF changed upstream.
+
+Every normal run ends with a sweep of up to ``freshness_run_budget``
+existing documents, and ``python fetch_documents.py --refresh`` checks up to
+``freshness_budget``; each continues from where the previous sweep stopped
+(the cursor is kept in ``state/freshness.json``), so the whole corpus is
+covered over successive runs.  A document whose check fails stops the
+cursor and is checked again by the next sweep.  For each document a conditional
+GET is sent to its ``source_pdf`` with the ``source_etag`` and
+``source_last_modified`` recorded in its front matter; a 304 costs no body.
+A full response is compared by sha256 with ``source_sha256`` and only a PDF
+whose bytes actually changed is re-extracted, and the rewrite is appended
+to the change feed.  Documents saved before these
+fields existed are baselined on their first check: the validators and hash
+are recorded without re-extraction.
+
+Checks run ``freshness_concurrency`` at a time, paced per host by the rate
+controller.
+"""
+
+import hashlib
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from changefeed import REFRESHED as FEED_REFRESHED
+from docindex import write_index
+from downloads import conditional_headers, validators_from_headers
+from extract import EXTRACT_VERSION
+from pipeline import DOCS_DIR, ROOT, http_get
+from frontmatter import read_header, update_front_matter
+from storage import atomic_write_text
+from workers import extract_document
+
+log = logging.getLogger("railcar.freshness")
+
+FRESHNESS_PATH = ROOT / "state" / "freshness.json"
+
+# Outcomes of check_document
+UNCHANGED = "unchanged"
+REFRESHED = "refreshed"
+BASELINED = "baselined"
+GONE = "gone"
+SKIPPED = "skipped"
+ERROR = "error"
+
+
+def sweep_order(docs_dir: Path, cursor: str) -> list[Path]:
+    """All documents in path order, starting after the cursor and wrapping around."""
+    paths = sorted(docs_dir.rglob("*.md"))
+    keys = [str(p.relative_to(docs_dir)) for p in paths]
+    start = next((i + 1 for i, key in enumerate(keys) if key == cursor), 0)
+    return paths[start:] + paths[:start]
+
+
+def check_document(path: Path, pool=None, templates=None, cache=None, feed=None) -> str:
+    """Check one document against its source PDF, re-extracting it if changed."""
+    metadata, _ = read_header(path)
+    url = metadata.get("source_pdf", "")
+    if not url.startswith("http"):
+        return SKIPPED
+
+    resp = http_get(url, timeout=120, headers=conditional_headers(metadata),
+                    allow_redirects=True)
+    if resp.status_code == 304:
+        return UNCHANGED
+    if resp.status_code in (404, 410):
+        log.warning("Source of %s is gone: %s", path.name, url)
+        return GONE
+    resp.raise_for_status()
+    if "pdf" not in resp.headers.get("content-type", "").lower():
+        return SKIPPED
+
+    pdf_bytes = resp.content
+    updates = {**validators_from_headers(resp.headers),
+               "source_sha256": hashlib.sha256(pdf_bytes).hexdigest()}
+    known = metadata.get("source_sha256", "")
+    if known == updates["source_sha256"] or not known:
+        if update_front_matter(path, {k: v for k, v in updates.items() if v}):
+            write_index(path)  # the body moved
+        return UNCHANGED if known else BASELINED
+
+    log.info("Source of %s changed, re-extracting", path.name)
+    header_lines = None
+    if templates is not None:
+        pid = path.relative_to(DOCS_DIR).parts[0]
+        header_lines = templates.header_lines(pid, metadata.get("symbol", ""),
+                                              metadata.get("language", "EN"))
+    extract_document(pdf_bytes, path, {**metadata, **updates}, False, True, header_lines,
+                     cache, pool)
+    if feed is not None:
+        feed.append(FEED_REFRESHED, metadata.get("symbol", ""),
+                    path.relative_to(DOCS_DIR).as_posix(), path.read_bytes(), EXTRACT_VERSION)
+    return REFRESHED
+
+
+def sweep(budget: int, concurrency: int = 4, pool=None, templates=None, cache=None,
+          feed=None, state_path: Path = FRESHNESS_PATH) -> Counter:
+    """Check the next budget documents and advance the cursor.
+
+    The cursor stops before the first document whose check raised.
+    Returns a count of outcomes.
+    """
+    state = {}
+    if state_path.exists():
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    paths = sweep_order(DOCS_DIR, state.get("cursor", ""))[:budget]
+
+    def _check(path: Path) -> str:
+        try:
+            return check_document(path, pool, templates, cache, feed)
+        except Exception as e:
+            log.error("Freshness check failed for %s: %s", path.name, e)
+            return ERROR
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        outcomes = list(executor.map(_check, paths))
+    counts = Counter(outcomes)
+
+    if paths:
+        # Stop before the first document whose check failed, so it is retried
+        done = outcomes.index(ERROR) if ERROR in outcomes else len(paths)
+        if done:
+            state["cursor"] = str(paths[done - 1].relative_to(DOCS_DIR))
+        state["last_sweep"] = date.today().isoformat()
+        atomic_write_text(state_path, json.dumps(state, indent=2) + "\n")
+    log.info("Freshness sweep: %d document(s) checked: %s", len(paths),
+             ", ".join(f"{n} {outcome}" for outcome, n in sorted(counts.items())) or "none")
+    return counts
@@ -0,0 +1,127 @@
+"""
+Read YAML front matter from document files without loading their bodies.
+
+Document files start with a ``---`` delimited block of ``key: value`` lines
+written by ``extract.format_output``.  Tools that only need metadata
+(regeneration checks, indexes, stats) read just that block, line by line
+from a buffered file, and stop at the closing delimiter; the body is only
+read on demand from the recorded byte offset.
+"""
+
+from pathlib import Path
+
+from storage import atomic_open
+
+# Upper bound on the size of a front matter block; a file whose header runs
+# past this is treated as having no front matter.
+MAX_FRONT_MATTER_BYTES = 64 * 1024
+
+
+def parse_front_matter(lines) -> dict:
+    """Parse front matter lines (without delimiters) into a metadata dict."""
+    metadata = {}
+    for line in lines:
+        if ":" not in line:
+            continue
+        key, _, value = line.partition(":")
+        value = value.strip().strip('"')
+        # Unescape YAML double-quoted values
+        value = value.replace('\\"', '"').replace("\\\\", "\\")
+        metadata[key.strip()] = value
+    return metadata
+
+
+def read_header(path: Path) -> tuple[dict, int]:
+    """Read only the front matter of a document file.
+
+    Returns ``(metadata, body_offset)`` where *body_offset* is the byte
+    offset just past the closing delimiter.  Files without front matter
+    return ``({}, 0)``.
+    """
+    with open(path, "rb") as f:
+        first = f.readline(MAX_FRONT_MATTER_BYTES)
+        if first.rstrip(b"\r\n") != b"---":
+            return {}, 0
+        offset = len(first)
+        lines: list[str] = []
+        while offset < MAX_FRONT_MATTER_BYTES:
+            raw = f.readline(MAX_FRONT_MATTER_BYTES - offset)
+            if not raw:
+                break
+            offset += len(raw)
+            if raw.rstrip(b"\r\n") == b"---":
+                return parse_front_matter(lines), offset
+            lines.append(raw.decode("utf-8").strip())
+    return {}, 0
+
+
+def read_front_matter(path: Path) -> dict:
+    """Return the front matter metadata of a document file."""
+    return read_header(path)[0]
+
+
+def read_body(path: Path, body_offset: int | None = None) -> str:
+    """Return the body text of a document file.
+
+    Pass the offset from ``read_header`` to skip re-reading the front matter.
+    """
+    if body_offset is None:
+        body_offset = read_header(path)[1]
+    with open(path, "rb") as f:
+        f.seek(body_offset)
+        body = f.read().decode("utf-8")
+    return body.lstrip("\n") if body_offset else body
+
+
+def _quote(value: str) -> str:
+    """Render a YAML double-quoted string."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def update_front_matter(path: Path, updates: dict) -> bool:
+    """Set front matter fields of a document file, leaving its body untouched.
+
+    Values are written double-quoted.  New fields go before
+    ``extract_version``.  Returns False if nothing changed.
+    """
+    metadata, body_offset = read_header(path)
+    changes = {k: v for k, v in updates.items() if metadata.get(k, "") != v}
+    if not body_offset or not changes:
+        return False
+    with open(path, "rb") as f:
+        head = f.read(body_offset).decode("utf-8")
+        body = f.read()
+
+    lines = head.rstrip("\n").split("\n")[1:-1]
+    rendered = {k: f"{k}: {_quote(v)}" for k, v in changes.items()}
+    out = []
+    for line in lines:
+        key = line.partition(":")[0].strip()
+        if key in rendered:
+            out.append(rendered.pop(key))
+            continue
+        if key == "extract_version":
+            out.extend(rendered.values())
+            rendered.clear()
+        out.append(line)
+    out.extend(rendered.values())
+
+    with atomic_open(path, binary=True) as f:
+        f.write(("---\n" + "\n".join(out) + "\n---\n").encode("utf-8"))
+        f.write(body)
+    return True
+
+
+class DocumentHead:
+    """Front matter of a document file with a lazily loaded body."""
+
+    __slots__ = ("path", "metadata", "body_offset")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.metadata, self.body_offset = read_header(path)
+
+    @property
+    def body(self) -> str:
+        return read_body(self.path, self.body_offset)
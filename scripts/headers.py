@@ -0,0 +1,135 @@
+"""
+Series-level running header templates, learned across documents.
+
+Header detection within a document needs at least two pages, so single-page
+documents and regeneration (where page boundaries are gone) cannot find
+running headers on their own.  Documents in one series share them, though:
+after each extraction the header lines detected in the PDF are recorded for
+the pattern and language, with the document's own symbol replaced by a
+placeholder, and lines seen in enough documents of the series become its
+template.  Only lines that look like running headers are learned: those
+containing the symbol or the masthead (the organ's name), so a repeated
+label such as "(a)" never becomes a template.  Templates are persisted in
+``state/headers.json``; processes sharing a checkout (backfill workers) add
+their counts to what the others saved, under a lock.
+
+Documents saved before templates existed have already lost their page
+boundaries, so a series is bootstrapped once from the source PDFs of a
+few of its saved documents (see ``bootstrap_headers`` in pipeline.py).
+"""
+
+import copy
+import json
+import logging
+import re
+from pathlib import Path
+
+from storage import atomic_write_text, file_lock, merge_counts
+
+log = logging.getLogger("railcar.headers")
+
+SYMBOL_PLACEHOLDER = "{SYMBOL}"
+
+# Candidate lines kept per pattern; the least frequent are dropped beyond this
+MAX_CANDIDATES = 200
+
+# Organ names and "United Nations" in the six official languages
+_RE_MASTHEAD = re.compile(
+    r"United Nations|General Assembly|Security Council|Economic and Social Council"
+    r"|Nations Unies|Assemblée générale|Conseil de sécurité|Conseil économique et social"
+    r"|Naciones Unidas|Asamblea General|Consejo de Seguridad|Consejo Económico y Social"
+    r"|Организация Объединенных Наций|Генеральная Ассамблея|Совет Безопасности"
+    r"|Экономический и Социальный Совет"
+    r"|الأمم المتحدة|الجمعية العامة|مجلس الأمن|المجلس الاقتصادي والاجتماعي"
+    r"|联合国|大会|安全理事会|经济及社会理事会",
+    re.IGNORECASE,
+)
+
+
+def is_header_candidate(line: str, symbol: str) -> bool:
+    """Return True if a repeated line looks like a running header of the document."""
+    return bool(symbol and symbol in line) or bool(_RE_MASTHEAD.search(line))
+
+
+def _key(pid: str, language: str) -> str:
+    return f"{pid}/{language.upper()}"
+
+
+class HeaderTemplates:
+    """Per-pattern, per-language header line counts and the templates derived from them.
+
+    A candidate line becomes part of a template once it was detected in at
+    least *min_documents* documents and in at least *min_share* of the
+    documents learned from, in the same pattern and language.
+    """
+
+    def __init__(self, path: Path, min_documents: int = 3, min_share: float = 0.5):
+        self.path = path
+        self.min_documents = min_documents
+        self.min_share = min_share
+        self._data = _read(path)
+        # The data as last loaded or saved, against which our counts are merged
+        self._base = copy.deepcopy(self._data)
+        self._dirty = False
+
+    def header_lines(self, pid: str, symbol: str, language: str = "EN") -> set[str]:
+        """Return the learned header lines of a pattern and language, instantiated for symbol."""
+        entry = self._data.get(_key(pid, language))
+        if not entry:
+            return set()
+        documents = entry["documents"]
+        return {
+            line.replace(SYMBOL_PLACEHOLDER, symbol)
+            for line, count in entry["lines"].items()
+            if count >= self.min_documents and count >= self.min_share * documents
+        }
+
+    def needs_bootstrap(self, pid: str, language: str = "EN") -> bool:
+        """Return True until the pattern and language were bootstrapped from saved documents."""
+        return not self._data.get(_key(pid, language), {}).get("bootstrapped")
+
+    def mark_bootstrapped(self, pid: str, language: str = "EN") -> None:
+        self._entry(pid, language)["bootstrapped"] = True
+        self._dirty = True
+
+    def _entry(self, pid: str, language: str) -> dict:
+        return self._data.setdefault(_key(pid, language), {"documents": 0, "lines": {}})
+
+    def learn(self, pid: str, symbol: str, detected: set[str], language: str = "EN") -> None:
+        """Record the header lines detected in one document of a pattern and language."""
+        entry = self._entry(pid, language)
+        entry["documents"] += 1
+        lines = entry["lines"]
+        for line in detected:
+            if not is_header_candidate(line, symbol):
+                continue
+            template = line.replace(symbol, SYMBOL_PLACEHOLDER) if symbol else line
+            lines[template] = lines.get(template, 0) + 1
+        _trim(entry)
+        self._dirty = True
+
+    def save(self) -> None:
+        """Add what was learned since the last load or save to the store on disk."""
+        if not self._dirty:
+            return
+        with file_lock(self.path.with_name(self.path.name + ".lock")):
+            data = merge_counts(_read(self.path), self._data, self._base)
+            for entry in data.values():
+                _trim(entry)
+            atomic_write_text(self.path, json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+        self._data, self._base = data, copy.deepcopy(data)
+        self._dirty = False
+
+
+def _read(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    content = path.read_text(encoding="utf-8").strip()
+    return json.loads(content) if content else {}
+
+
+def _trim(entry: dict) -> None:
+    """Keep the MAX_CANDIDATES most frequent candidate lines of an entry."""
+    if len(entry["lines"]) > MAX_CANDIDATES:
+        keep = sorted(entry["lines"].items(), key=lambda item: -item[1])[:MAX_CANDIDATES]
+        entry["lines"] = dict(keep)
@@ -0,0 +1,106 @@
+"""
+In-memory inventory of documents already on disk, per pattern.
+
+One directory scan per language yields the X values that have an output
+file; they are kept as sorted, non-overlapping integer ranges so the fetch
+loop can jump over a contiguous run of existing documents in one step and
+only probe the real holes.
+"""
+
+import re
+from bisect import bisect_right
+from pathlib import Path
+
+
+class IntervalSet:
+    """A set of integers stored as sorted, non-overlapping inclusive ranges."""
+
+    __slots__ = ("_starts", "_ends")
+
+    def __init__(self, values=()):
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        for n in sorted(set(values)):
+            if self._ends and n == self._ends[-1] + 1:
+                self._ends[-1] = n
+            else:
+                self._starts.append(n)
+                self._ends.append(n)
+
+    def _index(self, n: int) -> int:
+        """Index of the range containing n, or -1."""
+        i = bisect_right(self._starts, n) - 1
+        return i if i >= 0 and n <= self._ends[i] else -1
+
+    def __contains__(self, n: int) -> bool:
+        return self._index(n) >= 0
+
+    def __len__(self) -> int:
+        return sum(e - s + 1 for s, e in zip(self._starts, self._ends))
+
+    def __bool__(self) -> bool:
+        return bool(self._starts)
+
+    def ranges(self) -> list[tuple[int, int]]:
+        """Return the inclusive (start, end) ranges in ascending order."""
+        return list(zip(self._starts, self._ends))
+
+    def max(self) -> int:
+        return self._ends[-1]
+
+    def next_missing(self, n: int) -> int:
+        """Return the smallest value >= n that is not in the set."""
+        i = self._index(n)
+        return n if i < 0 else self._ends[i] + 1
+
+    def missing_between(self, lo: int, hi: int) -> int:
+        """Count values in [lo, hi) that are not in the set."""
+        if hi <= lo:
+            return 0
+        present = 0
+        for s, e in zip(self._starts, self._ends):
+            present += max(0, min(e, hi - 1) - max(s, lo) + 1)
+        return hi - lo - present
+
+    def add(self, n: int) -> None:
+        i = bisect_right(self._starts, n) - 1
+        if i >= 0 and n <= self._ends[i]:
+            return
+        joins_left = i >= 0 and self._ends[i] == n - 1
+        joins_right = i + 1 < len(self._starts) and self._starts[i + 1] == n + 1
+        if joins_left and joins_right:
+            self._ends[i] = self._ends[i + 1]
+            del self._starts[i + 1]
+            del self._ends[i + 1]
+        elif joins_left:
+            self._ends[i] = n
+        elif joins_right:
+            self._starts[i + 1] = n
+        else:
+            self._starts.insert(i + 1, n)
+            self._ends.insert(i + 1, n)
+
+
+def existing_numbers(file_template: str, directory: Path) -> set[int]:
+    """Return the X values that have an output file in directory.
+
+    file_template is the pattern's sanitized symbol, e.g. ``A_RES_80_{X}``.
+    """
+    prefix, _, suffix = file_template.partition("{X}")
+    file_re = re.compile(re.escape(prefix) + r"(0|[1-9]\d*)" + re.escape(suffix) + r"\.md")
+    numbers: set[int] = set()
+    if directory.is_dir():
+        for entry in directory.iterdir():
+            m = file_re.fullmatch(entry.name)
+            if m:
+                numbers.add(int(m.group(1)))
+    return numbers
+
+
+def scan_pattern(file_template: str, directories: list[Path]) -> IntervalSet:
+    """Return the X values that have an output file in every directory.
+
+    Pass one directory per configured language.
+    """
+    present = set.intersection(*(existing_numbers(file_template, d) for d in directories))
+    return IntervalSet(present)
@@ -0,0 +1,330 @@
+"""
+Near-duplicate detection with MinHash signatures and locality-sensitive hashing.
+
+Reissues, corrigenda and annexes that repeat earlier texts are saved as
+separate documents.  Each document body is reduced to a MinHash signature
+of its 5-word shingles, computed with one-permutation hashing (every
+shingle is hashed once into one of NUM_BINS bins, each bin keeps its
+minimum, empty bins borrow from their neighbour), so a signature costs one
+hash per shingle.  The fraction of equal bins in two signatures estimates
+the Jaccard similarity of their shingle sets.
+
+Signatures are kept in ``state/neardup.json``.  In memory they are
+bucketed by band (BANDS bands of NUM_BINS / BANDS bins each); documents
+sharing any band bucket are candidates, and only candidates are compared,
+so queries and the cluster report take roughly linear time instead of
+comparing every pair.
+
+The index follows the change feed (see changefeed.py): ``update`` reads
+the events since its cursor and re-signs the documents they name, flagging
+each new document that is a near-copy of one already indexed.  The first
+update signs the whole corpus instead, as does ``--rebuild``.  Processes
+sharing a checkout (backfill workers) each keep an index: ``update`` holds
+a lock on the state file, takes in what another process saved since, and
+saves before releasing it.
+
+Run directly (``python neardup.py``) for a report of near-duplicate
+clusters; ``--query FILE`` lists the near-copies of one document and
+``--rebuild`` re-signs the whole corpus.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+from array import array
+from collections import defaultdict
+from pathlib import Path
+
+from changefeed import FEED_DIR, NEW, last_sequence, read_changes
+from frontmatter import read_body
+from storage import atomic_write_text, file_lock
+
+log = logging.getLogger("railcar.neardup")
+
+ROOT = Path(__file__).resolve().parent.parent
+DOCS_DIR = ROOT / "documents"
+NEARDUP_PATH = ROOT / "state" / "neardup.json"
+
+# Bump when the shingling or hashing changes; older signatures are dropped
+SIGNATURE_VERSION = 1
+
+NUM_BINS = 128
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+SHINGLE_WORDS = 5
+
+_EMPTY = 1 << 32
+# Offset added per bin when densifying, keeping borrowed values distinct
+_BORROW_STEP = (1 << 32) // NUM_BINS // NUM_BINS
+
+_RE_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str) -> set[int]:
+    """Return the 32-bit hashes of the text's overlapping 5-word shingles."""
+    words = _RE_WORD.findall(text.lower())
+    count = max(1, len(words) - SHINGLE_WORDS + 1) if words else 0
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"),
+                                       digest_size=4).digest(), "little")
+        for i in range(count)
+    }
+
+
+def signature(text: str) -> array | None:
+    """Return the MinHash signature of a text, or None if it has no words."""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    bins = [_EMPTY] * NUM_BINS
+    for h in hashes:
+        b, value = h % NUM_BINS, h // NUM_BINS
+        if value < bins[b]:
+            bins[b] = value
+    # Densify: an empty bin takes the value of the next non-empty bin to its
+    # right (wrapping around), offset by the distance
+    original = bins[:]
+    nearest = 0
+    for b in range(2 * NUM_BINS - 1, -1, -1):
+        i = b % NUM_BINS
+        if original[i] != _EMPTY:
+            nearest = i
+        elif b < NUM_BINS:
+            bins[i] = original[nearest] + (nearest - i) % NUM_BINS * _BORROW_STEP
+    return array("I", bins)
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BINS
+
+
+def _band_keys(sig: array) -> list[bytes]:
+    return [bytes([band]) + sig[band * ROWS:(band + 1) * ROWS].tobytes()
+            for band in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    """Signatures of every document, bucketed for candidate lookup.
+
+    Documents are named by their path under documents/.  Pairs estimated
+    at or above *threshold* similarity are near-duplicates.  Without a path
+    nothing is persisted.
+    """
+
+    def __init__(self, path: Path | None = None, threshold: float = 0.8):
+        self.path = path
+        self.threshold = threshold
+        self.cursor = 0
+        self.complete = False
+        self.signatures: dict[str, array] = {}
+        self._buckets: dict[bytes, set[str]] = defaultdict(set)
+        # Identity of the state file as last loaded or saved
+        self._stamp = None
+        if path is not None and path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        self._stamp = _stamp(self.path)
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        if data.get("version") == SIGNATURE_VERSION:
+            self.cursor = data["cursor"]
+            self.complete = data["complete"]
+            for doc, encoded in data["documents"].items():
+                self.add(doc, array("I", base64.b64decode(encoded)))
+
+    def clear(self) -> None:
+        """Drop every signature, so the next update signs the whole corpus."""
+        self.signatures.clear()
+        self._buckets.clear()
+        self.cursor = 0
+        self.complete = False
+
+    def __contains__(self, doc: str) -> bool:
+        return doc in self.signatures
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def add(self, doc: str, sig: array) -> None:
+        """Index (or re-index) a document's signature."""
+        self.remove(doc)
+        self.signatures[doc] = sig
+        for key in _band_keys(sig):
+            self._buckets[key].add(doc)
+
+    def remove(self, doc: str) -> None:
+        sig = self.signatures.pop(doc, None)
+        if sig is None:
+            return
+        for key in _band_keys(sig):
+            bucket = self._buckets[key]
+            bucket.discard(doc)
+            if not bucket:
+                del self._buckets[key]
+
+    def query(self, sig: array, exclude: str | None = None) -> list[tuple[str, float]]:
+        """Return (document, similarity) of the near-duplicates of a signature, closest first."""
+        candidates = set()
+        for key in _band_keys(sig):
+            candidates |= self._buckets.get(key, set())
+        candidates.discard(exclude)
+        matches = [(doc, similarity(sig, self.signatures[doc])) for doc in candidates]
+        return sorted(((doc, s) for doc, s in matches if s >= self.threshold),
+                      key=lambda m: (-m[1], m[0]))
+
+    def clusters(self) -> list[list[str]]:
+        """Group documents into near-duplicate clusters of two or more, largest first."""
+        parent = {}
+
+        def find(doc: str) -> str:
+            while parent.get(doc, doc) != doc:
+                doc = parent[doc]
+            return doc
+
+        compared = set()
+        for bucket in self._buckets.values():
+            members = sorted(bucket)
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) in compared:
+                        continue
+                    compared.add((a, b))
+                    if similarity(self.signatures[a], self.signatures[b]) >= self.threshold:
+                        ra, rb = find(a), find(b)
+                        if ra != rb:
+                            parent[max(ra, rb)] = min(ra, rb)
+
+        groups = defaultdict(list)
+        for doc in parent:
+            groups[find(doc)].append(doc)
+        for root, members in groups.items():
+            if root not in members:
+                members.append(root)
+        return sorted((sorted(m) for m in groups.values()), key=lambda m: (-len(m), m[0]))
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {
+            "version": SIGNATURE_VERSION,
+            "cursor": self.cursor,
+            "complete": self.complete,
+            "documents": {doc: base64.b64encode(sig.tobytes()).decode("ascii")
+                          for doc, sig in sorted(self.signatures.items())},
+        }
+        atomic_write_text(self.path, json.dumps(data, separators=(",", ":")) + "\n")
+        self._stamp = _stamp(self.path)
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    """Identify a version of the state file; every save replaces the inode."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _sign(index: NearDuplicateIndex, docs_dir: Path, doc: str) -> array | None:
+    """Sign one document and index it; drop it if it is gone or empty."""
+    path = docs_dir / doc
+    sig = signature(read_body(path)) if path.exists() else None
+    if sig is None:
+        index.remove(doc)
+    else:
+        index.add(doc, sig)
+    return sig
+
+
+def update(index: NearDuplicateIndex, docs_dir: Path = DOCS_DIR,
+           feed_dir: Path = FEED_DIR) -> list[tuple[str, list[tuple[str, float]]]]:
+    """Bring the index up to date with the change feed and save it.
+
+    Returns (document, near-duplicates) for each new document that is a
+    near-copy of an indexed one; each is also logged.
+    """
+    if index.path is None:
+        return _update(index, docs_dir, feed_dir)
+    with file_lock(index.path.with_name(index.path.name + ".lock")):
+        stamp = _stamp(index.path)
+        if stamp is not None and stamp != index._stamp:
+            # Another process saved since we loaded; continue from its state
+            index.clear()
+            index._load()
+        flagged = _update(index, docs_dir, feed_dir)
+        index.save()
+    return flagged
+
+
+def _update(index: NearDuplicateIndex, docs_dir: Path,
+            feed_dir: Path) -> list[tuple[str, list[tuple[str, float]]]]:
+    if not index.complete:
+        # Everything in the feed so far is on disk and covered by the scan
+        index.cursor = last_sequence(feed_dir)
+        for path in sorted(docs_dir.rglob("*.md")):
+            _sign(index, docs_dir, path.relative_to(docs_dir).as_posix())
+        index.complete = True
+
+    flagged = []
+    for event in read_changes(feed_dir, index.cursor):
+        index.cursor = event["seq"]
+        doc = event["path"]
+        index.remove(doc)
+        sig = _sign(index, docs_dir, doc)
+        if sig is None or event["kind"] != NEW:
+            continue
+        matches = index.query(sig, exclude=doc)
+        if matches:
+            log.warning("%s is a near-copy of %s", doc,
+                        ", ".join(f"{other} ({s:.2f})" for other, s in matches[:3]))
+            flagged.append((doc, matches))
+    return flagged
+
+
+def format_report(index: NearDuplicateIndex) -> str:
+    """Render the near-duplicate clusters of an index."""
+    clusters = index.clusters()
+    lines = [f"{len(index)} document(s) indexed, {len(clusters)} near-duplicate cluster(s) "
+             f"at similarity >= {index.threshold:.2f}"]
+    for members in clusters:
+        lines.append("")
+        first = index.signatures[members[0]]
+        for doc in members:
+            lines.append(f"  {doc}  {similarity(first, index.signatures[doc]):.2f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report near-duplicate documents.")
+    parser.add_argument("--query", type=Path, help="list the near-copies of this document")
+    parser.add_argument("--rebuild", action="store_true", help="re-sign every document")
+    parser.add_argument("--threshold", type=float, default=0.8,
+                        help="minimum estimated similarity (default 0.8)")
+    args = parser.parse_args()
+
+    index = NearDuplicateIndex(NEARDUP_PATH, args.threshold)
+    if args.rebuild:
+        index.clear()
+    update(index)
+
+    if args.query:
+        path = args.query.resolve()
+        doc = path.relative_to(DOCS_DIR).as_posix() if path.is_relative_to(DOCS_DIR) else None
+        sig = signature(read_body(path))
+        for other, s in index.query(sig, exclude=doc) if sig is not None else []:
+            print(f"{other}  {s:.2f}")
+    else:
+        print(format_report(index))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    main()
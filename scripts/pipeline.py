@@ -0,0 +1,973 @@
+"""
+Fetching UN documents by pattern: the Search API, PDF downloads, extraction
+and the per-pattern loop.
+
+fetch_documents.py is the command-line entry point; serve.py, shards.py,
+plan.py and freshness.py use this module too, so all of them share its
+session, rate controller and URL templates.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from cache import CACHE_DIR, DiskCache
+from changefeed import NEW, ChangeFeed
+from downloads import resumable_download, validators_from_headers
+from extract import detect_pdf_headers, get_version
+from frontmatter import read_front_matter, read_header
+from headers import HeaderTemplates
+from inventory import IntervalSet, scan_pattern
+from ratelimit import THROTTLE_STATUSES, HostRates
+from resolve import UrlTemplates
+from storage import StateJournal, discard_partial
+from workers import (
+    ExtractionBudgetExceeded,
+    ExtractionPool,
+    extract_document,
+)
+
+log = logging.getLogger("railcar")
+
+ROOT = Path(__file__).resolve().parent.parent
+CONFIG_PATH = ROOT / "config" / "patterns.json"
+STATE_PATH = ROOT / "state" / "progress.json"
+HEADERS_PATH = ROOT / "state" / "headers.json"
+URL_TEMPLATES_PATH = ROOT / "state" / "url_templates.json"
+DOCS_DIR = ROOT / "documents"
+DOWNLOAD_DIR = CACHE_DIR / "downloads"
+
+MARC_NS = {"marc": "http://www.loc.gov/MARC21/slim"}
+SEARCH_BASE = "https://digitallibrary.un.org/search"
+# Extra attempts when the Search API answers busy (429/503 or an empty 202)
+SEARCH_BUSY_RETRIES = 2
+UNDOCS_BASE = "https://undocs.org/en"
+
+# Language labels used in MARC 856 $y for the six official languages
+LANG_NAMES = {
+    "EN": "English",
+    "FR": "Français",
+    "ES": "Español",
+    "AR": "العربية",
+    "ZH": "中文",
+    "RU": "Русский",
+}
+
+# Created on first use so metadata-only runs never import requests
+_SESSION = None
+
+
+def get_session():
+    """Return the shared HTTP session, importing requests on first use."""
+    global _SESSION
+    if _SESSION is None:
+        import requests
+
+        _SESSION = requests.Session()
+    return _SESSION
+
+
+# Per-host request pacing, reconfigured from settings by configure_rates()
+RATES = HostRates()
+
+
+def configure_rates(settings: dict) -> None:
+    """Start per-host pacing from the configured delay and limits."""
+    global RATES
+    RATES = HostRates(settings)
+
+
+def log_rate_report() -> None:
+    """Log each host's current request rate."""
+    for line in RATES.report():
+        log.info("Rate %s", line)
+
+
+# Learned PDF URL templates, loaded from state by configure_urls()
+URLS = UrlTemplates()
+
+
+def configure_urls(settings: dict) -> None:
+    """Load the learned URL templates with the configured skip threshold."""
+    global URLS
+    URLS = UrlTemplates(URL_TEMPLATES_PATH,
+                        min_tries=settings.get("url_template_min_tries", 5),
+                        min_hit_rate=settings.get("url_template_min_hit_rate", 0.2))
+
+
+def save_urls() -> None:
+    """Persist the URL templates if anything was learned or tried."""
+    URLS.save()
+
+
+def log_url_report() -> None:
+    """Log the hit rate of each URL template tried."""
+    for line in URLS.report():
+        log.info("URL template %s", line)
+
+
+def http_get(url: str, **kwargs):
+    """GET url with the shared session, paced by the host's rate controller.
+
+    The response's status, latency and Retry-After header feed back into
+    the controller; a network error counts as back-pressure.
+    """
+    import requests
+
+    controller = RATES.for_url(url)
+    controller.acquire()
+    start = time.monotonic()
+    try:
+        resp = get_session().get(url, **kwargs)
+    except requests.RequestException:
+        controller.record(None, time.monotonic() - start)
+        raise
+    controller.record(resp.status_code, time.monotonic() - start,
+                      resp.headers.get("Retry-After"))
+    return resp
+
+
+def load_config() -> dict:
+    with open(CONFIG_PATH) as f:
+        return json.load(f)
+
+
+def load_state() -> dict:
+    """Load progress.json, replaying any journal left behind by a killed run."""
+    return StateJournal(STATE_PATH).load()
+
+
+def save_state(state: dict) -> None:
+    """Atomically write the full state and discard the journal."""
+    StateJournal(STATE_PATH).checkpoint(state)
+
+
+class SearchUnavailable(Exception):
+    """The Search API failed or stayed busy; the query's answer is unknown."""
+
+
+def _search(params: dict, what: str) -> bytes:
+    """Run one Search API query and return the MARCXML body.
+
+    Raises SearchUnavailable on a request error or once the busy retries
+    are used up, so callers do not mistake it for an empty result.
+    """
+    import requests
+
+    for attempt in range(SEARCH_BUSY_RETRIES + 1):
+        try:
+            resp = http_get(SEARCH_BASE, params=params, timeout=60)
+            if resp.status_code not in THROTTLE_STATUSES:
+                resp.raise_for_status()
+        except requests.RequestException as e:
+            log.error("Search API error for %s: %s", what, e)
+            raise SearchUnavailable(str(e)) from e
+        if resp.status_code not in THROTTLE_STATUSES and len(resp.content) > 0:
+            return resp.content
+        # A busy server is not a missing document: retry once the host's
+        # rate controller (already slowed by http_get for these statuses) allows
+        if resp.status_code not in THROTTLE_STATUSES:
+            RATES.for_url(SEARCH_BASE).back_off()
+        log.warning("Search API busy for %s (status %d, %d bytes)%s",
+                    what, resp.status_code, len(resp.content),
+                    ", retrying" if attempt < SEARCH_BUSY_RETRIES else "")
+    raise SearchUnavailable(f"busy after {SEARCH_BUSY_RETRIES + 1} attempt(s)")
+
+
+def search_document(symbol: str, language: str) -> dict | None:
+    """Query the Invenio Search API for a document symbol.
+
+    Returns metadata dict with source_pdf, record_id, title, date and
+    pdf_urls (every official language version found) or None if not found.
+    Raises SearchUnavailable if the Search API could not answer.
+    """
+    # Search by document symbol in MARC field 191 subfield a
+    params = {
+        "p": f'191__a:"{symbol}"',
+        "of": "xm",
+        "rg": "200",
+    }
+    return _parse_marcxml(_search(params, symbol), symbol, language)
+
+
+def search_recent(prefix: str, since: str, language: str,
+                  page_size: int = 200) -> list[tuple[str, str, dict]] | None:
+    """Query the Search API for records whose symbol starts with prefix.
+
+    Only records modified at or after *since* (``YYYY-MM-DD HH:MM:SS``, or
+    empty for all) are returned.  Returns (modified, symbol, metadata)
+    for every symbol of those records, oldest modification first, or None
+    if the query failed.
+    """
+    params = {
+        "p": f'191__a:"{prefix}*"',
+        "of": "xm",
+        "rg": str(page_size),
+        "so": "a",
+    }
+    if since:
+        params.update({"dt": "m", "d1": since})
+
+    hits = []
+    jrec = 1
+    while True:
+        try:
+            content = _search({**params, "jrec": str(jrec)},
+                              f"{prefix}* since {since or 'start'}")
+        except SearchUnavailable:
+            return None
+        records = _marc_records(content)
+        for record in records:
+            modified = _record_modified(record)
+            for f191 in record.findall("marc:datafield[@tag='191']", MARC_NS):
+                sf = f191.find("marc:subfield[@code='a']", MARC_NS)
+                symbol = (sf.text or "").strip() if sf is not None else ""
+                if not symbol.upper().startswith(prefix.upper()):
+                    continue
+                metadata = _record_metadata(record, symbol, language)
+                if metadata is not None:
+                    hits.append((modified, symbol, metadata))
+        if len(records) < page_size:
+            break
+        jrec += page_size
+    hits.sort(key=lambda hit: hit[0])
+    return hits
+
+
+def _marc_records(xml_bytes: bytes) -> list:
+    """Return the MARC records of a MARCXML response."""
+    from lxml import etree
+
+    try:
+        root = etree.fromstring(xml_bytes)
+    except etree.XMLSyntaxError:
+        # Response may have HTML wrapper; try to extract the MARC collection
+        try:
+            tree = etree.HTML(xml_bytes)
+            # Look for the collection element
+            collections = tree.xpath("//marc:collection", namespaces=MARC_NS)
+            if not collections:
+                return []
+            root = collections[0]
+        except Exception:
+            return []
+    return root.findall(".//marc:record", MARC_NS)
+
+
+def _record_modified(record) -> str:
+    """Return a record's last modification (controlfield 005) as YYYY-MM-DD HH:MM:SS."""
+    cf005 = record.find("marc:controlfield[@tag='005']", MARC_NS)
+    stamp = cf005.text.strip() if cf005 is not None and cf005.text else ""
+    if len(stamp) < 14 or not stamp[:14].isdigit():
+        return ""
+    return (f"{stamp[0:4]}-{stamp[4:6]}-{stamp[6:8]} "
+            f"{stamp[8:10]}:{stamp[10:12]}:{stamp[12:14]}")
+
+
+def _record_metadata(record, symbol: str, language: str) -> dict | None:
+    """Build the metadata dict of a record, or None if it lists no PDF."""
+    # Get record ID from controlfield 001
+    cf001 = record.find("marc:controlfield[@tag='001']", MARC_NS)
+    record_id = cf001.text.strip() if cf001 is not None and cf001.text else ""
+
+    # Get title from field 245
+    title = _get_subfield(record, "245", "a") or ""
+
+    # Get date from field 269
+    date = _get_subfield(record, "269", "a") or ""
+
+    # Collect the PDF URL of every official language from field 856
+    pdf_urls = _collect_pdf_urls(record)
+    if not pdf_urls:
+        return None
+
+    return {
+        "record_id": record_id,
+        "symbol": symbol,
+        "title": title.strip(),
+        "date": date.strip(),
+        "source_pdf": pdf_urls.get(language, ""),
+        "language": language,
+        "pdf_urls": pdf_urls,
+    }
+
+
+def _parse_marcxml(xml_bytes: bytes, symbol: str, language: str) -> dict | None:
+    """Parse MARCXML response and extract metadata for the given symbol."""
+    fallback = None
+    for record in _marc_records(xml_bytes):
+        # Get document symbol from field 191
+        rec_symbol = _get_subfield(record, "191", "a")
+        if rec_symbol and rec_symbol.strip().upper() != symbol.strip().upper():
+            continue
+
+        metadata = _record_metadata(record, symbol, language)
+        if metadata is None:
+            continue
+        if metadata["source_pdf"]:
+            return metadata
+        # Keep the record for other languages in case no record has the target one
+        if fallback is None:
+            fallback = metadata
+
+    return fallback
+
+
+def _collect_pdf_urls(record) -> dict[str, str]:
+    """Map language codes to PDF URLs from a record's 856 fields."""
+    pdf_urls: dict[str, str] = {}
+    for f856 in record.findall("marc:datafield[@tag='856']", MARC_NS):
+        lang_sub = f856.find("marc:subfield[@code='y']", MARC_NS)
+        url_sub = f856.find("marc:subfield[@code='u']", MARC_NS)
+        if lang_sub is None or url_sub is None or not lang_sub.text or not url_sub.text:
+            continue
+        label = lang_sub.text.lower()
+        for code, name in LANG_NAMES.items():
+            if code not in pdf_urls and name.lower() in label:
+                pdf_urls[code] = url_sub.text.strip()
+                break
+    return pdf_urls
+
+
+def _get_subfield(record, tag: str, code: str) -> str | None:
+    """Get the text of a MARC subfield."""
+    df = record.find(f"marc:datafield[@tag='{tag}']", MARC_NS)
+    if df is None:
+        return None
+    sf = df.find(f"marc:subfield[@code='{code}']", MARC_NS)
+    if sf is None or sf.text is None:
+        return None
+    return sf.text
+
+
+def download_pdf(url: str, max_retries: int = 3, validators: dict | None = None) -> bytes | None:
+    """Download a PDF, returning its bytes.
+
+    Interrupted downloads are resumed with Range requests from a partial
+    file under .cache/downloads (see downloads.py).  The file's ETag and
+    Last-Modified are stored into *validators* if given.
+    """
+    return resumable_download(http_get, url, DOWNLOAD_DIR, max_retries, validators=validators)
+
+
+def undocs_url(symbol: str, language: str = "EN") -> str:
+    """Return the undocs.org URL of a symbol in the given language."""
+    return f"{UNDOCS_BASE.rsplit('/', 1)[0]}/{language.lower()}/{symbol}"
+
+
+def fallback_download(symbol: str, language: str = "EN",
+                      validators: dict | None = None) -> bytes | None:
+    """Try downloading directly from undocs.org as a fallback.
+
+    The file's ETag and Last-Modified are stored into *validators* if given.
+    """
+    import requests
+
+    url = undocs_url(symbol, language)
+    log.info("Trying fallback URL: %s", url)
+    try:
+        resp = http_get(url, timeout=120, allow_redirects=True)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        content_type = resp.headers.get("content-type", "")
+        if "pdf" in content_type.lower():
+            if validators is not None:
+                validators.update(validators_from_headers(resp.headers))
+            return resp.content
+        # undocs.org may redirect to an HTML page
+        return None
+    except requests.RequestException as e:
+        log.warning("Fallback download failed for %s: %s", symbol, e)
+        return None
+
+
+def sanitize_symbol(symbol: str) -> str:
+    """Convert a document symbol to a safe filename component."""
+    return symbol.replace("/", "_").replace(" ", "_")
+
+
+def output_path(out_dir: Path, symbol: str, language: str, primary_language: str) -> Path:
+    """Return the output file for a symbol in a language.
+
+    The primary language is written directly under the pattern directory;
+    every other language goes to a per-language subdirectory.
+    """
+    name = f"{sanitize_symbol(symbol)}.md"
+    if language == primary_language:
+        return out_dir / name
+    return out_dir / language.lower() / name
+
+
+def symbol_number(template: str, symbol: str) -> int | None:
+    """Return the X of a symbol matching a pattern's template, or None."""
+    regex = re.escape(template).replace(re.escape("{X}"), r"(\d+)")
+    m = re.fullmatch(regex, symbol.strip(), re.IGNORECASE)
+    return int(m.group(1)) if m else None
+
+
+def pattern_inventory(pattern_cfg: dict, out_dir: Path, languages: list[str],
+                      primary_language: str) -> IntervalSet:
+    """Scan a pattern's output directories for X values present in every language."""
+    directories = [output_path(out_dir, "", lang, primary_language).parent for lang in languages]
+    return scan_pattern(sanitize_symbol(pattern_cfg["pattern"]), directories)
+
+
+def fetch_language_pdf(symbol: str, metadata: dict | None, language: str, pid: str = "",
+                       fallback: bool = True) -> tuple[bytes | None, str, dict]:
+    """Download one language version of a document.
+
+    Tries the Search API URL for the language first, then the URLs built
+    from the pattern's learned templates (see resolve.py), then undocs.org
+    unless *fallback* is false.  Returns (pdf_bytes, source_url,
+    validators); pdf_bytes is None if all failed.  validators holds the
+    file's ETag and Last-Modified.
+    """
+    validators: dict = {}
+    metadata = metadata or {}
+    pdf_url = metadata.get("pdf_urls", {}).get(language)
+    if pdf_url:
+        log.info("Found via Search API: %s", pdf_url)
+        pdf_bytes = download_pdf(pdf_url, validators=validators)
+        if pdf_bytes is not None:
+            return pdf_bytes, pdf_url, validators
+
+    # Predictable URLs are checked with a single attempt: a miss is a 404
+    for template, url in URLS.candidates(pid, sanitize_symbol(symbol), language,
+                                         metadata.get("record_id", "")):
+        if url == pdf_url:
+            continue
+        pdf_bytes = download_pdf(url, max_retries=1, validators=validators)
+        URLS.record(pid, template, pdf_bytes is not None)
+        if pdf_bytes is not None:
+            log.info("Found via URL template: %s", url)
+            return pdf_bytes, url, validators
+
+    if not fallback:
+        return None, "", validators
+
+    # Fallback: try undocs.org
+    pdf_bytes = fallback_download(symbol, language, validators)
+    return pdf_bytes, undocs_url(symbol, language), validators
+
+
+def fetch_languages(symbol: str, metadata: dict | None, languages: list[str], pid: str = "",
+                    fallback: bool = True) -> dict[str, tuple[bytes, str, dict]]:
+    """Download several language versions of a document in parallel.
+
+    Returns {language: (pdf_bytes, source_url, validators)} for the languages found.
+    """
+    if not languages:
+        return {}
+    if len(languages) == 1:
+        results = {languages[0]: fetch_language_pdf(symbol, metadata, languages[0], pid,
+                                                    fallback)}
+    else:
+        with ThreadPoolExecutor(max_workers=len(languages)) as pool:
+            futures = {
+                lang: pool.submit(fetch_language_pdf, symbol, metadata, lang, pid, fallback)
+                for lang in languages
+            }
+            results = {lang: future.result() for lang, future in futures.items()}
+    return {lang: result for lang, result in results.items() if result[0] is not None}
+
+
+def known_record(out_dir: Path, symbol: str, languages: list[str],
+                 primary_language: str) -> dict | None:
+    """Return the record metadata of a symbol saved in another language, if any."""
+    for lang in languages:
+        path = output_path(out_dir, symbol, lang, primary_language)
+        if path.exists():
+            metadata = read_front_matter(path)
+            if metadata.get("record_id"):
+                return {key: metadata.get(key, "") for key in ("record_id", "title", "date")}
+    return None
+
+
+def search_record(symbol: str, language: str, pid: str) -> dict | None:
+    """Search for a symbol and learn the URL templates of its PDFs."""
+    metadata = search_document(symbol, language)
+    if metadata is not None:
+        URLS.learn(pid, metadata.get("pdf_urls", {}), metadata.get("record_id", ""),
+                   sanitize_symbol(symbol))
+    return metadata
+
+
+# Outcomes of fetch_symbol
+SAVED = "saved"
+MISSING = "missing"
+FAILED = "failed"
+# The Search API could not answer: neither a miss nor progress
+BUSY = "busy"
+
+
+def fetch_symbol(symbol: str, out_dir: Path, languages: list[str], language: str,
+                 settings: dict, journal: StateJournal | None = None,
+                 pool: ExtractionPool | None = None,
+                 templates: HeaderTemplates | None = None, cache: DiskCache | None = None,
+                 feed: ChangeFeed | None = None, budget_scale: int = 1,
+                 metadata: dict | None = None) -> str:
+    """Search, download and extract every missing language of one symbol.
+
+    The Search API query is skipped when the record's *metadata* is
+    already known (see discover_recent), or when the symbol was saved in
+    another language and the missing ones are at predictable URLs.
+
+    PDFs already extracted at the current version are written from the
+    extraction cache when one is given.  Other extraction runs in the
+    pool's sandboxed workers when a pool is given, with its timeout and
+    memory cap multiplied by budget_scale.  The
+    series' learned header lines are stripped, and the headers detected in
+    each PDF are fed back into the templates.  Each written file is
+    appended to the change feed when one is given.
+
+    Returns SAVED if any language was written or the primary language is
+    already on disk (a secondary language may not exist upstream), FAILED
+    if extraction ran out of time or memory, MISSING if the document was
+    not found or could not be extracted, or BUSY if it was not found while
+    the Search API was unavailable.
+    """
+    streaming = settings.get("streaming_extraction", False)
+
+    # Only some languages may be missing for this symbol
+    missing = [
+        lang for lang in languages
+        if not output_path(out_dir, symbol, lang, language).exists()
+    ]
+    have_primary = language in languages and language not in missing
+    if not missing:
+        return SAVED
+
+    pid = out_dir.name
+    pdfs = {}
+    busy = False
+    if metadata is None:
+        try:
+            # A record already saved in another language gives the URLs away
+            metadata = known_record(out_dir, symbol, languages, language)
+            if metadata is not None:
+                pdfs = fetch_languages(symbol, metadata, missing, pid, fallback=False)
+                missing = [lang for lang in missing if lang not in pdfs]
+                if missing:
+                    metadata = search_record(symbol, language, pid) or metadata
+            else:
+                # Discover document metadata via Search API, once for all languages;
+                # requests are paced per host by http_get
+                metadata = search_record(symbol, language, pid)
+        except SearchUnavailable:
+            # Predictable URLs and undocs.org may still serve the PDFs
+            busy = True
+    if missing:
+        pdfs.update(fetch_languages(symbol, metadata, missing, pid))
+    if not pdfs:
+        if have_primary:
+            log.info("No further languages of %s found: %s", symbol, ", ".join(missing))
+            return SAVED
+        if busy:
+            log.warning("Search API unavailable, leaving %s for a later run", symbol)
+            return BUSY
+        log.warning("Document not found: %s", symbol)
+        return MISSING
+
+    saved = 0
+    over_budget = 0
+    for lang, (pdf_bytes, source_url, validators) in pdfs.items():
+        doc_metadata = {
+            "record_id": "",
+            "symbol": symbol,
+            "title": "",
+            "date": "",
+            **(metadata or {}),
+            "source_pdf": source_url,
+            **validators,
+            "source_sha256": hashlib.sha256(pdf_bytes).hexdigest(),
+            "language": lang,
+        }
+        out_file = output_path(out_dir, symbol, lang, language)
+        known_headers = None
+        if templates is not None:
+            known_headers = templates.header_lines(pid, symbol, lang)
+
+        # Extract text and write output with versioned metadata
+        try:
+            chars, detected = extract_document(pdf_bytes, out_file, doc_metadata, streaming,
+                                               journal is None, known_headers, cache, pool,
+                                               budget_scale)
+        except ExtractionBudgetExceeded as e:
+            log.error("Extraction of %s (%s) over budget: %s", symbol, lang, e)
+            discard_partial(out_file)
+            over_budget += 1
+            continue
+        except Exception as e:
+            log.error("Extraction failed for %s (%s): %s", symbol, lang, e)
+            continue
+
+        if not chars:
+            log.warning("Empty text extracted from %s (%s) (possibly scanned image)",
+                        symbol, lang)
+        log.info("Saved: %s (%d chars)", out_file.relative_to(out_dir), chars)
+        if journal is not None:
+            journal.track(out_file)
+        if feed is not None:
+            feed.append(NEW, symbol, out_file.relative_to(out_dir.parent).as_posix(),
+                        out_file.read_bytes(), get_version())
+        if templates is not None and detected is not None:
+            templates.learn(pid, symbol, detected, lang)
+        saved += 1
+
+    if over_budget:
+        return FAILED
+    return SAVED if saved or have_primary else MISSING
+
+
+def retry_failed(pid: str, pat_state: dict, symbol_for, out_dir: Path,
+                 languages: list[str], language: str, settings: dict,
+                 journal: StateJournal | None, pool: ExtractionPool | None,
+                 templates: HeaderTemplates | None, inventory: IntervalSet,
+                 cache: DiskCache | None = None, feed: ChangeFeed | None = None) -> int:
+    """Retry symbols whose extraction previously ran over budget.
+
+    Each attempt doubles the timeout and memory budget.  Symbols still
+    failing after extraction_max_attempts are dropped from the retry list;
+    a symbol that could not be fetched at all keeps its entry and attempts.
+    Returns the number of symbols saved.
+    """
+    failed = pat_state.get("failed", {})
+    max_attempts = settings.get("extraction_max_attempts", 3)
+    saved = 0
+    for key in sorted(failed, key=int):
+        x = int(key)
+        attempts = failed[key]["attempts"]
+        symbol = symbol_for(x)
+        log.info("Retrying %s (X=%d) with %dx extraction budget", symbol, x, 2 ** attempts)
+        outcome = fetch_symbol(symbol, out_dir, languages, language, settings,
+                               journal, pool, templates, cache, feed,
+                               budget_scale=2 ** attempts)
+        if outcome == BUSY:
+            break
+        if outcome == SAVED:
+            del failed[key]
+            inventory.add(x)
+            saved += 1
+        elif outcome == MISSING:
+            # Not fetched this time (a failed download, say); not an extraction attempt
+            log.warning("Could not fetch %s for retry; keeping it for a later run", symbol)
+        elif attempts + 1 < max_attempts:
+            failed[key]["attempts"] = attempts + 1
+        else:
+            log.error("Giving up on %s after %d extraction attempt(s)", symbol, attempts + 1)
+            del failed[key]
+        if journal is not None:
+            journal.record(pid, pat_state)
+    if not failed:
+        pat_state.pop("failed", None)
+    return saved
+
+
+def discover_recent(pattern_cfg: dict, pat_state: dict, out_dir: Path, languages: list[str],
+                    language: str, settings: dict, max_docs: int,
+                    journal: StateJournal | None, pool: ExtractionPool | None,
+                    templates: HeaderTemplates | None, cache: DiskCache | None,
+                    feed: ChangeFeed | None, inventory: IntervalSet, stop=None) -> int:
+    """Fetch the pattern's records modified since the last run, found by one query.
+
+    Instead of probing X values one search at a time, the Search API is
+    asked for every record whose symbol starts with the template's prefix
+    and that was modified at or after the pattern's ``discovered_until``
+    high-water mark.  Records already on disk cost nothing; the others are
+    fetched oldest first, with the search metadata reused, up to max_docs.
+    The mark advances past each handled record, so a run cut short by the
+    budget or *stop* resumes there.  It stops advancing at a record whose
+    PDFs could not be fetched, so the next run lists that record again.
+    Returns the number of symbols fetched.
+    """
+    pid = pattern_cfg["id"]
+    template = pattern_cfg["pattern"]
+    since = pat_state.get("discovered_until", "")
+    hits = search_recent(template.split("{X}")[0], since, language,
+                         settings.get("discovery_page_size", 200))
+    if hits is None:
+        return 0
+    log.info("Pattern %s: %d record(s) modified since %s", pid, len(hits), since or "the start")
+
+    failed = pat_state.get("failed", {})
+    processed = 0
+    held = False
+    for modified, rec_symbol, metadata in hits:
+        if processed >= max_docs or (stop is not None and stop.is_set()):
+            break
+        x = symbol_number(template, rec_symbol)
+        if x is not None and x not in inventory and str(x) not in failed:
+            symbol = template.replace("{X}", str(x))
+            log.info("Processing %s (X=%d, modified %s)", symbol, x, modified or "unknown")
+            outcome = fetch_symbol(symbol, out_dir, languages, language, settings, journal,
+                                   pool, templates, cache, feed,
+                                   metadata={**metadata, "symbol": symbol})
+            if outcome in (MISSING, BUSY):
+                log.warning("Could not fetch %s; it will be listed again next run", symbol)
+                held = True
+                if outcome == BUSY:
+                    break
+            else:
+                if outcome == SAVED:
+                    inventory.add(x)
+                else:
+                    failed[str(x)] = {"symbol": symbol, "attempts": 1}
+                    pat_state["failed"] = failed
+                pat_state["last_fetched"] = max(pat_state["last_fetched"], x)
+            processed += 1
+        if not held and modified > pat_state.get("discovered_until", ""):
+            pat_state["discovered_until"] = modified
+        if journal is not None:
+            journal.record(pid, pat_state)
+    return processed
+
+
+def frontier_lane(pattern_cfg: dict, pat_state: dict, inventory: IntervalSet) -> dict | None:
+    """Return the pattern's frontier lane, or None while the backlog is caught up.
+
+    The head of the series is the pattern's ``frontier`` setting (an X known
+    to exist) or the highest X on disk, whichever is newer.  While it is
+    ahead of where ``last_fetched`` would resume, new documents at the head
+    are probed from a lane of their own on every run, kept in the pattern's
+    ``frontier`` state entry.  Once the backlog reaches the lane, the lane is closed and
+    ``last_fetched`` carries on from its misses.
+    """
+    head = max(pattern_cfg.get("frontier", 0) - 1, inventory.max() if inventory else 0)
+    resume = inventory.next_missing(pat_state["last_fetched"] + 1) - 1
+    lane = pat_state.get("frontier")
+    if lane is None:
+        if head <= resume:
+            return None
+        lane = pat_state["frontier"] = {"last_fetched": head, "consecutive_misses": 0}
+        return lane
+    lane["last_fetched"] = max(lane["last_fetched"], head)
+    if lane["last_fetched"] > resume:
+        return lane
+    del pat_state["frontier"]
+    pat_state["last_fetched"] = max(pat_state["last_fetched"], lane["last_fetched"])
+    pat_state["consecutive_misses"] = lane["consecutive_misses"]
+    return None
+
+
+def probe_lane(pid: str, pat_state: dict, lane: dict, symbol_for, out_dir: Path,
+               languages: list[str], language: str, settings: dict, max_docs: int,
+               journal: StateJournal | None, pool: ExtractionPool | None,
+               templates: HeaderTemplates | None, cache: DiskCache | None,
+               feed: ChangeFeed | None, inventory: IntervalSet, stop=None,
+               until: int | None = None) -> int:
+    """Probe X values upward from a lane's cursor, one search per X.
+
+    *lane* is the pattern's state entry itself or its ``frontier`` lane;
+    its ``last_fetched`` and ``consecutive_misses`` advance in place and
+    the pattern's state is journaled after every document.  Probing stops
+    after max_docs documents, ``max_consecutive_misses`` misses in a row,
+    past X = *until*, or when the Search API is unavailable.  Returns the number of documents processed.
+    """
+    miss_threshold = settings.get("max_consecutive_misses", 3)
+    x = lane["last_fetched"] + 1
+    lane["consecutive_misses"] = lane.get("consecutive_misses", 0)
+    processed = 0
+
+    while processed < max_docs and lane["consecutive_misses"] < miss_threshold:
+        if stop is not None and stop.is_set():
+            break
+        if until is not None and x > until:
+            break
+        # Jump over a contiguous run of documents already on disk
+        if x in inventory:
+            next_x = inventory.next_missing(x)
+            log.info("Already exists: X=%d..%d (%d document(s)), skipping",
+                     x, next_x - 1, next_x - x)
+            lane["last_fetched"] = next_x - 1
+            lane["consecutive_misses"] = 0
+            x = next_x
+            if journal is not None:
+                journal.record(pid, pat_state)
+            continue
+
+        symbol = symbol_for(x)
+        log.info("Processing %s (X=%d)", symbol, x)
+
+        outcome = fetch_symbol(symbol, out_dir, languages, language, settings,
+                               journal, pool, templates, cache, feed)
+        if outcome == BUSY:
+            # Neither a miss nor progress; the lane resumes here next run
+            break
+        if outcome == MISSING:
+            lane["consecutive_misses"] += 1
+            x += 1
+            continue
+
+        if outcome == SAVED:
+            inventory.add(x)
+        else:
+            # The document exists upstream; retry it later with a larger budget
+            pat_state.setdefault("failed", {})[str(x)] = {"symbol": symbol, "attempts": 1}
+        lane["last_fetched"] = x
+        lane["consecutive_misses"] = 0
+        processed += 1
+        x += 1
+        if journal is not None:
+            journal.record(pid, pat_state)
+    return processed
+
+
+def bootstrap_headers(pid: str, out_dir: Path, language: str, templates: HeaderTemplates,
+                      budget: int, pool: ExtractionPool | None = None) -> int:
+    """Learn a series' header templates from the source PDFs of its saved documents.
+
+    Runs once per pattern and language: up to *budget* PDFs are downloaded
+    again and only their running headers are detected; the documents
+    themselves are not rewritten.  If no PDF could be downloaded the
+    bootstrap is tried again on the next run.  Returns the number of documents learned from.
+    """
+    learned = tried = 0
+    for path in sorted(out_dir.glob("*.md")):
+        if learned >= budget:
+            break
+        metadata, _ = read_header(path)
+        url = metadata.get("source_pdf", "")
+        if metadata.get("language", "EN") != language or not url.startswith("http"):
+            continue
+        tried += 1
+        pdf_bytes = download_pdf(url)
+        if pdf_bytes is None:
+            continue
+        try:
+            if pool is None:
+                detected = detect_pdf_headers(pdf_bytes)
+            else:
+                detected = pool.run(detect_pdf_headers, pdf_bytes)
+        except Exception as e:
+            log.warning("Could not detect headers of %s: %s", path.name, e)
+            continue
+        templates.learn(pid, metadata.get("symbol", ""), detected, language)
+        learned += 1
+    # Without any PDF to learn from, try again on a later run
+    if learned or not tried:
+        templates.mark_bootstrapped(pid, language)
+    if learned:
+        log.info("Bootstrapped %s (%s) header templates from %d saved document(s)",
+                 pid, language, learned)
+    return learned
+
+
+def process_pattern(pattern_cfg: dict, state: dict, settings: dict, max_docs: int,
+                    journal: StateJournal | None = None,
+                    pool: ExtractionPool | None = None,
+                    templates: HeaderTemplates | None = None,
+                    cache: DiskCache | None = None,
+                    inventory: IntervalSet | None = None, stop=None,
+                    feed: ChangeFeed | None = None) -> dict:
+    """Process a single pattern, fetching new documents.
+
+    When a journal is given, progress is journaled after every document and
+    made durable in batches, so a killed run resumes after the last saved
+    document.  Documents whose extraction ran out of time or memory are
+    kept in the pattern's ``failed`` map and retried first on later runs.
+
+    A caller polling repeatedly can pass the pattern's *inventory* to skip
+    the directory scan (it is updated in place), and a ``threading.Event``
+    as *stop* to end the loop after the current document.  Saved documents
+    are appended to *feed* when given.
+
+    While the head of the series is ahead of ``last_fetched`` (see
+    frontier_lane), up to ``frontier_lane_docs`` of the budget go to probing
+    the head first and the rest to the backlog.
+
+    Patterns with ``"discovery": "recent"`` find new documents with one
+    date-filtered query (see discover_recent) instead of probing X values.
+
+    With *templates*, a series' header templates are first bootstrapped
+    from its saved documents if that was never done (see bootstrap_headers).
+
+    Returns updated state entry for this pattern.
+    """
+    pid = pattern_cfg["id"]
+    template = pattern_cfg["pattern"]
+    start = pattern_cfg.get("start", 1)
+    language = settings.get("language", "EN")
+    languages = settings.get("languages") or [language]
+    miss_threshold = settings.get("max_consecutive_misses", 3)
+
+    pat_state = state.get(pid, {
+        "last_fetched": start - 1,
+        "last_run": "",
+        "consecutive_misses": 0,
+    })
+
+    out_dir = DOCS_DIR / pid
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # One directory scan instead of a stat per symbol
+    if inventory is None:
+        inventory = pattern_inventory(pattern_cfg, out_dir, languages, language)
+
+    if templates is not None:
+        for lang in languages:
+            if templates.needs_bootstrap(pid, lang):
+                bootstrap_headers(pid, out_dir, lang, templates,
+                                  settings.get("header_bootstrap_documents", 10), pool)
+
+    def symbol_for(n: int) -> str:
+        return template.replace("{X}", str(n))
+
+    # The newest X values are probed first, from a reserved share of the budget
+    docs_processed = 0
+    lane = None
+    if pattern_cfg.get("discovery") != "recent":
+        lane = frontier_lane(pattern_cfg, pat_state, inventory)
+    if lane is not None:
+        # Misses at the head only mean nothing new yet; the lane never goes dormant
+        lane["consecutive_misses"] = 0
+        docs_processed = probe_lane(pid, pat_state, lane, symbol_for, out_dir, languages,
+                                    language, settings,
+                                    min(settings.get("frontier_lane_docs", 2), max_docs),
+                                    journal, pool, templates, cache, feed, inventory, stop)
+        log.info("Pattern %s: frontier lane at X=%d, %d document(s)",
+                 pid, lane["last_fetched"], docs_processed)
+
+    docs_processed += retry_failed(pid, pat_state, symbol_for, out_dir, languages,
+                                   language, settings, journal, pool, templates, inventory,
+                                   cache, feed)
+    if pattern_cfg.get("discovery") == "recent":
+        docs_processed += discover_recent(pattern_cfg, pat_state, out_dir, languages, language,
+                                          settings, max_docs - docs_processed, journal, pool,
+                                          templates, cache, feed, inventory, stop)
+        pat_state["last_run"] = date.today().isoformat()
+        log.info("Pattern %s: processed %d documents", pid, docs_processed)
+        return pat_state
+
+    docs_processed += probe_lane(pid, pat_state, pat_state, symbol_for, out_dir, languages,
+                                 language, settings, max_docs - docs_processed, journal, pool,
+                                 templates, cache, feed, inventory, stop,
+                                 until=None if lane is None else lane["last_fetched"])
+    pat_state["last_run"] = date.today().isoformat()
+
+    if pat_state["consecutive_misses"] >= miss_threshold:
+        log.info("Pattern %s: reached %d consecutive misses, stopping",
+                 pid, pat_state["consecutive_misses"])
+    if lane is not None and frontier_lane(pattern_cfg, pat_state, inventory) is None:
+        log.info("Pattern %s: backfill caught up with the frontier", pid)
+
+    log.info("Pattern %s: processed %d documents", pid, docs_processed)
+    return pat_state
+
+
+def make_extraction_pool(settings: dict) -> ExtractionPool | None:
+    """Create the sandboxed extraction pool, or None if extraction_workers is 0."""
+    size = settings.get("extraction_workers", 1)
+    if not size:
+        return None
+    return ExtractionPool(
+        size=size,
+        timeout=settings.get("extraction_timeout_seconds", 120),
+        memory_mb=settings.get("extraction_memory_mb", 2048),
+        max_jobs=settings.get("extraction_worker_jobs", 25),
+    )
@@ -0,0 +1,120 @@
+"""
+Dry-run planner: estimate what a fetch run will cost before starting it.
+
+Reads config/patterns.json and state/progress.json, scans the documents/
+directory, and for each pattern estimates the symbols the fetch loop will
+probe, the network calls and the pacing delays it will make, and the
+expected runtime.  Delays are those of the per-host rate controller (see
+ratelimit.py) at its configured starting rate.  It also suggests a MAX_DOCS value that fits the
+workflow's job timeout.  Nothing is downloaded or written.
+
+The loop's upstream outcome is unknown in advance, so two bounds are
+given: the series has ended (the run stops after ``max_consecutive_misses``
+misses) and the series has at least MAX_DOCS new documents.
+"""
+
+import math
+
+from pipeline import DOCS_DIR, SEARCH_BASE, pattern_inventory
+from ratelimit import HostRates
+
+# Rough per-call costs used for runtime estimates (seconds)
+EST_REQUEST_SECONDS = 1.5
+EST_EXTRACT_SECONDS = 0.5
+# Job time reserved for checkout, dependency install, regeneration and commit
+JOB_OVERHEAD_SECONDS = 180
+
+
+def plan_pattern(pattern_cfg: dict, state: dict, settings: dict, max_docs: int) -> dict:
+    """Estimate the cost of running ``process_pattern`` for one pattern."""
+    pid = pattern_cfg["id"]
+    language = settings.get("language", "EN")
+    languages = settings.get("languages") or [language]
+    # Searches and PDF downloads share the Digital Library host's controller
+    delay = HostRates(settings).for_url(SEARCH_BASE).delay
+    miss_threshold = settings.get("max_consecutive_misses", 3)
+
+    pat_state = state.get(pid, {
+        "last_fetched": pattern_cfg.get("start", 1) - 1,
+        "consecutive_misses": 0,
+    })
+    x = pat_state["last_fetched"] + 1
+    misses_left = max(0, miss_threshold - pat_state.get("consecutive_misses", 0))
+
+    present = pattern_inventory(pattern_cfg, DOCS_DIR / pid, languages, language)
+
+    # Existing files ahead of the cursor are skipped without any request
+    skipped = present.next_missing(x) - x
+    holes_below_max = present.missing_between(x, present.max()) if present else 0
+
+    # Per probe: one search, then one download per language; a miss costs
+    # the same calls because each language falls back to undocs.org.  The
+    # host's controller spaces every request, parallel downloads included.
+    calls_per_probe = 1 + len(languages)
+    sleep_per_probe = calls_per_probe * delay
+    seconds_per_probe = sleep_per_probe + 2 * EST_REQUEST_SECONDS
+
+    if misses_left == 0:
+        probes_end = probes_full = 0
+    else:
+        probes_end = misses_left
+        probes_full = max_docs + misses_left - 1 if max_docs else 0
+
+    def _estimate(probes: int, docs: int) -> dict:
+        return {
+            "symbols": probes,
+            "requests": probes * calls_per_probe,
+            "sleep_seconds": probes * sleep_per_probe,
+            "runtime_seconds": probes * seconds_per_probe
+            + docs * len(languages) * EST_EXTRACT_SECONDS,
+        }
+
+    return {
+        "id": pid,
+        "start_x": x,
+        "dormant": misses_left == 0,
+        "skipped_existing": skipped,
+        "holes_below_max": holes_below_max,
+        "series_ended": _estimate(probes_end, 0),
+        "full_budget": _estimate(probes_full, max_docs if misses_left else 0),
+        "seconds_per_doc": seconds_per_probe + len(languages) * EST_EXTRACT_SECONDS,
+        "miss_tail_seconds": probes_end * seconds_per_probe,
+    }
+
+
+def suggest_max_docs(plans: list[dict], timeout_minutes: int) -> int:
+    """Largest MAX_DOCS for which every active pattern's worst case fits the timeout."""
+    active = [p for p in plans if not p["dormant"]]
+    if not active:
+        return 0
+    budget = timeout_minutes * 60 - JOB_OVERHEAD_SECONDS
+    budget -= sum(p["miss_tail_seconds"] for p in active)
+    per_round = sum(p["seconds_per_doc"] for p in active)
+    return max(0, math.floor(budget / per_round))
+
+
+def format_plan(plans: list[dict], max_docs: int, timeout_minutes: int) -> str:
+    """Render plans as a human-readable report."""
+    lines = [f"Fetch plan (MAX_DOCS={max_docs}, job timeout {timeout_minutes} min)"]
+    for p in plans:
+        lines.append("")
+        lines.append(f"{p['id']}: next X={p['start_x']}")
+        if p["dormant"]:
+            lines.append("  dormant: max_consecutive_misses already reached, no requests")
+            continue
+        if p["skipped_existing"]:
+            lines.append(f"  skips {p['skipped_existing']} existing file(s) at the cursor")
+        if p["holes_below_max"]:
+            lines.append(f"  {p['holes_below_max']} missing X value(s) below the highest existing file")
+        for label, key in (("series ended", "series_ended"), ("full budget", "full_budget")):
+            e = p[key]
+            lines.append(
+                f"  {label + ':':14s}{e['symbols']:5d} symbols {e['requests']:6d} requests "
+                f"{e['sleep_seconds']:7.0f}s sleep  ~{e['runtime_seconds'] / 60:.1f} min"
+            )
+    total = sum(p["full_budget"]["runtime_seconds"] for p in plans)
+    lines.append("")
+    lines.append(f"Worst case for all patterns: ~{total / 60:.1f} min")
+    lines.append(f"Suggested MAX_DOCS for a {timeout_minutes} min job: "
+                 f"{suggest_max_docs(plans, timeout_minutes)}")
+    return "\n".join(lines)
@@ -0,0 +1,142 @@
+"""
+Adaptive per-host request pacing (AIMD).
+
+Each host gets a ``RateController`` that spaces requests by its current
+delay.  Fast, clean responses raise the request rate additively; throttling
+(HTTP 429 or 503, an empty 202 from the Search API), network errors and a
+latency well above the host's running average cut it multiplicatively.  A
+``Retry-After`` header holds all requests to the host until it expires.
+``request_delay_seconds`` is the starting delay.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+log = logging.getLogger("railcar.ratelimit")
+
+# 202 is how the Search API answers with an empty body when it is busy
+THROTTLE_STATUSES = {202, 429, 503}
+
+# Weight of the newest sample in the latency moving average
+_LATENCY_ALPHA = 0.2
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the seconds to wait from a Retry-After header (seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateController:
+    """AIMD pacing of the requests to one host.
+
+    The rate (requests per second) grows by *increase* after each clean
+    response and is multiplied by *decrease* on back-pressure, staying
+    between 1/max_delay and 1/min_delay.
+    """
+
+    def __init__(self, delay: float = 2.0, min_delay: float = 0.25, max_delay: float = 60.0,
+                 increase: float = 0.05, decrease: float = 0.5, slow_factor: float = 3.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.min_rate = 1 / max_delay
+        self.max_rate = 1 / min_delay if min_delay > 0 else float("inf")
+        self.rate = min(self.max_rate, 1 / delay) if delay > 0 else self.max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.latency: float | None = None
+        self.requests = 0
+        self.throttled = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def delay(self) -> float:
+        return 1 / self.rate
+
+    def acquire(self) -> None:
+        """Wait until the next request to this host may be sent."""
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._next)
+            self._next = start + self.delay
+            self.requests += 1
+        if start > now:
+            self._sleep(start - now)
+
+    def record(self, status: int | None, latency: float, retry_after: str | None = None) -> None:
+        """Adjust the rate after a response (status None for a network error)."""
+        with self._lock:
+            slow = (self.latency is not None and latency > 1.0
+                    and latency > self.slow_factor * self.latency)
+            self.latency = latency if self.latency is None else (
+                _LATENCY_ALPHA * latency + (1 - _LATENCY_ALPHA) * self.latency)
+
+            throttled = status in THROTTLE_STATUSES
+            if throttled:
+                self.throttled += 1
+            if status is None or throttled or slow:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            elif status < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+            wait = parse_retry_after(retry_after)
+            if wait:
+                self._next = max(self._next, self._clock() + wait)
+                log.warning("Server asked to retry after %.0fs", wait)
+
+    def back_off(self) -> None:
+        """Cut the rate for back-pressure not visible in the status, such as an empty body."""
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+
+class HostRates:
+    """One ``RateController`` per host, configured from settings."""
+
+    def __init__(self, settings: dict | None = None, **kwargs):
+        settings = settings or {}
+        self._options = {
+            "delay": settings.get("request_delay_seconds", 2),
+            "min_delay": settings.get("rate_min_delay_seconds", 0.25),
+            "max_delay": settings.get("rate_max_delay_seconds", 60),
+            "increase": settings.get("rate_increase", 0.05),
+            **kwargs,
+        }
+        self._controllers: dict[str, RateController] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> RateController:
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            controller = self._controllers.get(host)
+            if controller is None:
+                controller = self._controllers[host] = RateController(**self._options)
+            return controller
+
+    def report(self) -> list[str]:
+        """One line per host with its current rate, for the run log."""
+        lines = []
+        for host, c in sorted(self._controllers.items()):
+            latency = f"{c.latency:.2f}s" if c.latency is not None else "n/a"
+            lines.append(f"{host}: {c.rate:.2f} req/s (delay {c.delay:.2f}s), "
+                         f"{c.requests} request(s), {c.throttled} throttled, "
+                         f"avg latency {latency}")
+        return lines
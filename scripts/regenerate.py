@@ -1,18 +1,35 @@
 """
 Re-generate document files whose extract_version is older than the current version.
 
-Reads each existing .md file, parses the YAML front matter and body text,
-re-applies the current cleaning logic to the body, then re-formats the output
-using the current schema version. No PDF re-download is needed.
+Reads only the YAML front matter of each existing .md file; for outdated files
+it then loads the body text, re-applies the current cleaning logic, and
+re-formats the output using the current schema version. No PDF re-download
+is needed.
 
 This ensures all files are reprocessed with the latest extraction logic
 whenever EXTRACT_VERSION is bumped in extract.py.
+
+With a stage cache (``stage_cache_mb`` in config/patterns.json), cleaning
+stages whose version and input are unchanged are served from ``.cache/``
+instead of recomputed.  The stored body is the previous version's output,
+so after a bump the first stage always misses (see extract.py).  Each regenerated file is appended to the change
+feed (see changefeed.py) when one is given.
+
+Run directly (``python regenerate.py``) for a regenerate-only pass; this
+entry point never imports PyMuPDF, lxml or requests.
 """
 
+import json
 import logging
 from pathlib import Path
 
-from extract import EXTRACT_VERSION, clean_text, format_output, parse_document
+from cache import DiskCache, open_cache
+from changefeed import REGENERATED, ChangeFeed
+from docindex import sidecar_path, write_index
+from extract import EXTRACT_VERSION, clean_text, format_output
+from frontmatter import read_body, read_header
+from headers import HeaderTemplates
+from storage import atomic_write_text
 
 log = logging.getLogger("railcar.regenerate")
 
@@ -24,13 +41,19 @@ def needs_regeneration(file_version: str) -> bool:
     return file_version != EXTRACT_VERSION
 
 
-def regenerate_file(path: Path) -> bool:
+def regenerate_file(path: Path, templates: HeaderTemplates | None = None,
+                    cache: DiskCache | None = None, feed: ChangeFeed | None = None) -> bool:
     """Re-generate a single document file if its schema version is outdated.
 
+    Running headers learned for the file's series (its top-level directory
+    under documents/) are stripped when templates are given.  Cleaning
+    stages are memoized in *cache* when given, and the rewrite is recorded
+    in *feed* when given.
+
     Returns True if the file was regenerated, False if skipped.
     """
-    content = path.read_text(encoding="utf-8")
-    metadata, body = parse_document(content)
+    # Only the front matter is read for files that are already current
+    metadata, body_offset = read_header(path)
 
     if "symbol" not in metadata:
         return False
@@ -41,15 +64,30 @@ def regenerate_file(path: Path) -> bool:
 
     log.info("Regenerating %s (version %s -> %s)", path.name, file_version, EXTRACT_VERSION)
 
-    body = clean_text(body)
+    header_lines = None
+    if templates is not None:
+        pid = path.relative_to(DOCS_DIR).parts[0]
+        header_lines = templates.header_lines(pid, metadata["symbol"],
+                                              metadata.get("language", "EN"))
+
+    body = clean_text(read_body(path, body_offset), header_lines, cache)
     output = format_output(body, metadata)
-    path.write_text(output, encoding="utf-8")
+    atomic_write_text(path, output)
+    write_index(path)
+    if feed is not None:
+        feed.append(REGENERATED, metadata["symbol"], path.relative_to(DOCS_DIR).as_posix(),
+                    output.encode("utf-8"), EXTRACT_VERSION)
     return True
 
 
-def regenerate_all() -> int:
+def regenerate_all(templates: HeaderTemplates | None = None,
+                   cache: DiskCache | None = None, feed: ChangeFeed | None = None) -> int:
     """Scan all document directories and regenerate files with outdated versions.
 
+    Current files without an offset index sidecar are indexed.  Sidecars are
+    rewritten whenever their document is, so existing ones are not checked:
+    that would hash every body on every run.
+
     Returns the number of files regenerated.
     """
     if not DOCS_DIR.exists():
@@ -59,8 +97,10 @@ def regenerate_all() -> int:
     regenerated = 0
     for md_file in sorted(DOCS_DIR.rglob("*.md")):
         try:
-            if regenerate_file(md_file):
+            if regenerate_file(md_file, templates, cache, feed):
                 regenerated += 1
+            elif not sidecar_path(md_file).exists():
+                write_index(md_file)
         except Exception as e:
             log.error("Failed to regenerate %s: %s", md_file, e)
 
@@ -68,5 +108,22 @@ def regenerate_all() -> int:
         log.info("Regenerated %d file(s) to extract version %s", regenerated, EXTRACT_VERSION)
     else:
         log.info("All files already at extract version %s", EXTRACT_VERSION)
+    if cache is not None and cache.hits + cache.misses:
+        log.info("Stage cache: %s", cache.stats())
 
     return regenerated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    root = DOCS_DIR.parent
+    settings = json.loads((root / "config" / "patterns.json").read_text()).get("settings", {})
+    feed = ChangeFeed(segment_events=settings.get("feed_segment_events", 10000))
+    try:
+        regenerate_all(HeaderTemplates(root / "state" / "headers.json"),
+                       open_cache("stages", settings.get("stage_cache_mb", 256)), feed)
+    finally:
+        feed.close()
@@ -0,0 +1,158 @@
+"""
+Predictable PDF URLs, learned per pattern.
+
+The Search API lists each language's PDF at a URL built from the record id,
+the sanitized symbol and the language code, e.g.
+``https://digitallibrary.un.org/record/4093123/files/A_RES_80_5-EN.pdf``.
+Every URL seen in a search result is generalized into a template by
+replacing those parts with ``{record_id}``, ``{symbol}`` and ``{LANG}``
+(or ``{lang}``), and counted for the pattern.  When a language's URL is not
+in the search result, or the record is already known from a document on
+disk, the pattern's templates are instantiated and tried directly, before
+the undocs.org fallback and without a search.
+
+Each try is recorded as a hit or a miss.  Templates are tried in order of
+hit rate; one that has missed too often is skipped.  Templates and counts
+are persisted in ``state/url_templates.json``; processes sharing a checkout
+(backfill workers) add their counts to what the others saved, under a lock.
+"""
+
+import copy
+import json
+import logging
+import threading
+from pathlib import Path
+
+from storage import atomic_write_text, file_lock, merge_counts
+
+log = logging.getLogger("railcar.resolve")
+
+# Known before any search result was seen
+DEFAULT_TEMPLATES = (
+    "https://digitallibrary.un.org/record/{record_id}/files/{symbol}-{LANG}.pdf",
+)
+
+# Templates kept per pattern; the least seen are dropped beyond this
+MAX_TEMPLATES = 20
+
+
+def generalize(url: str, record_id: str, sanitized: str, language: str) -> str | None:
+    """Turn a PDF URL into a template, or None if it does not contain the symbol and language."""
+    template = url
+    if record_id:
+        template = template.replace(f"/record/{record_id}/", "/record/{record_id}/")
+    for code, placeholder in ((language.upper(), "{LANG}"), (language.lower(), "{lang}")):
+        name = f"{sanitized}-{code}"
+        if name in template:
+            return template.replace(name, "{symbol}-" + placeholder)
+    return None
+
+
+def instantiate(template: str, record_id: str, sanitized: str, language: str) -> str:
+    """Fill a template's placeholders."""
+    return (template.replace("{record_id}", record_id)
+            .replace("{symbol}", sanitized)
+            .replace("{LANG}", language.upper())
+            .replace("{lang}", language.lower()))
+
+
+class UrlTemplates:
+    """Per-pattern URL templates with how often each was seen and hit.
+
+    A template that was tried at least *min_tries* times with a hit rate
+    below *min_hit_rate* is no longer tried.  Without a path nothing is
+    persisted.
+    """
+
+    def __init__(self, path: Path | None = None, min_tries: int = 5,
+                 min_hit_rate: float = 0.2):
+        self.path = path
+        self.min_tries = min_tries
+        self.min_hit_rate = min_hit_rate
+        self._lock = threading.Lock()
+        self._data = _read(path)
+        # The data as last loaded or saved, against which our counts are merged
+        self._base = copy.deepcopy(self._data)
+        self._dirty = False
+
+    def _entry(self, pid: str) -> dict:
+        entry = self._data.setdefault(pid, {})
+        for template in DEFAULT_TEMPLATES:
+            entry.setdefault(template, {"seen": 0, "tries": 0, "hits": 0})
+        return entry
+
+    def candidates(self, pid: str, sanitized: str, language: str,
+                   record_id: str = "") -> list[tuple[str, str]]:
+        """Return (template, url) pairs to try for one language, best first."""
+        with self._lock:
+            entry = self._entry(pid)
+            ranked = sorted(
+                entry.items(),
+                key=lambda item: (-(item[1]["hits"] + 1) / (item[1]["tries"] + 2),
+                                  -item[1]["seen"]),
+            )
+        result = []
+        for template, stats in ranked:
+            if "{record_id}" in template and not record_id:
+                continue
+            if (stats["tries"] >= self.min_tries
+                    and stats["hits"] < self.min_hit_rate * stats["tries"]):
+                continue
+            result.append((template, instantiate(template, record_id, sanitized, language)))
+        return result
+
+    def learn(self, pid: str, pdf_urls: dict[str, str], record_id: str, sanitized: str) -> None:
+        """Count the templates of the PDF URLs of one search result."""
+        with self._lock:
+            entry = self._entry(pid)
+            for language, url in pdf_urls.items():
+                template = generalize(url, record_id, sanitized, language)
+                if template is None:
+                    continue
+                stats = entry.setdefault(template, {"seen": 0, "tries": 0, "hits": 0})
+                stats["seen"] += 1
+            self._data[pid] = _trim(entry)
+            self._dirty = True
+
+    def record(self, pid: str, template: str, hit: bool) -> None:
+        """Record whether a URL built from template served the PDF."""
+        with self._lock:
+            stats = self._entry(pid).setdefault(template, {"seen": 0, "tries": 0, "hits": 0})
+            stats["tries"] += 1
+            stats["hits"] += int(hit)
+            self._dirty = True
+
+    def report(self) -> list[str]:
+        """One line per tried template: its pattern, hits and tries."""
+        lines = []
+        with self._lock:
+            for pid, entry in sorted(self._data.items()):
+                for template, stats in entry.items():
+                    if stats["tries"]:
+                        lines.append(f"{pid} {template}: {stats['hits']}/{stats['tries']} hits")
+        return lines
+
+    def save(self) -> None:
+        """Add the counts changed since the last load or save to the store on disk."""
+        if self.path is None or not self._dirty:
+            return
+        with self._lock, file_lock(self.path.with_name(self.path.name + ".lock")):
+            data = merge_counts(_read(self.path), self._data, self._base)
+            data = {pid: _trim(entry) for pid, entry in data.items()}
+            atomic_write_text(self.path, json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+            self._data, self._base = data, copy.deepcopy(data)
+            self._dirty = False
+
+
+def _read(path: Path | None) -> dict:
+    if path is None or not path.exists():
+        return {}
+    content = path.read_text(encoding="utf-8").strip()
+    return json.loads(content) if content else {}
+
+
+def _trim(entry: dict) -> dict:
+    """Keep the MAX_TEMPLATES most seen templates of a pattern."""
+    if len(entry) <= MAX_TEMPLATES:
+        return entry
+    return dict(sorted(entry.items(), key=lambda item: -item[1]["seen"])[:MAX_TEMPLATES])
@@ -0,0 +1,162 @@
+"""
+Long-running fetch daemon for self-hosted runners.
+
+``python fetch_documents.py --serve`` loads config and state once, keeps
+the HTTP session, extraction workers, caches, header templates and each
+pattern's inventory warm, and polls every enabled pattern on its own
+interval.  A poll that finds new documents halves the pattern's interval
+(down to ``serve_min_interval_minutes``); a poll that finds none doubles it
+(up to ``serve_max_interval_minutes``).  Instead of going dormant after
+``max_consecutive_misses``, a pattern is probed again at its backed-off
+interval.
+
+Progress is journaled after every poll and checkpointed into
+``progress.json`` every ``serve_checkpoint_minutes``.  SIGTERM or SIGINT
+stops the daemon after the current document, with a final checkpoint.
+"""
+
+import logging
+import signal
+import threading
+import time
+
+from cache import open_cache
+from changefeed import FEED_DIR, ChangeFeed
+from pipeline import (
+    DOCS_DIR,
+    HEADERS_PATH,
+    configure_rates,
+    configure_urls,
+    log_rate_report,
+    log_url_report,
+    make_extraction_pool,
+    pattern_inventory,
+    process_pattern,
+    save_urls,
+)
+from headers import HeaderTemplates
+from neardup import NEARDUP_PATH, NearDuplicateIndex
+from neardup import update as update_near_duplicates
+from regenerate import regenerate_all
+from storage import StateJournal
+
+log = logging.getLogger("railcar.serve")
+
+
+def next_interval(interval: float, found: int, lo: float, hi: float) -> float:
+    """Halve the poll interval after new documents, double it after none."""
+    return max(lo, interval / 2) if found else min(hi, interval * 2)
+
+
+class Daemon:
+    """Polls patterns on adaptive intervals until stopped."""
+
+    def __init__(self, patterns: list[dict], state: dict, settings: dict, max_docs: int,
+                 journal: StateJournal, clock=time.monotonic):
+        self.patterns = [p for p in patterns if p.get("enabled", True)]
+        self.state = state
+        self.settings = settings
+        self.max_docs = max_docs
+        self.journal = journal
+        self.clock = clock
+        self.min_interval = settings.get("serve_min_interval_minutes", 10) * 60
+        self.max_interval = settings.get("serve_max_interval_minutes", 720) * 60
+        self.checkpoint_interval = settings.get("serve_checkpoint_minutes", 30) * 60
+        self.stop_event = threading.Event()
+
+        start = clock()
+        initial = settings.get("serve_interval_minutes", 60) * 60
+        # pid -> [next due time, current interval]; every pattern is due at start
+        self.schedule = {p["id"]: [start, initial] for p in self.patterns}
+        self.inventories = {}
+        self.pool = None
+        self.cache = None
+        self.templates = None
+        self.feed = None
+        self.dups = None
+
+    def stop(self, *_) -> None:
+        log.info("Stop requested, finishing the current document")
+        self.stop_event.set()
+
+    def poll(self, pattern_cfg: dict) -> int:
+        """Run one fetch pass over a pattern and reschedule it.
+
+        Returns the number of new documents found.
+        """
+        pid = pattern_cfg["id"]
+        language = self.settings.get("language", "EN")
+        languages = self.settings.get("languages") or [language]
+        inventory = self.inventories.get(pid)
+        if inventory is None:
+            inventory = pattern_inventory(pattern_cfg, DOCS_DIR / pid, languages, language)
+            self.inventories[pid] = inventory
+        before = len(inventory)
+
+        # The backed-off interval replaces dormancy after repeated misses
+        if pid in self.state:
+            self.state[pid]["consecutive_misses"] = 0
+
+        self.state[pid] = process_pattern(pattern_cfg, self.state, self.settings,
+                                          self.max_docs, self.journal, self.pool,
+                                          self.templates, self.cache, inventory,
+                                          self.stop_event, self.feed)
+        self.journal.record(pid, self.state[pid])
+        self.journal.commit()
+        if self.feed is not None:
+            self.feed.sync()
+        if self.dups is not None:
+            update_near_duplicates(self.dups)
+        if self.templates is not None:
+            self.templates.save()
+        save_urls()
+
+        found = len(inventory) - before
+        entry = self.schedule[pid]
+        entry[1] = next_interval(entry[1], found, self.min_interval, self.max_interval)
+        entry[0] = self.clock() + entry[1]
+        log.info("Pattern %s: %d new document(s), next poll in %.0f min",
+                 pid, found, entry[1] / 60)
+        return found
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        configure_rates(self.settings)
+        configure_urls(self.settings)
+        self.templates = HeaderTemplates(HEADERS_PATH)
+        self.feed = ChangeFeed(FEED_DIR, self.settings.get("feed_segment_events", 10000))
+        self.dups = NearDuplicateIndex(NEARDUP_PATH,
+                                       self.settings.get("near_duplicate_threshold", 0.8))
+        regenerate_all(self.templates,
+                       open_cache("stages", self.settings.get("stage_cache_mb", 256)), self.feed)
+        self.pool = make_extraction_pool(self.settings)
+        self.cache = open_cache("extractions", self.settings.get("extraction_cache_mb", 512))
+        log.info("Serving %d pattern(s)", len(self.patterns))
+
+        last_checkpoint = self.clock()
+        try:
+            while not self.stop_event.is_set() and self.patterns:
+                for pattern_cfg in self.patterns:
+                    if self.stop_event.is_set():
+                        break
+                    if self.schedule[pattern_cfg["id"]][0] <= self.clock():
+                        self.poll(pattern_cfg)
+
+                if self.clock() - last_checkpoint >= self.checkpoint_interval:
+                    self.journal.checkpoint(self.state)
+                    last_checkpoint = self.clock()
+
+                next_due = min(due for due, _ in self.schedule.values())
+                self.stop_event.wait(max(0.0, next_due - self.clock()))
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+            self.feed.close()
+            self.journal.checkpoint(self.state)
+            if self.cache is not None:
+                log.info("Extraction cache: %s", self.cache.stats())
+            log_rate_report()
+            log_url_report()
+            log.info("Daemon stopped.")
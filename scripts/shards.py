@@ -0,0 +1,327 @@
+"""
+Sharded backfill: X ranges leased to parallel workers through a shared directory.
+
+A pattern with ``backfill_end`` in its config can be backfilled by several
+runners at once with ``python fetch_documents.py --backfill``.  The range
+from ``start`` to ``backfill_end`` is cut into shards of
+``backfill_shard_size`` X values.  A worker leases one shard at a time by
+creating ``<dir>/<pattern>/<start>-<end>.lease`` exclusively; the lease
+records the worker, its expiry and the next X to probe, and is renewed after
+every symbol.  An expired lease (a crashed worker, or one that released a
+shard when its MAX_DOCS budget ran out) is taken over and resumed from its
+cursor.  A finished shard leaves a ``.done`` marker.
+
+Each worker records the X values it processed, and the symbols whose
+extraction failed, in its own fragment under ``<dir>/fragments/``.
+``--merge-backfill`` folds all fragments into ``progress.json``: a
+pattern's ``last_fetched`` advances over every contiguous completed X and
+failed symbols join its retry list, each only once (their X values are kept
+in ``backfill_merged``).  Merging is idempotent.
+
+The directory is ``backfill_dir`` in settings (default ``state/backfill``);
+point it at a shared mount to split a backfill across machines.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from pipeline import (
+    BUSY,
+    DOCS_DIR,
+    FAILED,
+    SAVED,
+    fetch_symbol,
+    pattern_inventory,
+)
+from inventory import IntervalSet
+from storage import atomic_write_text
+
+log = logging.getLogger("railcar.shards")
+
+
+class Lease:
+    """A worker's claim on the shard [start, end] of a pattern."""
+
+    __slots__ = ("pid", "start", "end", "next", "path")
+
+    def __init__(self, pid: str, start: int, end: int, next_x: int, path: Path):
+        self.pid = pid
+        self.start = start
+        self.end = end
+        self.next = next_x
+        self.path = path
+
+
+class LeaseCoordinator:
+    """Hands out shard leases using exclusive file creation in a directory."""
+
+    def __init__(self, directory: Path, worker: str, lease_seconds: float = 1800,
+                 clock=time.time):
+        self.directory = directory
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+
+    @staticmethod
+    def shards(lo: int, hi: int, size: int) -> list[tuple[int, int]]:
+        """Split [lo, hi] into consecutive shards of at most size values."""
+        size = max(1, size)
+        return [(s, min(hi, s + size - 1)) for s in range(lo, hi + 1, size)]
+
+    def acquire(self, pid: str, lo: int, hi: int, size: int) -> Lease | None:
+        """Lease the first shard of [lo, hi] that is neither done nor held."""
+        pattern_dir = self.directory / pid
+        pattern_dir.mkdir(parents=True, exist_ok=True)
+        for start, end in self.shards(lo, hi, size):
+            base = pattern_dir / f"{start}-{end}"
+            if base.with_suffix(".done").exists():
+                continue
+            lease = self._claim(pid, start, end, base.with_suffix(".lease"))
+            if lease is not None:
+                log.info("Leased %s X=%d..%d (next X=%d)", pid, start, end, lease.next)
+                return lease
+        return None
+
+    def _claim(self, pid: str, start: int, end: int, path: Path) -> Lease | None:
+        next_x = start
+        if path.exists():
+            try:
+                text = path.read_text(encoding="utf-8")
+                held = json.loads(text)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            if held["expires"] > self.clock():
+                return None
+            # Take over an expired lease: only one worker wins the rename
+            tombstone = self._aside(path)
+            try:
+                os.rename(path, tombstone)
+            except FileNotFoundError:
+                return None
+            if tombstone.read_text(encoding="utf-8") != text:
+                # Another worker took it over since we read it; put its lease back
+                self._restore(tombstone, path)
+                return None
+            tombstone.unlink()
+            next_x = held["next"]
+        else:
+            # A lease renamed aside by its holder to be renewed is still held
+            held = self._held_aside(path)
+            if held is not None:
+                if held["expires"] > self.clock():
+                    return None
+                next_x = held["next"]
+        lease = Lease(pid, start, end, next_x, path)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self._record(lease, self.clock() + self.lease_seconds))
+        return lease
+
+    def _aside(self, path: Path) -> Path:
+        return path.with_name(f"{path.name}.{self.worker}.stale")
+
+    @staticmethod
+    def _held_aside(path: Path) -> dict | None:
+        for aside in path.parent.glob(f"{path.name}.*.stale"):
+            try:
+                return json.loads(aside.read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+        return None
+
+    @staticmethod
+    def _restore(aside: Path, path: Path) -> bool:
+        """Move a lease back from aside; False if a new lease was created meanwhile."""
+        try:
+            os.link(aside, path)
+        except FileExistsError:
+            return False
+        finally:
+            aside.unlink()
+        return True
+
+    def _record(self, lease: Lease, expires: float) -> str:
+        return json.dumps({"worker": self.worker, "expires": expires, "next": lease.next})
+
+    def _rewrite(self, lease: Lease, expires: float) -> bool:
+        """Write the lease if we still hold it, with the takeover's rename protocol.
+
+        The lease is renamed aside first, so a worker taking it over at the
+        same time finds it either gone or rewritten, never checked and then
+        overwritten.
+        """
+        aside = self._aside(lease.path)
+        try:
+            os.rename(lease.path, aside)
+        except FileNotFoundError:
+            return False
+        try:
+            held = json.loads(aside.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            held = {}
+        if held.get("worker") != self.worker:
+            self._restore(aside, lease.path)
+            return False
+        atomic_write_text(aside, self._record(lease, expires))
+        return self._restore(aside, lease.path)
+
+    def renew(self, lease: Lease) -> bool:
+        """Save the lease's cursor and extend it; False if it was taken over."""
+        if not self._rewrite(lease, self.clock() + self.lease_seconds):
+            log.warning("Lost lease on %s X=%d..%d", lease.pid, lease.start, lease.end)
+            return False
+        return True
+
+    def release(self, lease: Lease) -> None:
+        """Give up an unfinished shard so another worker resumes it at its cursor."""
+        self._rewrite(lease, 0)
+
+    def complete(self, lease: Lease) -> None:
+        """Mark a shard done and drop its lease."""
+        atomic_write_text(lease.path.with_suffix(".done"),
+                          json.dumps({"worker": self.worker}) + "\n")
+        try:
+            lease.path.unlink()
+        except FileNotFoundError:
+            pass
+        log.info("Completed %s X=%d..%d", lease.pid, lease.start, lease.end)
+
+
+class StateFragment:
+    """One worker's processed X values and failed symbols, per pattern."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: dict[str, IntervalSet] = {}
+        self.failed: dict[str, dict] = {}
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            for pid, entry in data.items():
+                self.done[pid] = _ranges_to_set(entry["done"])
+                self.failed[pid] = entry["failed"]
+
+    def add(self, pid: str, x: int) -> None:
+        self.done.setdefault(pid, IntervalSet()).add(x)
+
+    def fail(self, pid: str, x: int, symbol: str) -> None:
+        self.failed.setdefault(pid, {})[str(x)] = {"symbol": symbol, "attempts": 1}
+
+    def save(self) -> None:
+        data = {
+            pid: {"done": done.ranges(), "failed": self.failed.get(pid, {})}
+            for pid, done in self.done.items()
+        }
+        atomic_write_text(self.path, json.dumps(data) + "\n")
+
+
+def _ranges_to_set(ranges) -> IntervalSet:
+    return IntervalSet(x for start, end in ranges for x in range(start, end + 1))
+
+
+def backfill_pattern(pattern_cfg: dict, settings: dict, coordinator: LeaseCoordinator,
+                     fragment: StateFragment, max_docs: int, pool=None, templates=None,
+                     cache=None, feed=None) -> int:
+    """Work through leased shards of a pattern's backfill range.
+
+    Unlike ``process_pattern``, misses do not stop the loop: gaps are normal
+    in a historical range.  Returns the number of symbols probed, at most
+    max_docs.
+    """
+    pid = pattern_cfg["id"]
+    end = pattern_cfg.get("backfill_end")
+    if not end:
+        log.info("Pattern %s has no backfill_end, skipping", pid)
+        return 0
+    template = pattern_cfg["pattern"]
+    language = settings.get("language", "EN")
+    languages = settings.get("languages") or [language]
+    size = settings.get("backfill_shard_size", 50)
+
+    out_dir = DOCS_DIR / pid
+    out_dir.mkdir(parents=True, exist_ok=True)
+    inventory = pattern_inventory(pattern_cfg, out_dir, languages, language)
+
+    probed = 0
+    busy = False
+    while probed < max_docs and not busy:
+        lease = coordinator.acquire(pid, pattern_cfg.get("start", 1), end, size)
+        if lease is None:
+            break
+        owned = True
+        while owned and lease.next <= lease.end and probed < max_docs:
+            x = lease.next
+            if x in inventory:
+                # Skip the run of existing documents inside this shard
+                stop = min(inventory.next_missing(x), lease.end + 1)
+                for n in range(x, stop):
+                    fragment.add(pid, n)
+                lease.next = stop
+            else:
+                symbol = template.replace("{X}", str(x))
+                outcome = fetch_symbol(symbol, out_dir, languages, language, settings,
+                                       None, pool, templates, cache, feed)
+                if outcome == BUSY:
+                    # Released below with its cursor at this X
+                    busy = True
+                    break
+                probed += 1
+                if outcome == SAVED:
+                    inventory.add(x)
+                elif outcome == FAILED:
+                    fragment.fail(pid, x, symbol)
+                fragment.add(pid, x)
+                lease.next = x + 1
+            fragment.save()
+            owned = coordinator.renew(lease)
+        if not owned:
+            continue
+        if lease.next > lease.end:
+            coordinator.complete(lease)
+        else:
+            coordinator.release(lease)
+
+    log.info("Pattern %s: backfill probed %d symbol(s)", pid, probed)
+    return probed
+
+
+def merge_fragments(state: dict, directory: Path, patterns: list[dict]) -> dict:
+    """Fold every worker fragment under directory into state and return it."""
+    ranges: dict[str, list] = {}
+    failed: dict[str, dict] = {}
+    for path in sorted((directory / "fragments").glob("*.json")):
+        fragment = StateFragment(path)
+        for pid, values in fragment.done.items():
+            ranges.setdefault(pid, []).extend(values.ranges())
+        for pid, entries in fragment.failed.items():
+            failed.setdefault(pid, {}).update(entries)
+    done = {pid: _ranges_to_set(r) for pid, r in ranges.items()}
+
+    starts = {p["id"]: p.get("start", 1) for p in patterns}
+    for pid, values in done.items():
+        pat_state = state.setdefault(pid, {
+            "last_fetched": starts.get(pid, 1) - 1,
+            "last_run": "",
+            "consecutive_misses": 0,
+        })
+        x = pat_state["last_fetched"] + 1
+        if x in values:
+            pat_state["last_fetched"] = values.next_missing(x) - 1
+            pat_state["consecutive_misses"] = 0
+        # Failed symbols are handed over once: after the main loop retried and
+        # cleared one, merging the same fragment again must not bring it back
+        merged = set(pat_state.get("backfill_merged", []))
+        for key, entry in failed.get(pid, {}).items():
+            if key not in merged:
+                pat_state.setdefault("failed", {}).setdefault(key, entry)
+                merged.add(key)
+        if merged:
+            pat_state["backfill_merged"] = sorted(merged, key=int)
+        log.info("Pattern %s: merged %d backfilled X value(s), last_fetched=%d",
+                 pid, len(values), pat_state["last_fetched"])
+    return state
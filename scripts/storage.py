@@ -0,0 +1,232 @@
+"""
+Crash-safe file writes and a write-ahead journal for fetch progress.
+
+Documents and state files are written to a temporary file in the target
+directory and moved into place with ``os.replace``, so a killed job never
+leaves a truncated file behind.  Per-pattern progress updates are appended
+to ``progress.journal`` (one JSON object per line) and fsynced in batches;
+``load`` replays the journal on top of ``progress.json`` so a run resumes
+exactly where the previous one stopped.  ``checkpoint`` folds the journal
+back into ``progress.json`` and removes it.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+log = logging.getLogger("railcar.storage")
+
+# Read once: os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_open(path: Path, sync: bool = True, binary: bool = False):
+    """Open a text (or binary) file for writing that replaces path only on success.
+
+    The data goes to a temporary file in the same directory, which is moved
+    over path with ``os.replace`` when the block exits normally and removed
+    if it raises.  With ``sync=False`` the data is not fsynced; callers
+    batching many writes should register the path with
+    ``StateJournal.track`` so it is synced at the next commit.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        f = os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8", newline="")
+        with f:
+            yield f
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        # mkstemp creates the file 0600; keep the mode a plain write would give
+        os.chmod(tmp_name, _file_mode(path))
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    if sync:
+        _fsync_dir(path.parent)
+
+
+def _file_mode(path: Path) -> int:
+    """Return the existing file's permission bits, or those of a new file under the umask."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_text(path: Path, text: str, sync: bool = True) -> None:
+    """Write text to path via a temporary file and ``os.replace``."""
+    with atomic_open(path, sync=sync) as f:
+        f.write(text)
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive advisory lock on path (created if needed) for the block.
+
+    Serializes processes sharing a checkout, such as backfill workers.
+    Without fcntl (not POSIX) the block runs unlocked.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def merge_counts(disk: dict, ours: dict, base: dict) -> dict:
+    """Add what ours counted since base onto disk, recursively, and return disk.
+
+    For count stores shared by processes (backfill workers): each saves its
+    own increments on top of what the others saved since it loaded *base*.
+    Counts that shrank (entries trimmed) keep the disk value; other values
+    are taken from ours where disk has none.
+    """
+    for key, value in ours.items():
+        before = base.get(key)
+        if isinstance(value, dict):
+            merge_counts(disk.setdefault(key, {}), value,
+                         before if isinstance(before, dict) else {})
+        elif isinstance(value, int) and not isinstance(value, bool):
+            disk[key] = disk.get(key, 0) + max(0, value - (before or 0))
+        elif not disk.get(key):
+            disk[key] = value
+    return disk
+
+
+def discard_partial(path: Path) -> None:
+    """Remove temporary files left by an ``atomic_open`` of path whose writer was killed."""
+    for tmp in path.parent.glob(f".{path.name}.*.tmp"):
+        try:
+            tmp.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _fsync_dir(directory: Path) -> None:
+    """Persist a directory entry change (rename) where the OS supports it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class StateJournal:
+    """Write-ahead journal of per-pattern state updates.
+
+    ``record`` appends an update and commits (flush + fsync of the journal
+    and of any tracked documents) every ``commit_every`` records.
+    """
+
+    def __init__(self, state_path: Path, commit_every: int = 1):
+        self.state_path = state_path
+        self.journal_path = state_path.with_suffix(".journal")
+        self.commit_every = max(1, commit_every)
+        self._fh = None
+        self._pending_records = 0
+        self._pending_files: list[Path] = []
+
+    def load(self) -> dict:
+        """Return progress.json with any journaled updates replayed on top."""
+        state: dict = {}
+        if self.state_path.exists():
+            content = self.state_path.read_text(encoding="utf-8").strip()
+            state = json.loads(content) if content else {}
+
+        if self.journal_path.exists():
+            replayed = 0
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-append
+                        log.warning("Ignoring incomplete journal entry in %s",
+                                    self.journal_path.name)
+                        break
+                    state[entry["id"]] = entry["state"]
+                    replayed += 1
+            if replayed:
+                log.info("Replayed %d journaled state update(s)", replayed)
+        return state
+
+    def record(self, pid: str, pat_state: dict) -> None:
+        """Append a state update for pattern pid."""
+        if self._fh is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.journal_path, "a", encoding="utf-8")
+        self._fh.write(json.dumps({"id": pid, "state": pat_state}, ensure_ascii=False) + "\n")
+        self._pending_records += 1
+        if self._pending_records >= self.commit_every:
+            self.commit()
+
+    def track(self, path: Path) -> None:
+        """Register a file written with ``sync=False`` to be fsynced at the next commit."""
+        self._pending_files.append(path)
+
+    def commit(self) -> None:
+        """Make tracked documents and journaled updates durable.
+
+        Documents are synced before the journal so a replayed update never
+        points past a document that was lost.
+        """
+        synced_dirs: set[Path] = set()
+        for path in self._pending_files:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            synced_dirs.add(path.parent)
+        for directory in synced_dirs:
+            _fsync_dir(directory)
+        self._pending_files.clear()
+
+        if self._fh is not None:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        self._pending_records = 0
+
+    def checkpoint(self, state: dict) -> None:
+        """Write the full state atomically and discard the journal."""
+        self.commit()
+        atomic_write_text(self.state_path, json.dumps(state, indent=2) + "\n")
+        self.close()
+        try:
+            self.journal_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,266 @@
+"""
+Extraction jobs and the sandboxed worker pool that runs them.
+
+PyMuPDF runs in reusable worker subprocesses so that a malformed or huge PDF
+cannot hang or exhaust the fetch process.  Each job gets a wall-clock
+timeout; each worker runs under an ``RLIMIT_AS`` address-space cap and is
+replaced after a fixed number of jobs.  A job that exceeds its budget raises
+``ExtractionBudgetExceeded`` so the caller can record it for a retry with a
+larger budget instead of counting it as a missing document.
+
+Extracted text is cached under the PDF's content hash, so the same bytes
+arriving again are written from the cache without opening PyMuPDF.  Workers
+return the text and the calling process stores it, so the cache's size
+accounting and eviction stay in one place.
+"""
+
+import json
+import logging
+import multiprocessing
+import threading
+from pathlib import Path
+
+from cache import DiskCache, content_key
+from docindex import write_index
+from extract import (
+    EXTRACT_VERSION,
+    extract_text_with_headers,
+    extract_to_file,
+    format_front_matter,
+    format_output,
+)
+from storage import atomic_open, atomic_write_text
+
+log = logging.getLogger("railcar.workers")
+
+
+class ExtractionError(Exception):
+    """An extraction job raised an exception inside a worker."""
+
+
+class ExtractionBudgetExceeded(ExtractionError):
+    """An extraction job ran out of time or memory."""
+
+
+class ExtractionTimeout(ExtractionBudgetExceeded):
+    """An extraction job exceeded its wall-clock timeout."""
+
+
+class ExtractionOutOfMemory(ExtractionBudgetExceeded):
+    """An extraction job hit the memory cap or its worker died."""
+
+
+def extraction_key(pdf_bytes: bytes, header_lines: set[str] | None) -> str:
+    """Cache key of an extraction: the PDF's content, the header lines and EXTRACT_VERSION."""
+    return content_key("extract", EXTRACT_VERSION, pdf_bytes,
+                       "\n".join(sorted(header_lines or ())))
+
+
+def save_document(pdf_bytes: bytes, out_file: Path, metadata: dict,
+                  stream: bool = False, sync: bool = True,
+                  header_lines: set[str] | None = None) -> tuple[int, set[str], str | None]:
+    """Extract a PDF and atomically write it with front matter to out_file.
+
+    With stream=True the text is produced page by page by
+    ``extract_to_file`` and written straight to the output file, keeping
+    memory bounded for very large documents.  *header_lines* are known
+    running headers to strip in addition to those detected in the PDF.
+    The document's offset index sidecar is written alongside (see docindex.py).
+
+    Returns the number of text characters written, the detected header
+    lines and the text itself (None when streamed), for the extraction cache.
+    """
+    if stream:
+        with atomic_open(out_file, sync=sync) as f:
+            f.write(format_front_matter(metadata))
+            chars, detected = extract_to_file(pdf_bytes, f, header_lines=header_lines)
+        write_index(out_file)
+        return chars, detected, None
+    text, detected = extract_text_with_headers(pdf_bytes, header_lines)
+    atomic_write_text(out_file, format_output(text, metadata), sync=sync)
+    write_index(out_file)
+    return len(text), detected, text
+
+
+def save_cached_document(cache: DiskCache, pdf_bytes: bytes, out_file: Path, metadata: dict,
+                         stream: bool = False, sync: bool = True,
+                         header_lines: set[str] | None = None) -> tuple[int, set[str]] | None:
+    """Write out_file from a cached extraction of the same PDF bytes.
+
+    Takes the arguments of ``save_document``.  Returns None, writing
+    nothing, if the cache has no entry for this PDF and extract version.
+    """
+    hit = cache.get_text(extraction_key(pdf_bytes, header_lines))
+    if hit is None:
+        return None
+    text, detected = json.loads(hit)
+    atomic_write_text(out_file, format_output(text, metadata), sync=sync)
+    write_index(out_file)
+    return len(text), set(detected)
+
+
+def _worker_main(conn, memory_mb: int) -> None:
+    """Worker process loop: run (func, args) jobs until told to stop."""
+    if memory_mb:
+        try:
+            import resource
+
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            # Not supported on this platform; run without a memory cap
+            pass
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        func, args = job
+        try:
+            conn.send(("ok", func(*args)))
+        except MemoryError:
+            conn.send(("memory", "MemoryError"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx, memory_mb: int):
+        self.memory_mb = memory_mb
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_mb),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ExtractionPool:
+    """A pool of reusable extraction worker processes.
+
+    ``run`` is thread-safe; at most *size* jobs run at once.  Workers are
+    recycled after *max_jobs* jobs, and killed and replaced when a job times
+    out or crashes.
+    """
+
+    def __init__(self, size: int = 1, timeout: float = 120, memory_mb: int = 2048,
+                 max_jobs: int = 25):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_jobs = max(1, max_jobs)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = threading.Semaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle: list[_Worker] = []
+
+    def run(self, func, *args, timeout: float | None = None, memory_mb: int | None = None):
+        """Run func(*args) in a worker and return its result.
+
+        func must be a module-level function importable by the worker.
+        Passing a *timeout* or *memory_mb* larger than the pool's defaults
+        runs the job with that budget (in a dedicated worker for memory).
+        """
+        timeout = timeout or self.timeout
+        memory_mb = memory_mb or self.memory_mb
+        with self._slots:
+            worker = self._checkout(memory_mb)
+            try:
+                worker.conn.send((func, args))
+                if not worker.conn.poll(timeout):
+                    worker.kill()
+                    worker = None
+                    raise ExtractionTimeout(f"extraction exceeded {timeout:g}s")
+                try:
+                    status, result = worker.conn.recv()
+                except EOFError:
+                    code = worker.process.exitcode
+                    worker.kill()
+                    worker = None
+                    raise ExtractionOutOfMemory(f"worker exited with code {code}") from None
+            finally:
+                if worker is not None:
+                    self._checkin(worker)
+
+        if status == "memory":
+            raise ExtractionOutOfMemory(f"extraction exceeded {memory_mb} MB")
+        if status == "error":
+            raise ExtractionError(result)
+        return result
+
+    def _checkout(self, memory_mb: int) -> _Worker:
+        if memory_mb == self.memory_mb:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+        return _Worker(self._ctx, memory_mb)
+
+    def _checkin(self, worker: _Worker) -> None:
+        worker.jobs += 1
+        if worker.memory_mb != self.memory_mb or worker.jobs >= self.max_jobs:
+            worker.stop()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def extract_document(pdf_bytes: bytes, out_file: Path, metadata: dict,
+                     stream: bool = False, sync: bool = True,
+                     header_lines: set[str] | None = None,
+                     cache: DiskCache | None = None, pool: ExtractionPool | None = None,
+                     budget_scale: int = 1) -> tuple[int, set[str] | None]:
+    """Write out_file from the extraction cache, or extract it with ``save_document``.
+
+    Extraction runs in *pool* when given, with its timeout and memory cap
+    multiplied by budget_scale, and inline otherwise.  Non-streamed results
+    are stored in *cache* by this process.  Returns the number of text
+    characters written and the detected header lines, or None instead of
+    the lines for a cache hit: they were learned from when the same PDF was
+    extracted, and learning them again would count it twice.
+    """
+    args = (pdf_bytes, out_file, metadata, stream, sync, header_lines)
+    if cache is not None:
+        cached = save_cached_document(cache, *args)
+        if cached is not None:
+            return cached[0], None
+    if pool is None:
+        chars, detected, text = save_document(*args)
+    else:
+        chars, detected, text = pool.run(save_document, *args,
+                                         timeout=pool.timeout * budget_scale,
+                                         memory_mb=pool.memory_mb * budget_scale)
+    if cache is not None and text is not None:
+        cache.put_text(extraction_key(pdf_bytes, header_lines),
+                       json.dumps([text, sorted(detected)], ensure_ascii=False))
+    return chars, detected
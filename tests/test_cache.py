@@ -0,0 +1,98 @@
+"""Tests for the disk cache and stage-level memoization of clean_text."""
+
+import os
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import extract
+from cache import DiskCache, content_key
+from extract import clean_text
+
+SAMPLE = (
+    "1. Decides to convene the conference;1\n"
+    "---\n"
+    "\n"
+    "1 See resolution 70/1.\n"
+    "\n"
+    "A/RES/80/1 Convening of the conference\n"
+    "\n"
+    "2. Requests the Secretary-General to report"
+)
+
+
+def test_cache_roundtrip_and_counters(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1 << 20)
+    key = content_key("a", "b")
+    assert cache.get_text(key) is None
+    cache.put_text(key, "value " * 100)
+    assert cache.get_text(key) == "value " * 100
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Stored compressed
+    assert (tmp_path / key[:2] / key).stat().st_size < 100
+
+
+def test_content_key_is_unambiguous():
+    assert content_key("ab", "c") != content_key("a", "bc")
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1 << 20)
+    key = content_key("x")
+    cache.put_text(key, "value")
+    (tmp_path / key[:2] / key).write_bytes(b"not zlib")
+    assert cache.get_text(key) is None
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    blob = os.urandom(1000)  # incompressible
+    cache = DiskCache(tmp_path, max_bytes=3500)
+    keys = [content_key(str(n)) for n in range(3)]
+    for n, key in enumerate(keys):
+        cache.put(key, blob)
+        path = tmp_path / key[:2] / key
+        os.utime(path, (n, n))
+    assert cache.get(keys[0]) == blob  # refreshes keys[0]
+
+    cache.put(content_key("new"), blob)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == blob
+    assert cache.get(keys[2]) == blob
+
+
+def test_concurrent_puts_keep_the_size_exact(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = DiskCache(tmp_path, max_bytes=1 << 30)
+    cache.put("00", b"")  # start the size accounting
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda n: cache.put(content_key(str(n)), os.urandom(n % 97)),
+                          range(400)))
+    assert cache._size == cache._scan_size()
+
+
+def test_clean_text_with_cache_matches_uncached(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1 << 20)
+    expected = clean_text(SAMPLE, {"A/RES/80/1"})
+    assert clean_text(SAMPLE, {"A/RES/80/1"}, cache) == expected
+    assert clean_text(SAMPLE, {"A/RES/80/1"}, cache) == expected
+    assert cache.hits == 5
+
+
+def test_stage_version_bump_recomputes_only_later_stages(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, max_bytes=1 << 20)
+    clean_text(SAMPLE, cache=cache)
+
+    calls = []
+    for name in ("_relocate_inline_footnotes", "_clean_text", "_convert_footnote_refs",
+                 "_format_footnote_defs"):
+        original = getattr(extract, name)
+        monkeypatch.setattr(extract, name,
+                            lambda *a, _f=original, _n=name: calls.append(_n) or _f(*a))
+    monkeypatch.setitem(extract.STAGE_VERSIONS, "footnote_refs", "2")
+
+    clean_text(SAMPLE, cache=cache)
+    assert calls == ["_convert_footnote_refs"]
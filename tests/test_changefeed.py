@@ -0,0 +1,101 @@
+"""Tests for the change feed."""
+
+import hashlib
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import regenerate
+from changefeed import NEW, REGENERATED, ChangeFeed, read_changes
+from extract import EXTRACT_VERSION, format_output
+
+
+def test_sequence_continues_across_segments_and_reopen(tmp_path):
+    feed = ChangeFeed(tmp_path, segment_events=2)
+    for n in range(1, 4):
+        assert feed.append(NEW, f"A/RES/80/{n}", f"ga-res-80/A_RES_80_{n}.md",
+                           b"doc", EXTRACT_VERSION) == n
+    feed.close()
+
+    feed = ChangeFeed(tmp_path, segment_events=2)
+    assert feed.append(NEW, "A/RES/80/4", "ga-res-80/A_RES_80_4.md", b"doc",
+                       EXTRACT_VERSION) == 4
+    assert feed.append(NEW, "A/RES/80/5", "ga-res-80/A_RES_80_5.md", b"doc",
+                       EXTRACT_VERSION) == 5
+    feed.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "000000000001.ndjson", "000000000003.ndjson", "000000000005.ndjson"]
+    events = list(read_changes(tmp_path))
+    assert [e["seq"] for e in events] == [1, 2, 3, 4, 5]
+    assert events[0]["sha256"] == hashlib.sha256(b"doc").hexdigest()
+
+
+def test_writers_sharing_a_directory_interleave_sequences(tmp_path):
+    feed_dir = tmp_path / "feed"
+    one = ChangeFeed(feed_dir, segment_events=3)
+    two = ChangeFeed(feed_dir, segment_events=3)
+    seqs = []
+    for n in range(1, 8):
+        writer = one if n % 2 else two
+        seqs.append(writer.append(NEW, f"A/RES/80/{n}", f"ga-res-80/A_RES_80_{n}.md",
+                                  b"doc", EXTRACT_VERSION))
+    one.close()
+    two.close()
+
+    assert seqs == [1, 2, 3, 4, 5, 6, 7]
+    assert [e["seq"] for e in read_changes(feed_dir)] == seqs
+    assert sorted(p.name for p in feed_dir.iterdir()) == [
+        "000000000001.ndjson", "000000000004.ndjson", "000000000007.ndjson"]
+
+
+def test_read_from_cursor(tmp_path):
+    feed = ChangeFeed(tmp_path, segment_events=3)
+    for n in range(1, 8):
+        feed.append(NEW, f"A/RES/80/{n}", f"ga-res-80/A_RES_80_{n}.md", b"doc",
+                    EXTRACT_VERSION)
+    feed.close()
+
+    assert [e["seq"] for e in read_changes(tmp_path, cursor=4)] == [5, 6, 7]
+    assert [e["seq"] for e in read_changes(tmp_path, cursor=6)] == [7]
+    assert list(read_changes(tmp_path, cursor=7)) == []
+    assert list(read_changes(tmp_path / "missing")) == []
+
+
+def test_torn_line_is_dropped(tmp_path):
+    feed = ChangeFeed(tmp_path)
+    feed.append(NEW, "A/RES/80/1", "ga-res-80/A_RES_80_1.md", b"doc", EXTRACT_VERSION)
+    feed.close()
+    segment = next(tmp_path.iterdir())
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "kind"')
+
+    assert [e["seq"] for e in read_changes(tmp_path)] == [1]
+    feed = ChangeFeed(tmp_path)
+    assert feed.append(NEW, "A/RES/80/2", "ga-res-80/A_RES_80_2.md", b"doc",
+                       EXTRACT_VERSION) == 2
+    feed.close()
+    assert [e["seq"] for e in read_changes(tmp_path)] == [1, 2]
+
+
+def test_regenerate_appends_event(tmp_path, monkeypatch):
+    docs = tmp_path / "documents"
+    monkeypatch.setattr(regenerate, "DOCS_DIR", docs)
+    path = docs / "ga-res-80" / "A_RES_80_1.md"
+    path.parent.mkdir(parents=True)
+    output = format_output("Body text.", {"symbol": "A/RES/80/1", "language": "EN"})
+    path.write_text(output.replace(EXTRACT_VERSION, "0.0.1"), encoding="utf-8")
+
+    feed = ChangeFeed(tmp_path / "feed")
+    assert regenerate.regenerate_all(feed=feed) == 1
+    assert regenerate.regenerate_all(feed=feed) == 0
+    feed.close()
+
+    [event] = read_changes(tmp_path / "feed")
+    assert event["kind"] == REGENERATED
+    assert event["symbol"] == "A/RES/80/1"
+    assert event["path"] == "ga-res-80/A_RES_80_1.md"
+    assert event["sha256"] == hashlib.sha256(path.read_bytes()).hexdigest()
+    assert event["extract_version"] == EXTRACT_VERSION
@@ -0,0 +1,58 @@
+"""Tests for the A/B comparison of cleaning pipelines."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import compare
+from extract import format_output
+
+EXTRACT_PY = Path(__file__).resolve().parent.parent / "scripts" / "extract.py"
+
+# Appended to a copy of extract.py: the "clean" stage also renames Alpha
+CANDIDATE_PATCH = '''
+
+_original_clean_text = _clean_text
+
+
+def _clean_text(text, header_lines):
+    return _original_clean_text(text, header_lines).replace("Alpha", "Beta")
+'''
+
+
+def test_compare_reports_changed_stage(tmp_path):
+    docs = tmp_path / "documents"
+    for n, body in enumerate(["Alpha and omega.", "Gamma only.", "Alpha\n\nDelta"], start=1):
+        path = docs / "ga-res-80" / f"A_RES_80_{n}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(format_output(body, {"symbol": f"A/RES/80/{n}"}), encoding="utf-8")
+    (docs / "ga-res-80" / "notes.md").write_text("No front matter.\n", encoding="utf-8")
+    candidate = tmp_path / "extract_candidate.py"
+    candidate.write_text(EXTRACT_PY.read_text(encoding="utf-8") + CANDIDATE_PATCH,
+                         encoding="utf-8")
+
+    summary = compare.compare(sorted(docs.rglob("*.md")), EXTRACT_PY, candidate, workers=2,
+                              samples=1, docs_dir=docs, headers_path=tmp_path / "headers.json")
+
+    assert (summary["documents"], summary["skipped"], summary["changed"]) == (3, 1, 2)
+    assert (summary["lines_added"], summary["lines_removed"]) == (2, 2)
+    assert summary["stages"] == {"clean": {"files": 2, "first": 2, "added": 2, "removed": 2}}
+    [diff] = summary["samples"]
+    assert "-Alpha and omega." in diff and "+Beta and omega." in diff
+    assert "2 changed: +2 -2 lines" in compare.format_report(summary, "HEAD", str(candidate))
+
+    # Nothing is written next to the documents
+    assert len(list(docs.rglob("*"))) == 5
+
+
+def test_identical_pipelines_change_nothing(tmp_path):
+    docs = tmp_path / "documents"
+    path = docs / "ga-res-80" / "A_RES_80_1.md"
+    path.parent.mkdir(parents=True)
+    path.write_text(format_output("Alpha.", {"symbol": "A/RES/80/1"}), encoding="utf-8")
+
+    summary = compare.compare([path], EXTRACT_PY, EXTRACT_PY, workers=1,
+                              docs_dir=docs, headers_path=tmp_path / "headers.json")
+    assert summary["changed"] == 0 and summary["stages"] == {}
@@ -0,0 +1,107 @@
+"""Tests for the document offset index."""
+
+import os
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from docindex import build_index, index_all, load_index, sidecar_path, write_index
+from extract import format_output
+from frontmatter import update_front_matter
+
+BODY = """80/39. Example resolution
+
+The General Assembly,
+
+Recalling its resolution 79/1,[^1]
+
+1. Decides to act;
+
+(a) First point;
+
+2. Requests the Secretary-General to report.
+
+Annex
+
+Declaration on examples
+
+1. We, the Heads of State, déclarons.
+
+2. We commit to examples.[^2]
+
+---
+
+[^1]: See resolution 79/1.
+
+[^2]: A footnote that
+continues on a second line.
+[^3]: Ibid."""
+
+
+def write_doc(tmp_path: Path) -> Path:
+    path = tmp_path / "ga-res-80" / "A_RES_80_39.md"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(format_output(BODY, {"symbol": "A/RES/80/39"}), encoding="utf-8")
+    return path
+
+
+def test_random_access_by_number(tmp_path):
+    index = build_index(write_doc(tmp_path))
+
+    assert len(index) == 10
+    assert index.paragraph(0) == "80/39. Example resolution"
+    assert index.clause(1) == "1. Decides to act;"
+    assert index.clause(2) == "2. Requests the Secretary-General to report."
+    assert index.clause(1, annex=1) == "1. We, the Heads of State, déclarons."
+    assert index.clause(3) is None and index.clause(1, annex=2) is None
+    assert index.annexes == [6]
+    assert index.section(5) == 0 and index.section(6) == 1
+    assert index.footnote(1) == "[^1]: See resolution 79/1."
+    assert index.footnote("2") == "[^2]: A footnote that\ncontinues on a second line."
+    assert index.footnote(3) == "[^3]: Ibid."
+
+
+def test_sidecar_round_trip_and_staleness(tmp_path):
+    path = write_doc(tmp_path)
+    written = write_index(path)
+    assert sidecar_path(path).name == "A_RES_80_39.idx.json"
+
+    loaded = load_index(path)
+    assert loaded.paragraphs == written.paragraphs
+    assert loaded.clauses == written.clauses
+    assert loaded.footnote(2) == written.footnote(2)
+
+    # Changing the front matter moves the body; the stale sidecar is rebuilt
+    update_front_matter(path, {"source_sha256": "ab" * 32})
+    assert load_index(path).clause(1, annex=1) == "1. We, the Heads of State, déclarons."
+
+    # A same-size edit is caught by its hash; a mere touch is not rebuilt
+    text = path.read_text(encoding="utf-8")
+    path.write_text(text.replace("act;", "tax;"), encoding="utf-8")
+    assert load_index(path).clause(1) == "1. Decides to tax;"
+    os.utime(path, ns=(0, 0))
+    assert index_all(tmp_path) == 0
+    sidecar_path(path).unlink()
+    assert index_all(tmp_path) == 1
+
+
+def test_runs_index_only_documents_without_a_sidecar(tmp_path, monkeypatch):
+    import docindex
+    import regenerate
+    from extract import EXTRACT_VERSION
+
+    monkeypatch.setattr(regenerate, "DOCS_DIR", tmp_path)
+    metadata = {"symbol": "A/RES/80/39", "extract_version": EXTRACT_VERSION}
+    indexed, bare = tmp_path / "A_RES_80_39.md", tmp_path / "A_RES_80_40.md"
+    for path in (indexed, bare):
+        path.write_text(format_output(BODY, metadata), encoding="utf-8")
+    write_index(indexed)
+    os.utime(indexed, ns=(0, 0))  # as after a checkout
+
+    checked = []
+    monkeypatch.setattr(docindex, "_current_sidecar", lambda path: checked.append(path))
+    assert regenerate.regenerate_all() == 0
+    assert sidecar_path(bare).exists()
+    assert checked == []  # no body is read or hashed for an existing sidecar
@@ -0,0 +1,124 @@
+"""Tests for resumable downloads."""
+
+import sys
+from pathlib import Path
+
+import requests
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from downloads import partial_paths, resumable_download
+
+BODY = bytes(range(256)) * 40  # 10 KiB
+URL = "https://digitallibrary.un.org/record/1/files/A_RES_80_1-EN.pdf"
+
+
+class Response:
+    def __init__(self, status, body, headers, fail_after=None):
+        self.status_code = status
+        self.headers = headers
+        self._body = body
+        self._fail_after = fail_after
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+    def iter_content(self, size):
+        sent = 0
+        for i in range(0, len(self._body), 1000):
+            if self._fail_after is not None and sent >= self._fail_after:
+                raise requests.ConnectionError("connection reset")
+            chunk = self._body[i:i + 1000]
+            sent += len(chunk)
+            yield chunk
+
+
+class Server:
+    """Serves BODY with range support, dropping the connection on chosen attempts."""
+
+    def __init__(self, drops, ranges=True, etag='"v1"'):
+        self.drops = list(drops)
+        self.ranges = ranges
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, timeout, stream, headers):
+        self.requests.append(dict(headers))
+        fail_after = self.drops.pop(0) if self.drops else None
+        base = {"ETag": self.etag}
+        if self.ranges:
+            base["Accept-Ranges"] = "bytes"
+        rng = headers.get("Range")
+        if rng and self.ranges and headers.get("If-Range") == self.etag:
+            start = int(rng[6:-1])
+            return Response(206, BODY[start:], {
+                **base,
+                "Content-Range": f"bytes {start}-{len(BODY) - 1}/{len(BODY)}",
+                "Content-Length": str(len(BODY) - start),
+            }, fail_after)
+        return Response(200, BODY, {**base, "Content-Length": str(len(BODY))}, fail_after)
+
+
+def test_resumes_interrupted_download_with_range(tmp_path):
+    server = Server(drops=[4000, 3000])
+    data = resumable_download(server.get, URL, tmp_path, max_retries=1, sleep=lambda s: None)
+
+    assert data == BODY
+    assert server.requests == [{}, {"Range": "bytes=4000-", "If-Range": '"v1"'},
+                               {"Range": "bytes=7000-", "If-Range": '"v1"'}]
+    # Partial data is cleaned up after success
+    assert not any(tmp_path.iterdir())
+
+
+def test_changed_file_restarts_from_zero(tmp_path):
+    server = Server(drops=[4000, 0])
+    assert resumable_download(server.get, URL, tmp_path, max_retries=1,
+                              sleep=lambda s: None) is None
+    part, _ = partial_paths(tmp_path, URL)
+    assert part.stat().st_size == 4000  # kept for the next run
+
+    server.etag = '"v2"'
+    assert resumable_download(server.get, URL, tmp_path, sleep=lambda s: None) == BODY
+    assert server.requests[-1] == {"Range": "bytes=4000-", "If-Range": '"v1"'}
+
+
+def test_without_range_support_failures_count(tmp_path):
+    server = Server(drops=[4000, 4000, 4000], ranges=False)
+    assert resumable_download(server.get, URL, tmp_path, max_retries=3,
+                              sleep=lambda s: None) is None
+    assert server.requests == [{}, {}, {}]
+
+
+def test_not_found(tmp_path):
+    def get(url, **kwargs):
+        return Response(404, b"", {})
+
+    assert resumable_download(get, URL, tmp_path) is None
+
+
+def test_rejected_range_restarts_from_zero_at_once(tmp_path):
+    server = Server(drops=[4000, 0])
+    assert resumable_download(server.get, URL, tmp_path, max_retries=1,
+                              sleep=lambda s: None) is None
+
+    def get(url, timeout, stream, headers):
+        if "Range" in headers:
+            server.requests.append(dict(headers))
+            return Response(416, b"", {})
+        return server.get(url, timeout, stream, headers)
+
+    assert resumable_download(get, URL, tmp_path, max_retries=1, sleep=lambda s: None) == BODY
+    assert server.requests[2:] == [{"Range": "bytes=4000-", "If-Range": '"v1"'}, {}]
+
+
+def test_unreadable_meta_restarts_from_zero(tmp_path):
+    server = Server(drops=[4000, 0])
+    assert resumable_download(server.get, URL, tmp_path, max_retries=1,
+                              sleep=lambda s: None) is None
+    _, meta = partial_paths(tmp_path, URL)
+    meta.write_text('{"etag": "\\"v1', encoding="utf-8")  # torn by a killed run
+
+    assert resumable_download(server.get, URL, tmp_path, sleep=lambda s: None) == BODY
+    assert server.requests[-1] == {}
@@ -1,5 +1,6 @@
 """Tests for text extraction cleaning logic."""
 
+import io
 import sys
 from pathlib import Path
 
@@ -10,16 +11,30 @@ from extract import (
     _clean_text,
     _collect_footnote_nums,
     _convert_footnote_refs,
+    _convert_footnote_refs_stream,
     _detect_header_lines,
     _format_footnote_defs,
     _join_paragraph_numbers,
     _join_paragraphs,
     _relocate_inline_footnotes,
     _split_page_footnotes,
+    _StreamCleaner,
     clean_text,
+    extract_text,
+    extract_to_file,
 )
 
 
+def _make_pdf(pages: list[str]) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((50, 72), text, fontsize=9)
+    return doc.tobytes()
+
+
 def test_removes_distribution_codes():
     text = "Some text\n25-15106 (E)\n*2515106*\nMore text"
     result = _clean_text(text, set())
@@ -443,6 +458,30 @@ def test_convert_footnote_refs_ignores_unknown_numbers():
     assert result == body
 
 
+def test_convert_footnote_refs_ignores_prefix_of_longer_number():
+    body = "word12 and word1, word120."
+    result = _convert_footnote_refs(body, {"1", "12"})
+    assert result == "word[^12] and word[^1], word120."
+
+
+def test_convert_footnote_refs_hundreds_of_footnotes():
+    nums = {str(n) for n in range(1, 400)}
+    body = " ".join(f"ref{n}" for n in range(1, 450))
+    result = _convert_footnote_refs(body, nums)
+    assert "ref[^1] " in result
+    assert "ref[^399] " in result
+    assert "ref400 " in result
+
+
+def test_convert_footnote_refs_stream_matches_whole_body():
+    body = "the Statute1 of the Court and Nations12, and resolution 169\nword2"
+    nums = {"1", "2", "12"}
+    expected = _convert_footnote_refs(body, nums)
+    for size in (1, 3, 7, 16, len(body)):
+        chunks = [body[i:i + size] for i in range(0, len(body), size)]
+        assert "".join(_convert_footnote_refs_stream(chunks, nums)) == expected
+
+
 def test_clean_text_github_footnotes_end_to_end():
     """Full pipeline should produce GitHub-compatible footnotes."""
     text = (
@@ -458,3 +497,70 @@ def test_clean_text_github_footnotes_end_to_end():
     assert "Statute[^1]" in result
     assert "[^1]: United Nations, Treaty Series, vol. 2187." in result
     assert "[^2]: See resolution 123." in result
+
+
+def test_does_not_join_after_arabic_comma():
+    """Arabic has no letter case; the Arabic comma ends a preambular clause."""
+    text = "إن الجمعية العامة،\nإذ تشير إلى قراراتها"
+    result = _join_paragraphs(text)
+    lines = [l for l in result.split("\n") if l.strip()]
+    assert len(lines) == 2
+
+
+def test_joins_arabic_continuation_lines():
+    text = "إذ تشير إلى قراراتها\nالسابقة ذات الصلة،"
+    result = _join_paragraphs(text)
+    assert result == "إذ تشير إلى قراراتها السابقة ذات الصلة،"
+
+
+def test_joins_cjk_lines_without_space():
+    text = "大会，\n回顾其关于这一问题的\n各项决议，"
+    result = _join_paragraphs(text)
+    assert result == "大会，\n回顾其关于这一问题的各项决议，"
+
+
+def test_does_not_join_after_cjk_full_stop():
+    text = "决定这些程序。\n又决定"
+    result = _join_paragraphs(text)
+    lines = [l for l in result.split("\n") if l.strip()]
+    assert len(lines) == 2
+
+
+def test_convert_footnote_refs_cjk():
+    body = "回顾《罗马规约》1，"
+    result = _convert_footnote_refs(body, {"1"})
+    assert result == "回顾《罗马规约》1，"
+    body = "回顾罗马规约1，"
+    result = _convert_footnote_refs(body, {"1"})
+    assert result == "回顾罗马规约[^1]，"
+
+
+def test_stream_cleaner_matches_clean_text():
+    lines = [
+        "A/RES/80/1", "25-15106 (E)", "", "The General Assembly,", "",
+        "Expressing concern regarding situations in which",
+        "representatives are prevented", "", "", "", "1.", "Decides that:",
+        "(a)", "", "_______________", "1 See resolution 169 (II).", "2/2", "(b)",
+    ]
+    headers = {"A/RES/80/1"}
+    cleaner = _StreamCleaner(headers)
+    pieces = []
+    for line in lines:
+        pieces.extend(cleaner.push(line))
+    pieces.extend(cleaner.finish())
+    assert "".join(pieces) == _clean_text("\n".join(lines), headers)
+
+
+def test_extract_to_file_matches_extract_text():
+    pages = [
+        f"A/RES/80/9\nTitle\n{n}.\nDecides that States{n} shall\ncontinue;\n"
+        f"_____\n{n} See resolution {n}."
+        for n in range(1, 5)
+    ]
+    pdf = _make_pdf(pages)
+    out = io.StringIO()
+    written, detected = extract_to_file(pdf, out)
+    assert out.getvalue() == extract_text(pdf)
+    assert {"A/RES/80/9", "Title"} <= detected
+    assert written == len(out.getvalue())
+    assert "States[^1]" in out.getvalue()
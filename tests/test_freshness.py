@@ -0,0 +1,129 @@
+"""Tests for the freshness sweep and source validators in front matter."""
+
+import hashlib
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import freshness
+from downloads import conditional_headers, validators_from_headers
+from extract import EXTRACT_VERSION, format_output
+from frontmatter import read_body, read_front_matter, update_front_matter
+
+PDF = b"%PDF-1.7 original"
+URL = "https://digitallibrary.un.org/record/1/files/A_RES_80_1-EN.pdf"
+
+
+class Response:
+    def __init__(self, status, content=b"", headers=None):
+        self.status_code = status
+        self.content = content
+        self.headers = {"content-type": "application/pdf", **(headers or {})}
+
+    def raise_for_status(self):
+        pass
+
+
+def write_doc(path: Path, **extra) -> Path:
+    metadata = {"symbol": "A/RES/80/1", "language": "EN", "source_pdf": URL, **extra}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(format_output("Body text.", metadata), encoding="utf-8")
+    return path
+
+
+def test_etag_round_trips_through_front_matter(tmp_path):
+    for etag in ('"abc123"', 'W/"xyz"'):
+        validators = validators_from_headers({"ETag": etag, "Last-Modified": "Tue, 1 Jul 2025"})
+        path = write_doc(tmp_path / "doc.md", **validators)
+        assert conditional_headers(read_front_matter(path)) == {
+            "If-None-Match": etag, "If-Modified-Since": "Tue, 1 Jul 2025"}
+
+
+def test_front_matter_omits_unknown_source_fields():
+    assert "source_" not in format_output("x", {"symbol": "A/RES/80/1"}).replace("source_pdf", "")
+
+
+def test_update_front_matter_keeps_body(tmp_path):
+    path = write_doc(tmp_path / "doc.md")
+    body = read_body(path)
+    assert update_front_matter(path, {"source_sha256": "ab", "title": 'Say "hi" twice'})
+    assert not update_front_matter(path, {"source_sha256": "ab"})
+
+    metadata = read_front_matter(path)
+    assert metadata["source_sha256"] == "ab"
+    assert metadata["title"] == 'Say "hi" twice'
+    assert read_body(path) == body
+    lines = path.read_text(encoding="utf-8").split("\n")
+    assert lines.index('source_sha256: "ab"') < lines.index(f'extract_version: "{EXTRACT_VERSION}"')
+
+
+def test_check_document_outcomes(tmp_path, monkeypatch):
+    monkeypatch.setattr(freshness, "DOCS_DIR", tmp_path)
+    path = write_doc(tmp_path / "ga-res-80" / "A_RES_80_1.md")
+    responses = []
+    sent = []
+
+    def fake_get(url, headers, **kwargs):
+        sent.append(headers)
+        return responses.pop(0)
+
+    extracted = []
+    monkeypatch.setattr(freshness, "http_get", fake_get)
+    monkeypatch.setattr(freshness, "extract_document", lambda *a: extracted.append(a[2]))
+
+    # Legacy document: record validators and hash without re-extracting
+    responses.append(Response(200, PDF, {"ETag": '"v1"'}))
+    assert freshness.check_document(path) == freshness.BASELINED
+    assert read_front_matter(path)["source_sha256"] == hashlib.sha256(PDF).hexdigest()
+
+    responses.append(Response(304))
+    assert freshness.check_document(path) == freshness.UNCHANGED
+    assert sent[-1] == {"If-None-Match": '"v1"'}
+
+    # Server ignores the validator but the bytes are the same
+    responses.append(Response(200, PDF, {"ETag": '"v1"'}))
+    assert freshness.check_document(path) == freshness.UNCHANGED
+    assert not extracted
+
+    responses.append(Response(200, b"%PDF-1.7 corrected", {"ETag": '"v2"'}))
+    assert freshness.check_document(path) == freshness.REFRESHED
+    assert extracted[0]["source_etag"] == "v2"
+
+
+def test_sweep_rolls_through_corpus(tmp_path, monkeypatch):
+    docs = tmp_path / "documents"
+    monkeypatch.setattr(freshness, "DOCS_DIR", docs)
+    for n in range(1, 6):
+        write_doc(docs / "ga-res-80" / f"A_RES_80_{n}.md")
+    checked = []
+    monkeypatch.setattr(freshness, "check_document",
+                        lambda path, *a: checked.append(path.name) or freshness.UNCHANGED)
+    state = tmp_path / "freshness.json"
+
+    assert freshness.sweep(3, 2, state_path=state) == {freshness.UNCHANGED: 3}
+    freshness.sweep(3, 2, state_path=state)
+    assert checked == [f"A_RES_80_{n}.md" for n in (1, 2, 3, 4, 5, 1)]
+
+
+def test_sweep_cursor_stops_at_first_error(tmp_path, monkeypatch):
+    docs = tmp_path / "documents"
+    monkeypatch.setattr(freshness, "DOCS_DIR", docs)
+    for n in range(1, 6):
+        write_doc(docs / "ga-res-80" / f"A_RES_80_{n}.md")
+    checked = []
+
+    def check(path, *a):
+        checked.append(path.name)
+        if path.name == "A_RES_80_2.md" and checked.count(path.name) == 1:
+            raise OSError("connection reset")
+        return freshness.UNCHANGED
+
+    monkeypatch.setattr(freshness, "check_document", check)
+    state = tmp_path / "freshness.json"
+
+    assert freshness.sweep(3, 1, state_path=state) == {
+        freshness.UNCHANGED: 2, freshness.ERROR: 1}
+    freshness.sweep(2, 1, state_path=state)
+    assert checked == [f"A_RES_80_{n}.md" for n in (1, 2, 3, 2, 3)]
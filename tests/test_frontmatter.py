@@ -0,0 +1,53 @@
+"""Tests for the head-only front matter reader."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from frontmatter import DocumentHead, read_body, read_front_matter, read_header
+
+DOCUMENT = (
+    "---\n"
+    "symbol: A/RES/80/5\n"
+    "record_id: \"4093123\"\n"
+    "title: \"Declaration of the \\\"World Social Summit\\\" :\"\n"
+    "extract_version: \"1.3.0\"\n"
+    "---\n"
+    "\n"
+    "United Nations\n"
+    "\n"
+    "The General Assembly\n"
+)
+
+
+def test_read_front_matter(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text(DOCUMENT, encoding="utf-8")
+    metadata = read_front_matter(path)
+    assert metadata["symbol"] == "A/RES/80/5"
+    assert metadata["record_id"] == "4093123"
+    assert metadata["title"] == 'Declaration of the "World Social Summit" :'
+    assert metadata["extract_version"] == "1.3.0"
+
+
+def test_read_body_from_offset(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text(DOCUMENT, encoding="utf-8")
+    _, offset = read_header(path)
+    assert read_body(path, offset) == "United Nations\n\nThe General Assembly\n"
+    assert DocumentHead(path).body == read_body(path)
+
+
+def test_no_front_matter(tmp_path):
+    path = tmp_path / "plain.md"
+    path.write_text("Just text\n", encoding="utf-8")
+    assert read_header(path) == ({}, 0)
+    assert read_body(path) == "Just text\n"
+
+
+def test_unterminated_front_matter(tmp_path):
+    path = tmp_path / "broken.md"
+    path.write_text("---\nsymbol: A/RES/80/1\n", encoding="utf-8")
+    assert read_front_matter(path) == {}
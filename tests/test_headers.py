@@ -0,0 +1,84 @@
+"""Tests for series-level header templates."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from extract import clean_text
+from headers import HeaderTemplates
+
+
+def test_templates_generalize_symbol_across_documents(tmp_path):
+    templates = HeaderTemplates(tmp_path / "headers.json", min_documents=2)
+    templates.learn("ga-res-80", "A/RES/80/5", {"A/RES/80/5", "Doha Declaration"})
+    assert templates.header_lines("ga-res-80", "A/RES/80/7") == set()
+    templates.learn("ga-res-80", "A/RES/80/6", {"A/RES/80/6", "Report of the Court"})
+
+    assert templates.header_lines("ga-res-80", "A/RES/80/7") == {"A/RES/80/7"}
+    assert templates.header_lines("sc-res", "S/RES/2700") == set()
+
+
+def test_templates_require_share_of_documents(tmp_path):
+    templates = HeaderTemplates(tmp_path / "headers.json", min_documents=2, min_share=0.5)
+    for n in range(1, 6):
+        detected = {"Rare line"} if n <= 2 else set()
+        templates.learn("ga-res-80", f"A/RES/80/{n}", detected)
+    assert templates.header_lines("ga-res-80", "A/RES/80/9") == set()
+
+
+def test_templates_persist(tmp_path):
+    path = tmp_path / "headers.json"
+    templates = HeaderTemplates(path, min_documents=1)
+    templates.learn("ga-res-80", "A/RES/80/1", {"A/RES/80/1"})
+    templates.save()
+
+    reloaded = HeaderTemplates(path, min_documents=1)
+    assert reloaded.header_lines("ga-res-80", "A/RES/80/2") == {"A/RES/80/2"}
+
+
+def test_templates_saved_by_several_processes_add_up(tmp_path):
+    path = tmp_path / "headers.json"
+    one, two = HeaderTemplates(path, min_documents=2), HeaderTemplates(path, min_documents=2)
+    one.learn("ga-res-80", "A/RES/80/1", {"A/RES/80/1"})
+    two.learn("ga-res-80", "A/RES/80/2", {"A/RES/80/2"})
+    one.save()
+    two.save()
+    one.learn("ga-res-80", "A/RES/80/3", set())
+    one.save()
+
+    reloaded = HeaderTemplates(path, min_documents=2)
+    assert reloaded.header_lines("ga-res-80", "A/RES/80/9") == {"A/RES/80/9"}
+    assert reloaded._data["ga-res-80/EN"]["documents"] == 3
+
+
+def test_clean_text_strips_learned_headers():
+    text = "A/RES/80/7\n\nThe General Assembly,\n\nDecides to remain seized."
+    result = clean_text(text, {"A/RES/80/7"})
+    assert "A/RES/80/7" not in result
+    assert "The General Assembly," in result
+
+
+def test_templates_learn_only_header_like_lines_per_language(tmp_path):
+    templates = HeaderTemplates(tmp_path / "headers.json", min_documents=2)
+    for n in (1, 2):
+        symbol = f"A/RES/80/{n}"
+        templates.learn("ga-res-80", symbol, {symbol, "(a)", "1.", "General Assembly"})
+        templates.learn("ga-res-80", symbol, {symbol, "Assemblée générale"}, "FR")
+
+    assert templates.header_lines("ga-res-80", "A/RES/80/3") == {"A/RES/80/3", "General Assembly"}
+    assert templates.header_lines("ga-res-80", "A/RES/80/3", "fr") == {
+        "A/RES/80/3", "Assemblée générale"}
+
+
+def test_learned_headers_are_stripped_only_at_page_edges():
+    from extract import _strip_page_edges
+
+    body = [f"Line {n}" for n in range(8)]
+    page = "\n".join(["A/RES/80/7", *body[:4], "A/RES/80/7", *body[4:], "A/RES/80/7"])
+    assert _strip_page_edges(page, {"A/RES/80/7"}).splitlines() == [
+        *body[:4], "A/RES/80/7", *body[4:]]
+
+    text = "Preamble\n\nRecalling\nA/RES/80/7\nand its annex."
+    assert "A/RES/80/7" in clean_text(text, {"A/RES/80/7"})
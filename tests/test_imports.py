@@ -0,0 +1,56 @@
+"""Import-time budget for the regenerate-only and metadata-only entry points.
+
+The modules loaded by the import are checked exactly; the time budget is
+generous, and the best of a few runs counts, so a slow CI runner does not
+fail it.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
+HEAVY_MODULES = {"fitz", "pymupdf", "lxml", "requests"}
+
+# Cumulative import time allowed for a fast-start module, in microseconds:
+# several times the ~30 ms they take.  Loading a heavy module is caught by
+# the module check instead.
+IMPORT_BUDGET_US = 250_000
+IMPORT_RUNS = 3
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Return {module: cumulative microseconds} from ``python -X importtime``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def _assert_fast_start(module: str) -> None:
+    runs = [_import_times(module) for _ in range(IMPORT_RUNS)]
+    loaded = {name.split(".")[0] for name in runs[0]}
+    assert not loaded & HEAVY_MODULES, f"{module} imports {loaded & HEAVY_MODULES}"
+    best = min(times[module] for times in runs)
+    assert best < IMPORT_BUDGET_US, f"{module} took {best} us to import"
+
+
+def test_regenerate_import_budget():
+    _assert_fast_start("regenerate")
+
+
+def test_frontmatter_import_budget():
+    _assert_fast_start("frontmatter")
+
+
+def test_fetch_documents_defers_heavy_imports():
+    loaded = {name.split(".")[0] for name in _import_times("fetch_documents")}
+    assert not loaded & HEAVY_MODULES
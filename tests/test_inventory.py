@@ -0,0 +1,52 @@
+"""Tests for the on-disk document inventory."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from inventory import IntervalSet, existing_numbers, scan_pattern
+
+
+def test_interval_set_ranges_and_membership():
+    s = IntervalSet([1, 2, 3, 5, 8, 9])
+    assert s.ranges() == [(1, 3), (5, 5), (8, 9)]
+    assert 2 in s and 5 in s and 9 in s
+    assert 4 not in s and 0 not in s and 10 not in s
+    assert len(s) == 6
+    assert s.max() == 9
+
+
+def test_interval_set_next_missing():
+    s = IntervalSet([1, 2, 3, 5])
+    assert s.next_missing(1) == 4
+    assert s.next_missing(4) == 4
+    assert s.next_missing(5) == 6
+    assert s.missing_between(1, 5) == 1
+    assert s.missing_between(1, 8) == 3
+
+
+def test_interval_set_add_merges():
+    s = IntervalSet([1, 3, 7])
+    s.add(2)
+    assert s.ranges() == [(1, 3), (7, 7)]
+    s.add(5)
+    s.add(6)
+    assert s.ranges() == [(1, 3), (5, 7)]
+    s.add(4)
+    assert s.ranges() == [(1, 7)]
+    s.add(0)
+    s.add(9)
+    assert s.ranges() == [(0, 7), (9, 9)]
+
+
+def test_scan_pattern_requires_every_directory(tmp_path):
+    fr = tmp_path / "fr"
+    fr.mkdir()
+    for n in (1, 2, 3):
+        (tmp_path / f"A_RES_80_{n}.md").write_text("", encoding="utf-8")
+    (tmp_path / "A_RES_80_03.md").write_text("", encoding="utf-8")
+    (fr / "A_RES_80_2.md").write_text("", encoding="utf-8")
+    assert existing_numbers("A_RES_80_{X}", tmp_path) == {1, 2, 3}
+    assert scan_pattern("A_RES_80_{X}", [tmp_path, fr]).ranges() == [(2, 2)]
@@ -0,0 +1,97 @@
+"""Tests for near-duplicate detection."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from changefeed import NEW, ChangeFeed
+from extract import EXTRACT_VERSION, format_output
+from neardup import NearDuplicateIndex, signature, similarity, update
+
+TEXT = " ".join(
+    f"The General Assembly recalls its resolution {n} on item {n * 7} and requests a report."
+    for n in range(60)
+)
+OTHER = " ".join(
+    f"The Security Council decides to extend mandate {n} until period {n * 3} ends."
+    for n in range(60)
+)
+
+
+def test_similarity_estimate():
+    edited = TEXT.replace("resolution 12 ", "resolution 13 ")
+    assert similarity(signature(TEXT), signature(edited)) > 0.9
+    assert similarity(signature(TEXT), signature(OTHER)) < 0.1
+    assert signature("") is None
+
+
+def test_query_and_clusters(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "neardup.json")
+    index.add("a.md", signature(TEXT))
+    index.add("b.md", signature(TEXT + " Adopted without a vote."))
+    index.add("c.md", signature(OTHER))
+
+    assert [doc for doc, _ in index.query(signature(TEXT), exclude="a.md")] == ["b.md"]
+    assert index.clusters() == [["a.md", "b.md"]]
+
+    index.save()
+    loaded = NearDuplicateIndex(tmp_path / "neardup.json")
+    assert len(loaded) == 3
+    assert loaded.clusters() == [["a.md", "b.md"]]
+
+
+def test_update_flags_new_near_copies(tmp_path):
+    docs_dir, feed_dir = tmp_path / "documents", tmp_path / "feed"
+
+    def write(name: str, body: str) -> str:
+        path = docs_dir / "ga-res-80" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(format_output(body, {"symbol": name}), encoding="utf-8")
+        return path.relative_to(docs_dir).as_posix()
+
+    write("A_RES_80_1.md", TEXT)
+    feed = ChangeFeed(feed_dir)
+    feed.append(NEW, "A/RES/80/1", "ga-res-80/A_RES_80_1.md", b"doc", EXTRACT_VERSION)
+    feed.sync()
+
+    # The first update signs the corpus and skips the feed so far
+    index = NearDuplicateIndex()
+    assert update(index, docs_dir, feed_dir) == []
+    assert index.complete and index.cursor == 1 and len(index) == 1
+
+    for n, body in ((2, OTHER), (3, TEXT.replace("requests", "invites", 1))):
+        doc = write(f"A_RES_80_{n}.md", body)
+        feed.append(NEW, f"A/RES/80/{n}", doc, b"doc", EXTRACT_VERSION)
+    feed.close()
+
+    flagged = update(index, docs_dir, feed_dir)
+    assert [(doc, [other for other, _ in matches]) for doc, matches in flagged] == [
+        ("ga-res-80/A_RES_80_3.md", ["ga-res-80/A_RES_80_1.md"])]
+    assert index.cursor == 3 and len(index) == 3
+
+
+def test_update_takes_in_what_another_process_saved(tmp_path):
+    docs_dir, feed_dir = tmp_path / "documents", tmp_path / "feed"
+    state = tmp_path / "neardup.json"
+    path = docs_dir / "ga-res-80" / "A_RES_80_1.md"
+    path.parent.mkdir(parents=True)
+    path.write_text(format_output(TEXT, {"symbol": "A/RES/80/1"}), encoding="utf-8")
+
+    one, two = NearDuplicateIndex(state), NearDuplicateIndex(state)
+    update(one, docs_dir, feed_dir)
+
+    copy = docs_dir / "ga-res-80" / "A_RES_80_2.md"
+    copy.write_text(format_output(TEXT.replace("requests", "invites", 1),
+                                  {"symbol": "A/RES/80/2"}), encoding="utf-8")
+    feed = ChangeFeed(feed_dir)
+    feed.append(NEW, "A/RES/80/2", "ga-res-80/A_RES_80_2.md", b"doc", EXTRACT_VERSION)
+    feed.close()
+
+    # The second process continues from the first one's save ...
+    assert [doc for doc, _ in update(two, docs_dir, feed_dir)] == ["ga-res-80/A_RES_80_2.md"]
+    # ... and the first does not handle the same event again
+    assert update(one, docs_dir, feed_dir) == []
+    assert one.cursor == 1 and len(one) == 2
+    assert NearDuplicateIndex(state).cursor == 1
@@ -0,0 +1,371 @@
+"""Tests for Search API response parsing and output layout."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from pipeline import _parse_marcxml, output_path
+
+
+MARCXML = """<?xml version="1.0" encoding="UTF-8"?>
+<collection xmlns="http://www.loc.gov/MARC21/slim">
+  <record>
+    <controlfield tag="001">4093123</controlfield>
+    <datafield tag="191" ind1=" " ind2=" "><subfield code="a">A/RES/80/5</subfield></datafield>
+    <datafield tag="245" ind1=" " ind2=" "><subfield code="a">Doha Political Declaration</subfield></datafield>
+    <datafield tag="269" ind1=" " ind2=" "><subfield code="a">2025-11-04</subfield></datafield>
+    <datafield tag="856" ind1=" " ind2=" ">
+      <subfield code="u">https://digitallibrary.un.org/record/4093123/files/A_RES_80_5-AR.pdf</subfield>
+      <subfield code="y">العربية</subfield>
+    </datafield>
+    <datafield tag="856" ind1=" " ind2=" ">
+      <subfield code="u">https://digitallibrary.un.org/record/4093123/files/A_RES_80_5-EN.pdf</subfield>
+      <subfield code="y">English</subfield>
+    </datafield>
+    <datafield tag="856" ind1=" " ind2=" ">
+      <subfield code="u">https://digitallibrary.un.org/record/4093123/files/A_RES_80_5-ZH.pdf</subfield>
+      <subfield code="y">中文</subfield>
+    </datafield>
+  </record>
+</collection>
+""".encode("utf-8")
+
+
+def test_parse_marcxml_collects_all_languages():
+    metadata = _parse_marcxml(MARCXML, "A/RES/80/5", "EN")
+    assert metadata["record_id"] == "4093123"
+    assert metadata["source_pdf"].endswith("A_RES_80_5-EN.pdf")
+    assert set(metadata["pdf_urls"]) == {"AR", "EN", "ZH"}
+    assert metadata["pdf_urls"]["ZH"].endswith("A_RES_80_5-ZH.pdf")
+
+
+def test_parse_marcxml_keeps_record_without_target_language():
+    metadata = _parse_marcxml(MARCXML, "A/RES/80/5", "FR")
+    assert metadata["source_pdf"] == ""
+    assert "AR" in metadata["pdf_urls"]
+
+
+def test_parse_marcxml_ignores_other_symbols():
+    assert _parse_marcxml(MARCXML, "A/RES/80/6", "EN") is None
+
+
+def test_output_path_per_language():
+    out_dir = Path("documents/ga-res-80")
+    assert output_path(out_dir, "A/RES/80/5", "EN", "EN") == out_dir / "A_RES_80_5.md"
+    assert output_path(out_dir, "A/RES/80/5", "FR", "EN") == out_dir / "fr" / "A_RES_80_5.md"
+
+
+def test_process_pattern_skips_existing_range_without_requests(tmp_path, monkeypatch):
+    import pipeline
+
+    out_dir = tmp_path / "ga-res-80"
+    out_dir.mkdir()
+    for n in range(1, 6):
+        (out_dir / f"A_RES_80_{n}.md").write_text("---\n---\n", encoding="utf-8")
+    searched = []
+
+    def fake_search(symbol, language):
+        searched.append(symbol)
+        return None
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "search_document", fake_search)
+    monkeypatch.setattr(pipeline, "fetch_languages", lambda *args: {})
+
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1}
+    settings = {"max_consecutive_misses": 2, "request_delay_seconds": 0}
+    pat_state = pipeline.process_pattern(pattern, {}, settings, max_docs=10)
+
+    assert searched == ["A/RES/80/6", "A/RES/80/7"]
+    assert pat_state["last_fetched"] == 5
+    assert pat_state["consecutive_misses"] == 2
+
+
+def test_process_pattern_records_and_retries_over_budget_extraction(tmp_path, monkeypatch):
+    import pipeline
+
+    outcomes = {"A/RES/80/1": [pipeline.FAILED, pipeline.MISSING,
+                               pipeline.SAVED]}
+    calls = []
+
+    def fake_fetch_symbol(symbol, *args, budget_scale=1):
+        calls.append((symbol, budget_scale))
+        queued = outcomes.get(symbol)
+        return queued.pop(0) if queued else pipeline.MISSING
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "fetch_symbol", fake_fetch_symbol)
+
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1}
+    settings = {"max_consecutive_misses": 1}
+    pat_state = pipeline.process_pattern(pattern, {}, settings, max_docs=10)
+    assert pat_state["last_fetched"] == 1
+    assert pat_state["failed"] == {"1": {"symbol": "A/RES/80/1", "attempts": 1}}
+
+    # A retry whose download fails keeps the entry without spending an attempt
+    pat_state["consecutive_misses"] = 0
+    pat_state = pipeline.process_pattern(pattern, {"ga-res-80": pat_state},
+                                                settings, max_docs=10)
+    assert pat_state["failed"] == {"1": {"symbol": "A/RES/80/1", "attempts": 1}}
+
+    pat_state["consecutive_misses"] = 0
+    pat_state = pipeline.process_pattern(pattern, {"ga-res-80": pat_state},
+                                                settings, max_docs=10)
+    assert "failed" not in pat_state
+    assert calls.count(("A/RES/80/1", 2)) == 2
+
+
+def test_process_pattern_probes_frontier_lane_before_backlog(tmp_path, monkeypatch):
+    import pipeline
+
+    calls = []
+
+    def fake_fetch_symbol(symbol, *args, budget_scale=1):
+        calls.append(int(symbol.rsplit("/", 1)[1]))
+        return pipeline.SAVED if calls[-1] <= 21 else pipeline.MISSING
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "fetch_symbol", fake_fetch_symbol)
+
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1, "frontier": 20}
+    settings = {"max_consecutive_misses": 1, "frontier_lane_docs": 2}
+    inventory = pipeline.IntervalSet()
+    pat_state = pipeline.process_pattern(pattern, {}, settings, max_docs=4,
+                                                inventory=inventory)
+    assert calls == [20, 21, 1, 2]
+    assert pat_state["last_fetched"] == 2
+    assert pat_state["frontier"] == {"last_fetched": 21, "consecutive_misses": 0}
+
+    # The backlog catches up with the lane, which is closed with its misses
+    calls.clear()
+    pat_state = pipeline.process_pattern(pattern, {"ga-res-80": pat_state}, settings,
+                                                max_docs=30, inventory=inventory)
+    assert calls == [22, *range(3, 20)]
+    assert "frontier" not in pat_state
+    assert pat_state["last_fetched"] == 21
+    assert pat_state["consecutive_misses"] == 1
+
+
+def test_frontier_lane_probes_head_on_every_run(tmp_path, monkeypatch):
+    import pipeline
+
+    upstream = set(range(1, 101))
+    calls = []
+
+    def fake_fetch_symbol(symbol, *args, budget_scale=1):
+        calls.append(int(symbol.rsplit("/", 1)[1]))
+        return pipeline.SAVED if calls[-1] in upstream else pipeline.MISSING
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "fetch_symbol", fake_fetch_symbol)
+
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1, "frontier": 100}
+    settings = {"max_consecutive_misses": 3, "frontier_lane_docs": 2}
+    inventory = pipeline.IntervalSet()
+    state = {}
+    for run in range(4):
+        if run == 2:
+            upstream.add(101)
+        calls.clear()
+        state["ga-res-80"] = pipeline.process_pattern(pattern, state, settings,
+                                                             max_docs=3, inventory=inventory)
+        # The head is probed first on every run, misses or not
+        assert calls[0] == (100 if run == 0 else 101 if run <= 2 else 102)
+    assert 101 in inventory
+    assert state["ga-res-80"]["frontier"]["last_fetched"] == 101
+
+
+def test_search_recent_pages_and_orders_by_modification(monkeypatch):
+    import pipeline
+
+    def record(recid, symbol, stamp):
+        return (f'<record><controlfield tag="001">{recid}</controlfield>'
+                f'<controlfield tag="005">{stamp}</controlfield>'
+                f'<datafield tag="191" ind1=" " ind2=" "><subfield code="a">{symbol}</subfield></datafield>'
+                f'<datafield tag="856" ind1=" " ind2=" "><subfield code="u">https://x/{recid}-EN.pdf'
+                f'</subfield><subfield code="y">English</subfield></datafield></record>')
+
+    pages = [
+        [record(2, "A/RES/80/7", "20251105090000.0"), record(3, "A/C.3/80/L.1", "20251101000000.0")],
+        [record(1, "A/RES/80/6", "20251102120000.0")],
+    ]
+    sent = []
+
+    def fake_search(params, what):
+        sent.append(params)
+        body = "".join(pages.pop(0))
+        return f'<collection xmlns="http://www.loc.gov/MARC21/slim">{body}</collection>'.encode()
+
+    monkeypatch.setattr(pipeline, "_search", fake_search)
+    hits = pipeline.search_recent("A/RES/80/", "2025-11-01 00:00:00", "EN", page_size=2)
+
+    assert [(m, s) for m, s, _ in hits] == [("2025-11-02 12:00:00", "A/RES/80/6"),
+                                            ("2025-11-05 09:00:00", "A/RES/80/7")]
+    assert hits[0][2]["source_pdf"] == "https://x/1-EN.pdf"
+    assert sent[0]["p"] == '191__a:"A/RES/80/*"'
+    assert sent[0]["d1"] == "2025-11-01 00:00:00"
+    assert [p["jrec"] for p in sent] == ["1", "3"]
+
+
+def test_process_pattern_discovers_recent_records(tmp_path, monkeypatch):
+    import pipeline
+
+    (tmp_path / "ga-res-80").mkdir()
+    (tmp_path / "ga-res-80" / "A_RES_80_3.md").write_text("---\n---\n", encoding="utf-8")
+    hits = [("2025-11-01 10:00:00", f"A/RES/80/{n}", {"symbol": f"A/RES/80/{n}", "pdf_urls": {}})
+            for n in (3, 9, 4)]
+    queries = []
+    fetched = []
+
+    def fake_search_recent(prefix, since, language, page_size):
+        queries.append((prefix, since))
+        return hits
+
+    def fake_fetch_symbol(symbol, *args, metadata=None, budget_scale=1):
+        fetched.append((symbol, metadata["symbol"]))
+        return pipeline.SAVED
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "search_recent", fake_search_recent)
+    monkeypatch.setattr(pipeline, "fetch_symbol", fake_fetch_symbol)
+
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1, "discovery": "recent"}
+    pat_state = pipeline.process_pattern(pattern, {}, {}, max_docs=1)
+    assert fetched == [("A/RES/80/9", "A/RES/80/9")]
+    assert pat_state["last_fetched"] == 9
+    assert pat_state["discovered_until"] == "2025-11-01 10:00:00"
+
+    pipeline.process_pattern(pattern, {"ga-res-80": pat_state}, {}, max_docs=5)
+    assert queries[-1] == ("A/RES/80/", "2025-11-01 10:00:00")
+    assert fetched[-1] == ("A/RES/80/4", "A/RES/80/4")
+
+
+def test_discovery_lists_unfetched_records_again(tmp_path, monkeypatch):
+    import pipeline
+
+    hits = [(f"2025-11-0{n} 10:00:00", f"A/RES/80/{n}", {"symbol": f"A/RES/80/{n}"})
+            for n in (1, 2, 3)]
+    queries = []
+    outcomes = {"A/RES/80/2": [pipeline.MISSING, pipeline.SAVED]}
+
+    def fake_search_recent(prefix, since, language, page_size):
+        queries.append(since)
+        return [hit for hit in hits if hit[0] >= since]
+
+    def fake_fetch_symbol(symbol, *args, metadata=None, budget_scale=1):
+        queued = outcomes.get(symbol)
+        return queued.pop(0) if queued else pipeline.SAVED
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "search_recent", fake_search_recent)
+    monkeypatch.setattr(pipeline, "fetch_symbol", fake_fetch_symbol)
+
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1, "discovery": "recent"}
+    inventory = pipeline.IntervalSet()
+    pat_state = pipeline.process_pattern(pattern, {}, {}, max_docs=5, inventory=inventory)
+    assert pat_state["discovered_until"] == "2025-11-01 10:00:00"
+    assert 2 not in inventory and 3 in inventory
+
+    pat_state = pipeline.process_pattern(pattern, {"ga-res-80": pat_state}, {},
+                                                max_docs=5, inventory=inventory)
+    assert queries[-1] == "2025-11-01 10:00:00"
+    assert 2 in inventory
+    assert pat_state["discovered_until"] == "2025-11-03 10:00:00"
+
+
+def test_fetch_symbol_skips_search_for_known_record(tmp_path, monkeypatch):
+    import pipeline
+    from extract import format_output
+
+    out_dir = tmp_path / "ga-res-80"
+    out_dir.mkdir()
+    (out_dir / "A_RES_80_5.md").write_text(
+        format_output("Body.", {"symbol": "A/RES/80/5", "record_id": "4093123",
+                                "title": "Doha Political Declaration"}),
+        encoding="utf-8")
+    downloaded = []
+    saved = []
+
+    def fake_search(symbol, language):
+        raise AssertionError("searched")
+
+    def fake_download(url, max_retries=3, validators=None):
+        downloaded.append(url)
+        return b"%PDF-1.7"
+
+    monkeypatch.setattr(pipeline, "search_document", fake_search)
+    monkeypatch.setattr(pipeline, "download_pdf", fake_download)
+    monkeypatch.setattr(pipeline, "extract_document",
+                        lambda pdf, out_file, metadata, *args: saved.append(metadata) or (5, set()))
+
+    outcome = pipeline.fetch_symbol("A/RES/80/5", out_dir, ["EN", "FR"], "EN", {})
+    assert outcome == pipeline.SAVED
+    assert downloaded == ["https://digitallibrary.un.org/record/4093123/files/A_RES_80_5-FR.pdf"]
+    assert saved[0]["title"] == "Doha Political Declaration"
+    assert saved[0]["source_pdf"] == downloaded[0]
+
+
+def test_fetch_symbol_with_primary_on_disk_is_not_a_miss(tmp_path, monkeypatch):
+    import pipeline
+
+    out_dir = tmp_path / "ga-res-80"
+    out_dir.mkdir()
+    (out_dir / "A_RES_80_5.md").write_text("---\nsymbol: A/RES/80/5\n---\n", encoding="utf-8")
+    monkeypatch.setattr(pipeline, "search_record", lambda *args: None)
+    monkeypatch.setattr(pipeline, "fetch_language_pdf",
+                        lambda *args: (None, "", {}))
+
+    # The French version does not exist upstream
+    assert pipeline.fetch_symbol("A/RES/80/5", out_dir, ["EN", "FR"], "EN",
+                                        {}) == pipeline.SAVED
+    # Every language on disk already (e.g. a stale inventory)
+    assert pipeline.fetch_symbol("A/RES/80/5", out_dir, ["EN"], "EN",
+                                        {}) == pipeline.SAVED
+    assert pipeline.fetch_languages("A/RES/80/5", None, []) == {}
+
+
+def test_busy_search_is_not_a_miss(tmp_path, monkeypatch):
+    import pipeline
+
+    def busy_search(params, what):
+        raise pipeline.SearchUnavailable("busy")
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "_search", busy_search)
+    monkeypatch.setattr(pipeline, "fetch_language_pdf", lambda *args: (None, "", {}))
+
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1}
+    pat_state = pipeline.process_pattern(pattern, {}, {"max_consecutive_misses": 1},
+                                                max_docs=10)
+    assert pat_state["last_fetched"] == 0
+    assert pat_state["consecutive_misses"] == 0
+    assert pipeline.search_recent("A/RES/80/", "", "EN") is None
+
+
+def test_bootstrap_headers_learns_from_saved_documents_once(tmp_path, monkeypatch):
+    import pipeline
+    from extract import format_output
+    from headers import HeaderTemplates
+
+    for n in range(1, 5):
+        symbol = f"A/RES/80/{n}"
+        (tmp_path / f"A_RES_80_{n}.md").write_text(format_output("Body.", {
+            "symbol": symbol, "language": "EN",
+            "source_pdf": f"https://digitallibrary.un.org/record/{n}/files/A_RES_80_{n}-EN.pdf",
+        }), encoding="utf-8")
+
+    downloads = []
+    monkeypatch.setattr(pipeline, "download_pdf",
+                        lambda url: downloads.append(url) or None)
+    templates = HeaderTemplates(tmp_path / "headers.json")
+    assert pipeline.bootstrap_headers("ga-res-80", tmp_path, "EN", templates, 3) == 0
+    assert templates.needs_bootstrap("ga-res-80")  # nothing downloaded, try again later
+
+    monkeypatch.setattr(pipeline, "download_pdf", lambda url: url.encode())
+    monkeypatch.setattr(pipeline, "detect_pdf_headers", lambda pdf: {
+        pdf.decode().rsplit("/", 1)[1][:-7].replace("_", "/"), "(a)"})
+    assert pipeline.bootstrap_headers("ga-res-80", tmp_path, "EN", templates, 3) == 3
+    assert not templates.needs_bootstrap("ga-res-80")
+    assert templates.header_lines("ga-res-80", "A/RES/80/9") == {"A/RES/80/9"}
@@ -0,0 +1,62 @@
+"""Tests for the dry-run fetch planner."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import plan
+from plan import plan_pattern, suggest_max_docs
+
+PATTERN = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1}
+SETTINGS = {"max_consecutive_misses": 3, "request_delay_seconds": 2, "language": "EN"}
+
+
+def _make_docs(tmp_path, numbers):
+    out_dir = tmp_path / "ga-res-80"
+    out_dir.mkdir()
+    for n in numbers:
+        (out_dir / f"A_RES_80_{n}.md").write_text("---\n---\n", encoding="utf-8")
+    (out_dir / "notes.txt").write_text("", encoding="utf-8")
+    return out_dir
+
+
+def test_plan_skips_existing_and_counts_holes(tmp_path, monkeypatch):
+    _make_docs(tmp_path, [1, 2, 3, 5, 8])
+    monkeypatch.setattr(plan, "DOCS_DIR", tmp_path)
+    result = plan_pattern(PATTERN, {}, SETTINGS, max_docs=10)
+    assert result["start_x"] == 1
+    assert result["skipped_existing"] == 3
+    assert result["holes_below_max"] == 3
+    assert result["series_ended"]["symbols"] == 3
+    assert result["series_ended"]["requests"] == 6
+    assert result["series_ended"]["sleep_seconds"] == 12
+
+
+def test_plan_dormant_pattern(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan, "DOCS_DIR", tmp_path)
+    state = {"ga-res-80": {"last_fetched": 55, "consecutive_misses": 3}}
+    result = plan_pattern(PATTERN, state, SETTINGS, max_docs=10)
+    assert result["dormant"]
+    assert result["full_budget"]["requests"] == 0
+    assert suggest_max_docs([result], 30) == 0
+
+
+def test_suggest_max_docs_fits_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan, "DOCS_DIR", tmp_path)
+    result = plan_pattern(PATTERN, {}, SETTINGS, max_docs=10)
+    suggested = suggest_max_docs([result], 30)
+    budget = 30 * 60 - plan.JOB_OVERHEAD_SECONDS
+    assert suggested * result["seconds_per_doc"] + result["miss_tail_seconds"] <= budget
+    assert (suggested + 1) * result["seconds_per_doc"] + result["miss_tail_seconds"] > budget
+
+
+def test_plan_paces_every_request_at_the_controller_rate(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan, "DOCS_DIR", tmp_path)
+    settings = {**SETTINGS, "languages": ["EN", "FR"]}
+    result = plan_pattern(PATTERN, {}, settings, max_docs=10)
+    assert result["series_ended"]["sleep_seconds"] == 3 * 3 * 2
+
+    fast = {**SETTINGS, "request_delay_seconds": 0.1, "rate_min_delay_seconds": 0.5}
+    assert plan_pattern(PATTERN, {}, fast, max_docs=10)["series_ended"]["sleep_seconds"] == 3
@@ -0,0 +1,112 @@
+"""Tests for adaptive per-host request pacing."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import pipeline
+from ratelimit import HostRates, RateController, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_acquire_spaces_requests_by_current_delay():
+    clock = FakeClock()
+    c = RateController(delay=2, clock=clock, sleep=clock.sleep)
+    c.acquire()
+    c.acquire()
+    c.acquire()
+    assert clock.slept == [2, 2]
+
+
+def test_additive_increase_and_multiplicative_decrease():
+    c = RateController(delay=2, min_delay=0.5, max_delay=8, increase=0.1)
+    c.record(200, 0.2)
+    assert round(c.rate, 3) == 0.6
+    c.record(429, 0.2)
+    assert round(c.rate, 3) == 0.3
+    assert c.throttled == 1
+    for _ in range(50):
+        c.record(200, 0.2)
+    assert c.rate == 2.0  # capped at 1/min_delay
+    for _ in range(20):
+        c.record(503, 0.2)
+    assert c.rate == 1 / 8
+
+
+def test_empty_202_and_latency_spike_slow_down():
+    c = RateController(delay=1, increase=0)
+    c.record(202, 0.2)
+    assert c.rate == 0.5
+    c.record(200, 0.3)
+    c.record(200, 5.0)  # far above the running average
+    assert c.rate == 0.25
+    c.back_off()
+    assert c.rate == 0.125
+
+
+def test_retry_after_holds_the_host():
+    clock = FakeClock()
+    c = RateController(delay=1, clock=clock, sleep=clock.sleep)
+    c.acquire()
+    c.record(429, 0.1, retry_after="30")
+    c.acquire()
+    assert clock.slept == [30]
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_host_rates_are_independent():
+    rates = HostRates({"request_delay_seconds": 1})
+    a = rates.for_url("https://digitallibrary.un.org/search")
+    assert rates.for_url("https://digitallibrary.un.org/record/1/files/x.pdf") is a
+    a.record(429, 0.1)
+    assert rates.for_url("https://undocs.org/en/A/RES/80/1").rate == 1
+    assert any(line.startswith("digitallibrary.un.org: 0.50 req/s") for line in rates.report())
+
+
+def test_search_retries_busy_responses(monkeypatch):
+    class Response:
+        def __init__(self, status, content):
+            self.status_code = status
+            self.content = content
+            self.headers = {}
+
+        def raise_for_status(self):
+            pass
+
+    responses = [Response(202, b""), Response(200, b"")]
+
+    class Session:
+        def get(self, url, **kwargs):
+            return responses.pop(0)
+
+    monkeypatch.setattr(pipeline, "_SESSION", Session())
+    monkeypatch.setattr(pipeline, "RATES",
+                        HostRates({"request_delay_seconds": 0}, min_delay=0))
+    parsed = []
+    monkeypatch.setattr(pipeline, "_parse_marcxml", lambda *a: parsed.append(a))
+    responses.append(Response(200, b"<collection/>"))
+
+    pipeline.search_document("A/RES/80/1", "EN")
+
+    assert parsed and not responses
+    assert pipeline.RATES.for_url(pipeline.SEARCH_BASE).throttled == 2
@@ -0,0 +1,60 @@
+"""Tests for learned PDF URL templates."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from resolve import DEFAULT_TEMPLATES, UrlTemplates, generalize, instantiate
+
+URL = "https://digitallibrary.un.org/record/4093123/files/A_RES_80_5-EN.pdf"
+
+
+def test_generalize_round_trips():
+    template = generalize(URL, "4093123", "A_RES_80_5", "EN")
+    assert template == DEFAULT_TEMPLATES[0]
+    assert instantiate(template, "4093123", "A_RES_80_5", "FR") == URL.replace("-EN", "-FR")
+    assert generalize("https://example.org/other.pdf", "1", "A_RES_80_5", "EN") is None
+
+
+def test_candidates_rank_and_skip(tmp_path):
+    urls = UrlTemplates(tmp_path / "url_templates.json", min_tries=2, min_hit_rate=0.5)
+    urls.learn("ga-res-80", {"EN": "https://mirror.example/docs/A_RES_80_5-en.pdf"},
+               "4093123", "A_RES_80_5")
+
+    # Templates without a record id are still usable for unknown records
+    assert urls.candidates("ga-res-80", "A_RES_80_6", "FR") == [
+        ("https://mirror.example/docs/{symbol}-{lang}.pdf",
+         "https://mirror.example/docs/A_RES_80_6-fr.pdf")]
+
+    urls.record("ga-res-80", DEFAULT_TEMPLATES[0], True)
+    ranked = [t for t, _ in urls.candidates("ga-res-80", "A_RES_80_6", "FR", "1")]
+    assert ranked[0] == DEFAULT_TEMPLATES[0]
+
+    urls.record("ga-res-80", "https://mirror.example/docs/{symbol}-{lang}.pdf", False)
+    urls.record("ga-res-80", "https://mirror.example/docs/{symbol}-{lang}.pdf", False)
+    assert [t for t, _ in urls.candidates("ga-res-80", "A_RES_80_6", "FR", "1")] == [
+        DEFAULT_TEMPLATES[0]]
+
+    urls.save()
+    reloaded = UrlTemplates(tmp_path / "url_templates.json")
+    assert reloaded.report() == [
+        f"ga-res-80 {DEFAULT_TEMPLATES[0]}: 1/1 hits",
+        "ga-res-80 https://mirror.example/docs/{symbol}-{lang}.pdf: 0/2 hits",
+    ]
+
+
+def test_counts_saved_by_several_processes_add_up(tmp_path):
+    path = tmp_path / "url_templates.json"
+    one, two = UrlTemplates(path), UrlTemplates(path)
+    one.record("ga-res-80", DEFAULT_TEMPLATES[0], True)
+    two.record("ga-res-80", DEFAULT_TEMPLATES[0], False)
+    two.record("sc-res", DEFAULT_TEMPLATES[0], True)
+    one.save()
+    two.save()
+
+    assert UrlTemplates(path).report() == [
+        f"ga-res-80 {DEFAULT_TEMPLATES[0]}: 1/2 hits",
+        f"sc-res {DEFAULT_TEMPLATES[0]}: 1/1 hits",
+    ]
@@ -0,0 +1,148 @@
+"""Complexity regression tests: every extract.py stage must scale linearly.
+
+Each stage is fed synthetic inputs of 10k, 100k and 1M lines built to hit
+its worst case (one paragraph or footnote spanning every line, hundreds of
+footnotes, ...).  A linear stage takes about 10x longer per 10x more input;
+a quadratic one about 100x.  The tests fail when a 10x step costs more than
+MAX_STEP_RATIO times as much.
+
+Every run checks the 10k -> 100k step, timing the best of a few runs;
+against the 30x bound a linear stage measures about 10-15x, leaving room
+for a noisy CI runner while a quadratic one still fails.  The 1M-line step
+takes much longer and is a benchmark run only with RAILCAR_BENCHMARKS=1.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from extract import (
+    _clean_text,
+    _collect_footnote_nums,
+    _convert_footnote_refs,
+    _detect_header_lines,
+    _format_footnote_defs,
+    _join_paragraph_numbers,
+    _join_paragraphs,
+    _relocate_inline_footnotes,
+    _split_page_footnotes,
+    _StreamCleaner,
+    clean_text,
+)
+
+SIZES = (10_000, 100_000, 1_000_000)
+MAX_STEP_RATIO = 30
+
+benchmark = pytest.mark.skipif(not os.environ.get("RAILCAR_BENCHMARKS"),
+                               reason="benchmark; set RAILCAR_BENCHMARKS=1 to run")
+
+
+def _long_paragraph(n: int) -> str:
+    return "\n".join(["Recalling its resolution on the matter"]
+                     + ["and the continuing work of the Assembly"] * (n - 1))
+
+
+def _long_footnote_block(n: int) -> str:
+    return "\n".join(["Some text.", "---", "", "1 See the report of the Secretary-General"]
+                     + ["continued over another line of the footnote"] * (n - 4))
+
+
+def _numbered_paragraphs(n: int) -> str:
+    return "\n".join(("1." if i % 2 == 0 else "Decides that the Assembly shall act;")
+                     for i in range(n))
+
+
+def _footnote_defs(n: int) -> str:
+    return "\n".join(f"{i % 500 + 1} See resolution {i}." if i % 3 == 0
+                     else "continued footnote text" for i in range(n))
+
+
+def _referencing_body(n: int) -> str:
+    return "\n".join(f"the Statute{i % 700} and the Convention{i % 300}, resolution {i}"
+                     for i in range(n))
+
+
+def _pages(n: int) -> list[str]:
+    page = "\n".join(["A/RES/80/1", "Title of the resolution"]
+                     + ["body line of the page"] * 46)
+    return [page] * (n // 48)
+
+
+def _mixed_document(n: int) -> str:
+    block = [
+        "A/RES/80/1", "25-15106 (E)", "2/24", "", "The General Assembly,", "",
+        "Expressing concern regarding situations in which",
+        "representatives are prevented from participating1", "", "1.",
+        "Decides that something;", "", "_______________", "1 See resolution 169 (II).",
+    ]
+    return "\n".join(block * (n // len(block)))
+
+
+def _run_stream_cleaner(text: str) -> str:
+    cleaner = _StreamCleaner({"A/RES/80/1"})
+    pieces = []
+    for line in text.split("\n"):
+        pieces.extend(cleaner.push(line))
+    pieces.extend(cleaner.finish())
+    return "".join(pieces)
+
+
+_FOOTNOTE_NUMS = {str(i) for i in range(1, 501)}
+
+STAGES = {
+    "split_page_footnotes": (lambda n: _long_footnote_block(n).replace("---", "_____"),
+                             _split_page_footnotes),
+    "detect_header_lines": (_pages, _detect_header_lines),
+    "clean_text_stage": (_mixed_document, lambda t: _clean_text(t, {"A/RES/80/1"})),
+    "join_paragraph_numbers": (_numbered_paragraphs, _join_paragraph_numbers),
+    "join_paragraphs": (_long_paragraph, _join_paragraphs),
+    "relocate_inline_footnotes": (_long_footnote_block, _relocate_inline_footnotes),
+    "collect_footnote_nums": (_footnote_defs, _collect_footnote_nums),
+    "convert_footnote_refs": (_referencing_body,
+                              lambda t: _convert_footnote_refs(t, _FOOTNOTE_NUMS)),
+    "format_footnote_defs": (_footnote_defs, _format_footnote_defs),
+    "clean_text": (_mixed_document, clean_text),
+    "stream_cleaner": (_long_paragraph, _run_stream_cleaner),
+}
+
+
+def _timed(func, arg) -> float:
+    start = time.perf_counter()
+    func(arg)
+    return time.perf_counter() - start
+
+
+def _assert_linear_steps(stage: str, sizes: tuple[int, ...]) -> None:
+    make_input, func = STAGES[stage]
+    timings = []
+    for n in sizes:
+        arg = make_input(n)
+        # Best of several runs, except for the largest input
+        repeats = 3 if n < SIZES[-1] else 1
+        timings.append(min(_timed(func, arg) for _ in range(repeats)))
+    for (n_small, t_small), (n_large, t_large) in zip(
+        zip(sizes, timings), zip(sizes[1:], timings[1:])
+    ):
+        # Floor the baseline so timer resolution cannot inflate the ratio
+        ratio = t_large / max(t_small, 1e-3)
+        assert ratio < MAX_STEP_RATIO, (
+            f"{stage}: {n_small} -> {n_large} lines took {t_small:.4f}s -> "
+            f"{t_large:.4f}s ({ratio:.0f}x)"
+        )
+
+
+@pytest.mark.parametrize("stage", sorted(STAGES))
+def test_stage_scales_linearly(stage):
+    _assert_linear_steps(stage, SIZES[:2])
+
+
+@benchmark
+@pytest.mark.parametrize("stage", sorted(STAGES))
+def test_stage_scales_linearly_to_a_million_lines(stage):
+    _assert_linear_steps(stage, SIZES[1:])
@@ -0,0 +1,67 @@
+"""Tests for the polling daemon's scheduling."""
+
+import sys
+import threading
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import serve
+from inventory import IntervalSet
+from serve import Daemon, next_interval
+from storage import StateJournal
+
+
+def test_next_interval_backs_off_and_speeds_up():
+    assert next_interval(3600, 2, 600, 7200) == 1800
+    assert next_interval(900, 1, 600, 7200) == 600
+    assert next_interval(3600, 0, 600, 7200) == 7200
+    assert next_interval(7200, 0, 600, 7200) == 7200
+
+
+def test_poll_adapts_interval_and_revives_dormant_pattern(tmp_path, monkeypatch):
+    now = [1000.0]
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}"}
+    state = {"ga-res-80": {"last_fetched": 4, "consecutive_misses": 3}}
+    settings = {"serve_interval_minutes": 60, "serve_min_interval_minutes": 10,
+                "serve_max_interval_minutes": 240}
+    daemon = Daemon([pattern], state, settings, 10,
+                    StateJournal(tmp_path / "progress.json"), clock=lambda: now[0])
+    daemon.inventories["ga-res-80"] = IntervalSet(range(1, 5))
+    new_docs = [2, 0]
+    seen = []
+
+    def fake_process_pattern(pattern_cfg, state, settings, max_docs, journal, pool,
+                             templates, cache, inventory, stop, feed=None):
+        pat_state = state["ga-res-80"]
+        seen.append(pat_state["consecutive_misses"])
+        assert isinstance(stop, threading.Event)
+        for _ in range(new_docs.pop(0)):
+            pat_state["last_fetched"] += 1
+            inventory.add(pat_state["last_fetched"])
+        return dict(pat_state)
+
+    monkeypatch.setattr(serve, "process_pattern", fake_process_pattern)
+
+    assert daemon.poll(pattern) == 2
+    assert seen == [0]
+    assert daemon.schedule["ga-res-80"] == [1000.0 + 1800, 1800]
+
+    assert daemon.poll(pattern) == 0
+    assert daemon.schedule["ga-res-80"][1] == 3600
+    assert StateJournal(tmp_path / "progress.json").load()["ga-res-80"]["last_fetched"] == 6
+
+
+def test_process_pattern_honours_stop_event(tmp_path, monkeypatch):
+    import pipeline
+
+    monkeypatch.setattr(pipeline, "DOCS_DIR", tmp_path)
+    calls = []
+    monkeypatch.setattr(pipeline, "fetch_symbol", lambda *a, **k: calls.append(a))
+    stop = threading.Event()
+    stop.set()
+    pattern = {"id": "ga-res-80", "pattern": "A/RES/80/{X}"}
+
+    pipeline.process_pattern(pattern, {}, {}, 10, stop=stop)
+    assert calls == []
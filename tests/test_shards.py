@@ -0,0 +1,125 @@
+"""Tests for lease-based sharded backfill."""
+
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import pipeline
+import shards
+from shards import LeaseCoordinator, StateFragment, backfill_pattern, merge_fragments
+
+PATTERN = {"id": "ga-res-80", "pattern": "A/RES/80/{X}", "start": 1, "backfill_end": 10}
+
+
+def test_shards_cover_range():
+    assert LeaseCoordinator.shards(1, 10, 4) == [(1, 4), (5, 8), (9, 10)]
+
+
+def test_leases_are_exclusive_until_expired(tmp_path):
+    now = [1000.0]
+    a = LeaseCoordinator(tmp_path, "a", lease_seconds=60, clock=lambda: now[0])
+    b = LeaseCoordinator(tmp_path, "b", lease_seconds=60, clock=lambda: now[0])
+
+    first = a.acquire("p", 1, 8, 4)
+    second = b.acquire("p", 1, 8, 4)
+    assert (first.start, second.start) == (1, 5)
+    assert b.acquire("p", 1, 8, 4) is None
+
+    first.next = 3
+    assert a.renew(first)
+    now[0] += 120
+    taken = b.acquire("p", 1, 8, 4)
+    assert (taken.start, taken.next) == (1, 3)
+    assert not a.renew(first)
+
+    b.complete(taken)
+    now[0] += 120
+    assert a.acquire("p", 1, 8, 4).start == 5
+
+
+def test_takeover_does_not_steal_a_fresh_lease(tmp_path, monkeypatch):
+    now = [1000.0]
+    a = LeaseCoordinator(tmp_path, "a", lease_seconds=60, clock=lambda: now[0])
+    b = LeaseCoordinator(tmp_path, "b", lease_seconds=60, clock=lambda: now[0])
+    stale = LeaseCoordinator(tmp_path, "stale", lease_seconds=60, clock=lambda: now[0])
+    stale.acquire("p", 1, 4, 4)
+    now[0] += 120
+
+    rename = shards.os.rename
+    fresh = []
+
+    def racing_rename(src, dst):
+        # Worker a takes the expired lease over after b read it
+        if not fresh and str(dst).endswith(".b.stale"):
+            fresh.append(a.acquire("p", 1, 4, 4))
+        rename(src, dst)
+
+    monkeypatch.setattr(shards.os, "rename", racing_rename)
+    assert b.acquire("p", 1, 4, 4) is None
+    assert fresh[0] is not None and a.renew(fresh[0])
+    assert not list((tmp_path / "p").glob("*.stale"))
+
+
+def test_renewal_racing_a_takeover_leaves_one_owner(tmp_path, monkeypatch):
+    now = [1000.0]
+    a = LeaseCoordinator(tmp_path, "a", lease_seconds=60, clock=lambda: now[0])
+    b = LeaseCoordinator(tmp_path, "b", lease_seconds=60, clock=lambda: now[0])
+    lease = a.acquire("p", 1, 4, 4)
+
+    write = shards.atomic_write_text
+    taken = []
+
+    def racing_write(path, text, *args):
+        # Worker b tries to take the shard over while a renews it
+        taken.append(b.acquire("p", 1, 4, 4))
+        write(path, text, *args)
+
+    monkeypatch.setattr(shards, "atomic_write_text", racing_write)
+    # While the lease is current, a renewal in progress still holds the shard
+    assert a.renew(lease)
+    assert taken.pop() is None
+
+    now[0] += 120  # a was slow, its lease expired
+    lease.next = 3
+    # b took the expired lease over; a learns it lost instead of overwriting it
+    assert not a.renew(lease)
+    assert taken[0] is not None and taken[0].next == 1
+    monkeypatch.setattr(shards, "atomic_write_text", write)
+    assert b.renew(taken[0])
+    assert not a.renew(lease)
+    assert not list((tmp_path / "p").glob("*.stale"))
+
+
+def test_workers_split_backfill_and_merge(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, "DOCS_DIR", tmp_path / "documents")
+    probed = []
+
+    def fake_fetch_symbol(symbol, *args):
+        probed.append(symbol)
+        n = int(symbol.rsplit("/", 1)[1])
+        return {7: pipeline.FAILED, 8: pipeline.MISSING}.get(n, pipeline.SAVED)
+
+    monkeypatch.setattr(shards, "fetch_symbol", fake_fetch_symbol)
+    (tmp_path / "documents" / "ga-res-80").mkdir(parents=True)
+    (tmp_path / "documents" / "ga-res-80" / "A_RES_80_2.md").write_text("x")
+
+    leases = tmp_path / "leases"
+    settings = {"backfill_shard_size": 3}
+    for worker, budget in (("a", 3), ("b", 10)):
+        fragment = StateFragment(leases / "fragments" / f"{worker}.json")
+        backfill_pattern(PATTERN, settings, LeaseCoordinator(leases, worker), fragment, budget)
+
+    # X=2 exists; every other symbol probed exactly once across both workers
+    assert sorted(probed) == sorted(f"A/RES/80/{n}" for n in range(1, 11) if n != 2)
+    assert len(list((leases / "ga-res-80").glob("*.done"))) == 4
+
+    state = merge_fragments({}, leases, [PATTERN])
+    assert state["ga-res-80"]["last_fetched"] == 10
+    assert state["ga-res-80"]["failed"] == {"7": {"symbol": "A/RES/80/7", "attempts": 1}}
+    # Idempotent
+    assert merge_fragments(state, leases, [PATTERN])["ga-res-80"]["last_fetched"] == 10
+    # A failed symbol retried and cleared by the main loop is not merged again
+    del state["ga-res-80"]["failed"]
+    assert "failed" not in merge_fragments(state, leases, [PATTERN])["ga-res-80"]
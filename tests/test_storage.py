@@ -0,0 +1,66 @@
+"""Tests for atomic writes and the state journal."""
+
+import json
+import stat
+import sys
+from pathlib import Path
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from storage import StateJournal, atomic_write_text
+
+
+def test_atomic_write_text_replaces_file(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("old", encoding="utf-8")
+    atomic_write_text(path, "new")
+    assert path.read_text(encoding="utf-8") == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.md"]
+
+
+def test_atomic_write_text_keeps_plain_file_modes(tmp_path):
+    import storage
+
+    new = tmp_path / "new.md"
+    atomic_write_text(new, "text")
+    assert stat.S_IMODE(new.stat().st_mode) == 0o666 & ~storage._UMASK
+
+    kept = tmp_path / "kept.md"
+    kept.write_text("old", encoding="utf-8")
+    kept.chmod(0o640)
+    atomic_write_text(kept, "new")
+    assert stat.S_IMODE(kept.stat().st_mode) == 0o640
+
+
+def test_journal_replays_on_top_of_state(tmp_path):
+    state_path = tmp_path / "progress.json"
+    state_path.write_text(json.dumps({"a": {"last_fetched": 1}, "b": {"last_fetched": 7}}))
+    journal = StateJournal(state_path, commit_every=2)
+    journal.record("a", {"last_fetched": 2})
+    journal.record("a", {"last_fetched": 3})
+    journal.close()
+
+    state = StateJournal(state_path).load()
+    assert state == {"a": {"last_fetched": 3}, "b": {"last_fetched": 7}}
+
+
+def test_journal_ignores_torn_last_line(tmp_path):
+    state_path = tmp_path / "progress.json"
+    journal = StateJournal(state_path)
+    journal.record("a", {"last_fetched": 4})
+    journal.close()
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "a", "sta')
+
+    assert StateJournal(state_path).load() == {"a": {"last_fetched": 4}}
+
+
+def test_checkpoint_writes_state_and_removes_journal(tmp_path):
+    state_path = tmp_path / "progress.json"
+    journal = StateJournal(state_path)
+    journal.record("a", {"last_fetched": 5})
+    journal.checkpoint({"a": {"last_fetched": 5}})
+
+    assert not journal.journal_path.exists()
+    assert json.loads(state_path.read_text()) == {"a": {"last_fetched": 5}}
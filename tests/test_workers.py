@@ -0,0 +1,119 @@
+"""Tests for the sandboxed extraction worker pool."""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Allow importing from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from cache import DiskCache
+from frontmatter import read_body, read_front_matter
+from workers import (
+    ExtractionError,
+    ExtractionOutOfMemory,
+    ExtractionPool,
+    ExtractionTimeout,
+    extract_document,
+    save_cached_document,
+    save_document,
+)
+
+
+def test_pool_runs_jobs_and_recycles_workers():
+    with ExtractionPool(size=1, timeout=30, max_jobs=2) as pool:
+        assert pool.run(len, b"abc") == 3
+        first = pool._idle[0].process.pid
+        assert pool.run(len, b"abcd") == 4
+        # Recycled after max_jobs
+        assert not pool._idle
+        assert pool.run(len, b"") == 0
+        assert pool._idle[0].process.pid != first
+
+
+def test_pool_times_out_and_replaces_worker():
+    with ExtractionPool(size=1, timeout=0.5) as pool:
+        start = time.monotonic()
+        with pytest.raises(ExtractionTimeout):
+            pool.run(time.sleep, 30)
+        assert time.monotonic() - start < 10
+        assert pool.run(len, b"ok") == 2
+
+
+def test_pool_memory_cap():
+    if sys.platform != "linux":
+        pytest.skip("RLIMIT_AS is only enforced on Linux")
+    with ExtractionPool(size=1, timeout=30, memory_mb=512) as pool:
+        with pytest.raises(ExtractionOutOfMemory):
+            pool.run(bytearray, 4 * 1024 ** 3)
+
+
+def test_pool_reports_job_errors():
+    with ExtractionPool(size=1, timeout=30) as pool:
+        with pytest.raises(ExtractionError, match="ValueError"):
+            pool.run(int, "not a number")
+
+
+def test_save_document_in_worker(tmp_path):
+    import fitz
+
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 72), "The General Assembly,\nDecides that", fontsize=9)
+    pdf = doc.tobytes()
+    out_file = tmp_path / "A_RES_80_1.md"
+    metadata = {"symbol": "A/RES/80/1", "language": "EN"}
+
+    with ExtractionPool(size=1, timeout=60) as pool:
+        chars, detected, text = pool.run(save_document, pdf, out_file, metadata, True, True)
+
+    assert chars > 0 and text is None
+    assert detected == set()
+    assert read_front_matter(out_file)["symbol"] == "A/RES/80/1"
+    assert "Decides that" in out_file.read_text(encoding="utf-8")
+
+
+def test_extraction_cache_skips_pymupdf_for_known_bytes(tmp_path, monkeypatch):
+    import fitz
+
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 72), "The General Assembly,\nDecides that", fontsize=9)
+    pdf = doc.tobytes()
+    metadata = {"symbol": "A/RES/80/1", "language": "EN"}
+    cache = DiskCache(tmp_path / "cache", max_bytes=1 << 20)
+
+    assert save_cached_document(cache, pdf, tmp_path / "miss.md", metadata) is None
+    assert not (tmp_path / "miss.md").exists()
+    chars, _ = extract_document(pdf, tmp_path / "first.md", metadata, cache=cache)
+
+    def no_extraction(*args):
+        raise AssertionError("PDF re-extracted")
+
+    monkeypatch.setattr(fitz, "open", no_extraction)
+    assert save_cached_document(cache, pdf, tmp_path / "second.md", metadata) == (chars, set())
+    assert read_body(tmp_path / "second.md") == read_body(tmp_path / "first.md")
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # Other header lines or a new extract version need a fresh extraction
+    assert save_cached_document(cache, pdf, tmp_path / "h.md", metadata,
+                                header_lines={"A/RES/80/1"}) is None
+    monkeypatch.setattr("workers.EXTRACT_VERSION", "99")
+    assert save_cached_document(cache, pdf, tmp_path / "v.md", metadata) is None
+
+
+def test_pool_extraction_is_cached_by_the_caller(tmp_path):
+    import fitz
+
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 72), "The General Assembly,\nDecides that", fontsize=9)
+    pdf = doc.tobytes()
+    metadata = {"symbol": "A/RES/80/1", "language": "EN"}
+    cache = DiskCache(tmp_path / "cache", max_bytes=1 << 20)
+
+    with ExtractionPool(size=1, timeout=60) as pool:
+        chars, _ = extract_document(pdf, tmp_path / "first.md", metadata, cache=cache, pool=pool)
+    assert save_cached_document(cache, pdf, tmp_path / "second.md", metadata) == (chars, set())
+    assert (cache.hits, cache.misses) == (1, 1)
+    # A hit reports no detected lines, so the PDF is not learned from twice
+    assert extract_document(pdf, tmp_path / "third.md", metadata, cache=cache) == (chars, None)